@@ -1,11 +1,22 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
+import base64
+import datetime
 import threading
 import database
+import metrics
 import sniffer
 import os
+from live_feed import LiveFeed
 
 app = Flask(__name__)
 
+# Load the model in the background as soon as the dashboard starts, instead of
+# when capture is first activated. Set IDPS_WARMUP=0 to load on demand only.
+WARMUP_MODEL = os.environ.get('IDPS_WARMUP', '1') == '1'
+
+# Largest page /api/alerts returns
+ALERTS_PAGE_MAX = 500
+
 # Global flag for sniffer thread
 sniffer_active = False
 
@@ -13,32 +24,137 @@ sniffer_active = False
 def index():
     return render_template('index.html')
 
-@app.route('/api/stats')
-def stats():
-    total, types = database.get_stats()
-    recent = database.get_recent_alerts(10)
-    
-    # Format recent for JSON
-    recent_list = []
-    for r in recent:
-        # r: id, timestamp, src, dst, proto, type, confidence, action
-        recent_list.append({
-            'id': r[0],
-            'timestamp': r[1],
-            'src_ip': r[2],
-            'dst_ip': r[3],
-            'protocol': r[4],
-            'type': r[5],
-            'action': r[7]
-        })
-        
-    return jsonify({
+def format_alert(r):
+    # r: id, timestamp, src, dst, proto, type, confidence, action,
+    #    last_seen, packet_count, max_confidence, mean_confidence
+    return {
+        'id': r[0],
+        'timestamp': r[1],
+        'src_ip': r[2],
+        'dst_ip': r[3],
+        'protocol': r[4],
+        'type': r[5],
+        'confidence': r[6],
+        'action': r[7],
+        'last_seen': r[8],
+        'packet_count': r[9],
+        'max_confidence': r[10],
+        'mean_confidence': r[11]
+    }
+
+def build_stats():
+    total, types, recent, total_packets = database.get_live_snapshot(10)
+    recent_list = [format_alert(r) for r in recent]
+
+    return {
         'total_attacks': total,
+        'total_packets': total_packets,
         'attack_types': types,
         'recent_logs': recent_list,
-        'status': 'Active' if sniffer_active else 'Inactive'
+        'status': 'Active' if sniffer_active else 'Inactive',
+        'model': sniffer.get_model_status(),
+        'inference': sniffer.get_inference_stats(),
+        'verdict_cache': sniffer.get_cache_stats(),
+        'blocklist': sniffer.get_blocklist_stats(),
+        'capture': sniffer.get_capture_stats(),
+        'capture_queue': sniffer.get_capture_queue_stats(),
+        'alert_writer': database.get_writer_stats(),
+        'alert_aggregation': database.get_aggregation_stats(),
+        'workers': sniffer.get_sharding_stats(),
+        'metrics': metrics.summary()
+    }
+
+# Shared push feed for all dashboard tabs (one snapshot per change, not per viewer)
+live_feed = LiveFeed(build_stats)
+
+@app.route('/api/stats')
+def stats():
+    return jsonify(build_stats())
+
+def _parse_time(name):
+    """Query parameter as a UTC 'YYYY-MM-DD HH:MM:SS' string (what the attacks table stores)."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        t = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 date or time, got {value!r}")
+    if t.tzinfo is not None:
+        t = t.astimezone(datetime.timezone.utc)
+    return t.strftime('%Y-%m-%d %H:%M:%S')
+
+def _encode_cursor(before):
+    timestamp, alert_id = before
+    return base64.urlsafe_b64encode(f"{timestamp}|{alert_id}".encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, alert_id = raw.rsplit('|', 1)
+        return timestamp, int(alert_id)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+@app.route('/api/alerts')
+def alerts():
+    # Alert history, newest first; pass `next` back as ?cursor= for the following page
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), ALERTS_PAGE_MAX)
+        cursor = request.args.get('cursor')
+        rows, before = database.get_alerts(limit,
+                                           before=_decode_cursor(cursor) if cursor else None,
+                                           src_ip=request.args.get('src') or None,
+                                           since=_parse_time('since'),
+                                           until=_parse_time('until'))
+    except ValueError as e:
+        return jsonify({'message': str(e), 'status': 'error'}), 400
+    return jsonify({
+        'alerts': [format_alert(r) for r in rows],
+        'next': _encode_cursor(before) if before else None
+    })
+
+@app.route('/api/alerts/rollup')
+def alert_rollup():
+    # Per-minute or per-hour alert and packet counts by type
+    try:
+        resolution = request.args.get('resolution', 'hour')
+        rows = database.get_rollups(resolution, since=_parse_time('since'), until=_parse_time('until'),
+                                    attack_type=request.args.get('type') or None)
+    except ValueError as e:
+        return jsonify({'message': str(e), 'status': 'error'}), 400
+    return jsonify({
+        'resolution': resolution,
+        'buckets': [{'bucket': b, 'type': t, 'alerts': a, 'packets': p} for b, t, a, p in rows]
     })
 
+@app.route('/api/sources/<src_ip>')
+def source_summary(src_ip):
+    try:
+        rows = database.get_source_summary(src_ip, since=_parse_time('since'), until=_parse_time('until'))
+    except ValueError as e:
+        return jsonify({'message': str(e), 'status': 'error'}), 400
+    types = [{'type': t, 'alerts': a, 'packets': p, 'first_seen': first, 'last_seen': last,
+              'max_confidence': conf} for t, a, p, first, last, conf in rows]
+    return jsonify({
+        'src_ip': src_ip,
+        'alerts': sum(t['alerts'] for t in types),
+        'packets': sum(t['packets'] for t in types),
+        'types': types
+    })
+
+@app.route('/api/metrics')
+def prometheus_metrics():
+    # Prometheus text exposition format, for scraping
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/stream')
+def stream():
+    # Server-Sent Events: full snapshot on connect, then pushed on change
+    return Response(stream_with_context(live_feed.stream()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 def run_sniffer_background():
     global sniffer_active
     sniffer_active = True
@@ -77,6 +193,11 @@ if __name__ == '__main__':
     # Initialize DB
     database.init_db()
     
+    # With the reloader on, only the child process (WERKZEUG_RUN_MAIN) serves
+    # requests; the watcher parent never needs the model.
+    if WARMUP_MODEL and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        sniffer.warm_up()
+
     print("Starting Web Dashboard on http://127.0.0.1:5000")
     app.run(debug=True, use_reloader=True) 
     # use_reloader=False prevents double execution of sniffer if we put it in main
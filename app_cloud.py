@@ -37,6 +37,7 @@ def get_mock_logs():
             'dst_ip': "10.0.0.5",
             'protocol': random.choice(protos),
             'type': 'Malicious Traffic',
+            'confidence': random.uniform(0.8, 1.0),
             'action': 'Blocked'
         })
     return logs
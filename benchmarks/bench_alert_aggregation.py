@@ -0,0 +1,122 @@
+"""
+Alert write volume and dashboard latency under an alert flood, with and
+without aggregation windows (database.ALERT_WINDOW).
+
+--alerts alerts are logged as handle_verdict would during a flood: most
+from one SYN-flooding source, the rest from --sources other attackers,
+as fast as one thread can (the inference worker's position). A
+dashboard thread calls app.build_stats() every 50 ms meanwhile. Each
+run uses a fresh database and reports rows and statements written,
+alerts dropped by the writer, database size, and build_stats latency;
+the packet counts of the aggregated rows are checked against the alerts
+logged.
+
+    python benchmarks/bench_alert_aggregation.py --alerts 300000 --window 60
+"""
+import argparse
+import atexit
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+_workdir = tempfile.mkdtemp(prefix='idps-alerts-')
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ['IDPS_DB_PATH'] = os.path.join(_workdir, 'setup.db')
+os.environ.setdefault('IDPS_WARMUP', '0')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import database  # noqa: E402
+
+FLOOD_SHARE = 0.9
+
+
+def alert_stream(n, sources, seed=7):
+    rnd = random.Random(seed)
+    others = [f'10.99.{i // 250}.{i % 250 + 1}' for i in range(sources)]
+    for _ in range(n):
+        if rnd.random() < FLOOD_SHARE:
+            yield '10.66.0.1', '192.168.1.10', 'TCP', rnd.uniform(0.6, 1.0)
+        else:
+            yield rnd.choice(others), '192.168.1.10', rnd.choice(['TCP', 'UDP']), rnd.uniform(0.5, 1.0)
+
+
+def db_size(path):
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+
+def run(alerts, window):
+    path = os.path.join(_workdir, f'window-{window:g}.db')
+    database.shutdown_writer()
+    database.DB_PATH = path
+    database.ALERT_WINDOW = window
+    database.init_db()
+
+    stop = threading.Event()
+    latencies = []
+
+    def dashboard():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            app.build_stats()
+            latencies.append(time.perf_counter() - t0)
+            stop.wait(0.05)
+
+    probe = threading.Thread(target=dashboard, daemon=True)
+    probe.start()
+    t0 = time.perf_counter()
+    for src, dst, proto, confidence in alerts:
+        database.log_attack(src, dst, proto, 'Malicious Traffic', confidence, 'Blocked')
+    produce = time.perf_counter() - t0
+    database.flush_alerts(60)
+    total = time.perf_counter() - t0
+    stop.set()
+    probe.join()
+
+    writer = database.get_writer_stats()
+    conn = sqlite3.connect(path)
+    rows, packets = conn.execute('SELECT count(*), sum(packet_count) FROM attacks').fetchone()
+    conn.close()
+    return {
+        'window': window,
+        'produce_us': produce / len(alerts) * 1e6,
+        'total_s': total,
+        'rows': rows,
+        'packets': packets or 0,
+        'statements': writer['written'] + writer['updated'],
+        'transactions': writer['batches'],
+        'dropped': writer['dropped'],
+        'db_mb': db_size(path) / 2**20,
+        'dashboard_ms': (statistics.median(latencies) * 1e3, max(latencies) * 1e3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alert flood: one row per alert vs aggregation windows.")
+    parser.add_argument('--alerts', type=int, default=300000)
+    parser.add_argument('--sources', type=int, default=50, help='attackers besides the flooding host')
+    parser.add_argument('--window', type=float, default=database.ALERT_WINDOW or 60)
+    args = parser.parse_args()
+
+    alerts = list(alert_stream(args.alerts, args.sources))
+    print(f"{len(alerts)} alerts, {FLOOD_SHARE:.0%} from one source, {args.sources} other sources\n")
+    print(f"{'window s':>9}{'us/alert':>10}{'drain s':>9}{'rows':>9}{'packets':>10}{'stmts':>9}{'txns':>7}"
+          f"{'dropped':>9}{'DB MB':>8}{'dash p50/max ms':>17}")
+    for window in (0, args.window):
+        r = run(alerts, window)
+        print(f"{r['window']:>9g}{r['produce_us']:>10.2f}{r['total_s']:>9.2f}{r['rows']:>9}{r['packets']:>10}"
+              f"{r['statements']:>9}{r['transactions']:>7}{r['dropped']:>9}{r['db_mb']:>8.1f}"
+              f"{r['dashboard_ms'][0]:>9.1f}/{r['dashboard_ms'][1]:<7.1f}")
+        if r['packets'] + r['dropped'] < len(alerts) and window:
+            print(f"[!] {len(alerts) - r['packets']} alerts missing from the aggregated rows")
+    database.shutdown_writer()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Alert history queries on a large attacks table.
+
+Fills a fresh database with --rows alerts spread over --days days from
+--sources sources (through INSERT_SQL, so the summary and rollup triggers
+run as they do for the writer), then times:
+
+  - browsing pages at increasing depth with OFFSET vs keyset pagination
+    (database.get_alerts, what /api/alerts uses)
+  - one day's alerts, one source's summary and an hourly series over the
+    whole history, each with its index/rollup and with a full scan
+  - the retention pass (database.prune_old_alerts) at --retention days,
+    checking that the totals and rollups still cover the pruned rows
+  - batched inserts with and without the history indexes and triggers,
+    the price the writer pays for all of the above
+
+    python benchmarks/bench_alert_history.py --rows 1000000 --days 90
+"""
+import argparse
+import atexit
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+_workdir = tempfile.mkdtemp(prefix='idps-history-')
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ['IDPS_DB_PATH'] = os.path.join(_workdir, 'history.db')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+TYPES = ('Malicious Traffic', 'Port Scan', 'SYN Flood')
+PAGE = 50
+
+
+def alert_rows(n, days, sources, now, seed=7):
+    """n alerts, oldest first, evenly spread over `days` days before `now`."""
+    rnd = random.Random(seed)
+    srcs = [f'10.{i // 62500}.{i // 250 % 250}.{i % 250 + 1}' for i in range(sources)]
+    step = days * 86400 / n
+    start = now - days * 86400
+    for i in range(n):
+        yield (database._format_time(start + i * step), rnd.choice(srcs), '192.168.1.10',
+               rnd.choice(('TCP', 'UDP')), rnd.choice(TYPES), rnd.uniform(0.5, 1.0), 'Blocked')
+
+
+def populate(conn, rows, batch=50000):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == batch:
+            with conn:
+                conn.executemany(database.INSERT_SQL, chunk)
+            chunk = []
+    if chunk:
+        with conn:
+            conn.executemany(database.INSERT_SQL, chunk)
+
+
+def best(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1e3, result
+
+
+def offset_page(conn, offset):
+    return conn.execute('SELECT * FROM attacks ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?',
+                        (PAGE, offset)).fetchall()
+
+
+def row(label, new_ms, old_ms):
+    print(f"  {label:34}{new_ms:>11.2f}{old_ms:>11.2f}{old_ms / max(new_ms, 1e-6):>9.1f}x")
+
+
+def insert_rate(conn, rows, batch=database.WRITER_BATCH_SIZE):
+    t0 = time.perf_counter()
+    for i in range(0, len(rows), batch):
+        with conn:
+            conn.executemany(database.INSERT_SQL, rows[i:i + batch])
+    return len(rows) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alert history: pagination, indexed queries, rollups, retention.")
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--days', type=float, default=90)
+    parser.add_argument('--sources', type=int, default=5000)
+    parser.add_argument('--retention', type=float, default=30)
+    parser.add_argument('--inserts', type=int, default=50000, help='rows for the insert cost comparison')
+    args = parser.parse_args()
+
+    now = time.time()
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    t0 = time.perf_counter()
+    populate(conn, alert_rows(args.rows, args.days, args.sources, now))
+    print(f"{args.rows} alerts over {args.days:g} days from {args.sources} sources "
+          f"(populated in {time.perf_counter() - t0:.1f} s)\n")
+
+    print(f"  {'':34}{'new ms':>11}{'old ms':>11}  (keyset/index/rollup vs OFFSET/scan/GROUP BY)")
+    # Pagination: the cursor for depth d is the last row of the page before it
+    for depth in sorted({d for d in (0, 10000, 100000, args.rows // 2, args.rows - PAGE) if 0 <= d < args.rows}):
+        before = None
+        if depth:
+            r = offset_page(conn, depth - 1)[0]
+            before = (r[1], r[0])
+        keyset_ms, (page, _) = best(lambda: database.get_alerts(PAGE, before=before))
+        offset_ms, expected = best(lambda: offset_page(conn, depth))
+        assert page == expected, f"keyset and OFFSET pages differ at depth {depth}"
+        row(f"page at depth {depth}", keyset_ms, offset_ms)
+
+    mid = now - args.days * 86400 / 2
+    since, until = database._format_time(mid), database._format_time(mid + 86400)
+    day_ms, (page, _) = best(lambda: database.get_alerts(PAGE, since=since, until=until))
+    day_scan_ms, _ = best(lambda: conn.execute(
+        'SELECT * FROM attacks NOT INDEXED WHERE timestamp >= ? AND timestamp < ? '
+        'ORDER BY timestamp DESC, id DESC LIMIT ?', (since, until, PAGE)).fetchall())
+    row("one day, first page", day_ms, day_scan_ms)
+
+    src = page[0][2]
+    src_ms, summary = best(lambda: database.get_source_summary(src))
+    src_scan_ms, _ = best(lambda: conn.execute(
+        'SELECT attack_type, count(*), sum(packet_count) FROM attacks NOT INDEXED WHERE src_ip = ? GROUP BY 1',
+        (src,)).fetchall())
+    row(f"source summary ({sum(s[1] for s in summary)} alerts)", src_ms, src_scan_ms)
+
+    hourly_ms, buckets = best(lambda: database.get_rollups('hour'))
+    hourly_scan_ms, raw = best(lambda: conn.execute(
+        "SELECT substr(timestamp, 1, 13) || ':00:00', attack_type, count(*), sum(packet_count) "
+        "FROM attacks GROUP BY 1, 2 ORDER BY 1, 2").fetchall(), repeat=1)
+    assert buckets == raw, "hourly rollup disagrees with the raw rows"
+    row(f"hourly series ({len(buckets)} buckets)", hourly_ms, hourly_scan_ms)
+
+    totals = database.get_stats()
+    t0 = time.perf_counter()
+    pruned = database.prune_old_alerts(args.retention, now=now)
+    prune_s = time.perf_counter() - t0
+    left = conn.execute('SELECT count(*) FROM attacks').fetchone()[0]
+    kept = database.get_stats() == totals and database.get_rollups('hour') == buckets
+    print(f"\nretention {args.retention:g} days: pruned {pruned} rows in {prune_s:.1f} s "
+          f"({pruned / max(prune_s, 1e-9):.0f} rows/s, {database.PRUNE_BATCH} per transaction), {left} left; "
+          f"totals and hourly rollups {'unchanged' if kept else 'CHANGED'}")
+
+    rows = list(alert_rows(args.inserts, 1, args.sources, now, seed=11))
+    full = insert_rate(conn, rows)
+    for name in ('idx_attacks_timestamp', 'idx_attacks_src'):
+        conn.execute(f'DROP INDEX {name}')
+    for resolution in database.ROLLUP_TABLES:
+        conn.execute(f'DROP TRIGGER attacks_rollup_{resolution}_insert')
+    bare = insert_rate(conn, rows)
+    print(f"inserts ({database.WRITER_BATCH_SIZE}-row transactions): {full:.0f} rows/s with indexes and rollups, "
+          f"{bare:.0f} rows/s without ({full / bare - 1:+.0%})")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Lookup cost of blocklist.Blocklist with a large number of entries.
+
+Builds a blocklist of --entries entries (by default 100k: 60% IPv4 hosts,
+25% IPv4 prefixes /12-/30 (mostly /24), 10% IPv6 /32-/64 prefixes, 5% IPv6 hosts, half
+of them with TTLs), then times `ip in blocklist` for exact-host hits,
+prefix hits and misses of both families (host hits split into permanent
+and TTL blocks, which take different paths). A plain set (exact matches only)
+is timed alongside as the reference the old BLOCKED_IPS set would give.
+
+    python benchmarks/bench_blocklist.py --entries 100000
+"""
+import argparse
+import ipaddress
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from blocklist import Blocklist  # noqa: E402
+
+
+# Roughly the shape of public drop lists: mostly /24, some larger allocations
+V4_PREFIX_LENGTHS = (12, 16, 16, 20, 22, 23, 24, 24, 24, 24, 24, 24, 26, 28, 29, 30)
+
+
+def v4(rnd):
+    return str(ipaddress.IPv4Address(rnd.getrandbits(32)))
+
+
+def v6(rnd):
+    return str(ipaddress.IPv6Address((0x2001 << 112) | rnd.getrandbits(112)))
+
+
+def build_entries(n, rnd):
+    entries = []
+    for i in range(n):
+        r = rnd.random()
+        if r < 0.60:
+            entry = v4(rnd)
+        elif r < 0.85:
+            plen = rnd.choice(V4_PREFIX_LENGTHS)
+            entry = str(ipaddress.ip_network(f"{v4(rnd)}/{plen}", strict=False))
+        elif r < 0.95:
+            entry = str(ipaddress.ip_network(f"{v6(rnd)}/{rnd.randint(32, 64)}", strict=False))
+        else:
+            entry = v6(rnd)
+        entries.append((entry, 3600.0 if i % 2 else None))
+    return entries
+
+
+def time_lookups(container, ips, repeat=3):
+    """Best-of-`repeat` nanoseconds per lookup, and the number of matches."""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        hits = 0
+        for ip in ips:
+            if ip in container:
+                hits += 1
+        best = min(best, time.perf_counter() - t0)
+    return best / len(ips) * 1e9, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blocklist lookup benchmark.")
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    args = parser.parse_args()
+    rnd = random.Random(11)
+
+    entries = build_entries(args.entries, rnd)
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    blocklist = Blocklist()
+    blocklist.load(entries)
+    build_s = time.perf_counter() - t0
+    rss = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss0) / 1024
+    stats = blocklist.stats()
+    print(f"Loaded {len(blocklist)} entries ({stats['hosts']} hosts, {stats['prefixes']} prefixes) "
+          f"in {build_s:.2f} s, ~{rss:.0f} MB")
+
+    hosts = [e for e, _ in entries if '/' not in e]
+    prefixes = [ipaddress.ip_network(e) for e, _ in entries if '/' in e]
+    n = args.lookups
+    v4_prefixes = [p for p in prefixes if p.version == 4]
+    v6_prefixes = [p for p in prefixes if p.version == 6]
+    inside = lambda p: str(p.network_address + rnd.randrange(p.num_addresses))
+    permanent = [e for e, ttl in entries if '/' not in e and ttl is None]
+    expiring = [e for e, ttl in entries if '/' not in e and ttl is not None]
+    workloads = {
+        'host hit': [rnd.choice(permanent) for _ in range(n)],
+        'TTL host hit': [rnd.choice(expiring) for _ in range(n)],
+        'IPv4 prefix hit': [inside(rnd.choice(v4_prefixes)) for _ in range(n)],
+        'IPv6 prefix hit': [inside(rnd.choice(v6_prefixes)) for _ in range(n)],
+        'IPv4 miss*': [v4(rnd) for _ in range(n)],
+        'IPv6 miss*': [str(ipaddress.IPv6Address((0x2002 << 112) | rnd.getrandbits(112)))
+                       for _ in range(n)],
+    }
+    exact = set(hosts)
+    print(f"\n{'workload':18}{'blocklist (ns)':>16}{'matches':>10}{'set (ns)':>10}")
+    for name, ips in workloads.items():
+        ns, hits = time_lookups(blocklist, ips)
+        set_ns, _ = time_lookups(exact, ips)
+        print(f"{name:18}{ns:>16.0f}{hits / len(ips):>10.1%}{set_ns:>10.0f}")
+    print("* random addresses; a few IPv4 ones fall inside the random prefixes")
+
+    # Lazy expiry: everything with a TTL lapses at once
+    blocklist.clock = lambda: time.time() + 7200
+    t0 = time.perf_counter()
+    removed = blocklist.expire()
+    print(f"\nExpired {removed} TTL entries in {(time.perf_counter() - t0) * 1000:.0f} ms; "
+          f"{len(blocklist)} permanent entries left")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Check and measure capture.CaptureConfig on synthetic traffic.
+
+For a few configurations (exclusions, sampling rates) this reports the
+share of packets and flows that would reach Python, checks that sampling
+never splits a flow (both directions, every packet, same decision) and
+times the Python fallback filter. If libpcap is available to scapy, each
+BPF expression is also compiled and run over the same frames with
+libpcap's bpf_filter(), and its decisions must match the Python ones.
+
+    python benchmarks/bench_capture_filter.py --packets 20000
+"""
+import argparse
+import ctypes
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from capture import CaptureConfig  # noqa: E402
+from bench_flow_table import synthetic_packets  # noqa: E402
+
+from scapy.all import Ether, IP, TCP, UDP, ICMP, Raw  # noqa: E402
+
+CONFIGS = [
+    ('everything', {}),
+    ('exclude backup net + dashboard', {'exclude_subnets': ['10.0.0.0/28'], 'exclude_ports': [5000]}),
+    ('sample 50%', {'sample_rate': 0.5}),
+    ('sample 10%', {'sample_rate': 0.1}),
+    ('exclude + sample 25%', {'exclude_subnets': ['10.0.0.0/28'], 'exclude_ports': [5000],
+                              'sample_rate': 0.25}),
+]
+
+
+def build_frames(n):
+    """Ethernet frames for the benchmark's synthetic traffic, plus dashboard traffic and fragments."""
+    frames = []
+    for i, (ts, src, dst, proto, sport, dport, flags, size) in enumerate(synthetic_packets(n, 50000)):
+        ip = IP(src=src, dst=dst)
+        if i % 50 == 0:
+            l4 = TCP(sport=sport, dport=5000, flags='PA') # dashboard
+        elif proto == 'tcp':
+            l4 = TCP(sport=sport, dport=dport, flags=int(flags))
+        elif proto == 'udp':
+            l4 = UDP(sport=sport, dport=dport)
+        else:
+            l4 = ICMP()
+        frames.append(Ether() / ip / l4 / Raw(b'x' * min(size, 64)))
+        if i % 500 == 0: # a non-first fragment
+            frames.append(Ether() / IP(src=src, dst=dst, proto=6, frag=185) / Raw(b'y' * 32))
+    return frames
+
+
+def flow_key(pkt):
+    ip = pkt[IP]
+    ports = (0, 0)
+    if ip.frag == 0 and (TCP in pkt or UDP in pkt):
+        l4 = pkt[TCP] if TCP in pkt else pkt[UDP]
+        ports = (l4.sport, l4.dport)
+    a, b = (ip.src, ports[0]), (ip.dst, ports[1])
+    return (min(a, b), max(a, b), ip.proto)
+
+
+def libpcap_filter():
+    """(compile, run) using scapy's libpcap binding, or None if libpcap is missing."""
+    try:
+        from scapy.arch.common import compile_filter
+        from scapy.libs.winpcapy import pcap_compile  # noqa: F401 (raises without libpcap)
+        from ctypes.util import find_library
+        lib = ctypes.CDLL(find_library('pcap') or find_library('wpcap'))
+    except (ImportError, OSError, TypeError):
+        return None
+    lib.bpf_filter.restype = ctypes.c_uint
+
+    def run(program, raw):
+        return lib.bpf_filter(program.bf_insns, raw, len(raw), len(raw)) != 0
+    return (lambda expr: compile_filter(expr, linktype=1)), run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture filter/sampling check and benchmark.")
+    parser.add_argument('--packets', type=int, default=20000)
+    args = parser.parse_args()
+
+    raws = [bytes(f) for f in build_frames(args.packets)]
+    frames = [Ether(raw) for raw in raws] # dissected, as sniff() delivers them
+    keys = [flow_key(f) for f in frames]
+    n_flows = len(set(keys))
+    bpf = libpcap_filter()
+    print(f"{len(frames)} packets in {n_flows} flows; libpcap: {'yes' if bpf else 'not available'}\n")
+    print(f"{'config':32}{'packets kept':>14}{'flows kept':>12}{'split flows':>13}"
+          f"{'python ns/pkt':>15}{'bpf agrees':>12}")
+
+    for name, kwargs in CONFIGS:
+        config = CaptureConfig(**kwargs)
+        t0 = time.perf_counter()
+        decisions = [config.accept(f) for f in frames]
+        py_ns = (time.perf_counter() - t0) / len(frames) * 1e9
+
+        per_flow = defaultdict(set)
+        for k, d in zip(keys, decisions):
+            per_flow[k].add(d)
+        split = sum(1 for v in per_flow.values() if len(v) > 1)
+        flows_kept = sum(1 for v in per_flow.values() if True in v)
+
+        agrees = '-'
+        if bpf:
+            compile_expr, run = bpf
+            program = compile_expr(config.filter_expression())
+            mismatches = sum(run(program, raw) != d for raw, d in zip(raws, decisions))
+            agrees = 'yes' if mismatches == 0 else f'{mismatches} diff'
+        print(f"{name:32}{sum(decisions) / len(frames):>14.1%}{flows_kept / n_flows:>12.1%}"
+              f"{split:>13}{py_ns:>15.0f}{agrees:>12}")
+
+    print(f"\nExample filter: {CaptureConfig(**CONFIGS[-1][1]).filter_expression()}")
+
+
+if __name__ == '__main__':
+    main()
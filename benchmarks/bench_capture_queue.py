@@ -0,0 +1,190 @@
+"""
+Capture queue under a replayed flood.
+
+Frames are fed to sniffer.frame_callback (the live raw-capture handler)
+at --rate packets/s from three kinds of source: one flooding host (SYN
+flood), --normal ordinary hosts and a few attack hosts marked suspicious
+beforehand (as earlier alerts would have). Blocking is switched off so
+the flood keeps coming, as it would from spoofed or allow-listed
+addresses, and every scored row costs an extra --stall-us (a slower
+model or a busier host) so analysis cannot keep up. Meanwhile a
+dashboard thread calls app.build_stats() every 100 ms.
+
+For inline analysis (no queue) and each shed policy this reports the
+capture loop's cost per packet - the loop must stay under the
+inter-arrival time or the kernel drops at random - the share of each
+source class that was scored, what was shed and why, and how long
+the dashboard took to answer.
+
+    python benchmarks/bench_capture_queue.py --rate 10000 --seconds 8
+"""
+import argparse
+import atexit
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+_workdir = tempfile.mkdtemp(prefix='idps-flood-')
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ['IDPS_DB_PATH'] = os.path.join(_workdir, 'bench.db')
+os.environ.setdefault('IDPS_INFERENCE_BACKEND', 'numpy')
+os.environ.setdefault('IDPS_WARMUP', '0')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import database  # noqa: E402
+import sniffer  # noqa: E402
+from capture_queue import POLICIES  # noqa: E402
+
+FLOOD_SRC = '10.66.0.1'
+ATTACK_SRCS = [f'10.99.0.{i}' for i in range(1, 6)]
+MIX = (('flood', 85), ('normal', 13), ('attack', 2))
+
+
+def build_frames(n, normal_hosts, seed=7):
+    """[(class, src, frame bytes)] in arrival order."""
+    from scapy.all import Ether, IP, TCP, Raw
+    rnd = random.Random(seed)
+    classes = [c for c, _ in MIX]
+    weights = [w for _, w in MIX]
+    normal = [f'10.1.{i // 250}.{i % 250 + 1}' for i in range(normal_hosts)]
+    frames = []
+    for _ in range(n):
+        kind = rnd.choices(classes, weights)[0]
+        if kind == 'flood':
+            src = FLOOD_SRC
+            pkt = Ether() / IP(src=src, dst='192.168.1.10') / TCP(sport=rnd.randrange(1024, 65536), dport=80, flags='S')
+        elif kind == 'normal':
+            src = rnd.choice(normal)
+            pkt = (Ether() / IP(src=src, dst='192.168.1.10') / TCP(sport=rnd.randrange(1024, 65536), dport=443, flags='PA')
+                   / Raw(b'x' * rnd.randrange(40, 1200)))
+        else:
+            src = rnd.choice(ATTACK_SRCS)
+            pkt = Ether() / IP(src=src, dst='192.168.1.10') / TCP(sport=40000, dport=rnd.randrange(1, 1024), flags='S')
+        frames.append((kind, src, bytes(pkt)))
+    return frames
+
+
+def dashboard_probe(stop, samples):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        app.build_stats()
+        samples.append(time.perf_counter() - t0)
+        stop.wait(0.1)
+
+
+def run(frames, rate, policy, queue_size):
+    """Offer `frames` at `rate` packets/s; policy None analyses inline."""
+    sniffer.flow_table.clear()
+    sniffer.BLOCKED_IPS.clear()
+    if sniffer.verdict_cache is not None:
+        sniffer.verdict_cache.invalidate()
+    # As start_sniffer sets them up
+    sniffer.start_inference_worker(max_queue=None if policy is None else
+                                   sniffer.BATCH_SIZE * sniffer.INFERENCE_QUEUE_BATCHES)
+    if policy is None:
+        sniffer.start_capture_queue(0)
+    else:
+        sniffer.start_capture_queue(queue_size, policy)
+        for src in ATTACK_SRCS:
+            sniffer.capture_queue.mark_suspicious(src)
+
+    kinds = {src: kind for kind, src, _ in frames}
+    offered = dict.fromkeys(kinds.values(), 0)
+    scored = dict.fromkeys(kinds.values(), 0)
+    handle_verdict = sniffer.handle_verdict
+
+    def counting_verdict(src_ip, *args):
+        scored[kinds[src_ip]] += 1
+        handle_verdict(src_ip, *args)
+
+    sniffer.handle_verdict = counting_verdict
+    stop = threading.Event()
+    probe_samples = []
+    probe = threading.Thread(target=dashboard_probe, args=(stop, probe_samples), daemon=True)
+    probe.start()
+
+    interval = 1.0 / rate
+    callback_time = 0.0
+    start = time.perf_counter()
+    try:
+        for i, (kind, src, frame) in enumerate(frames):
+            due = start + i * interval
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+            offered[kind] += 1
+            t0 = time.perf_counter()
+            sniffer.frame_callback(memoryview(frame), time.time())
+            callback_time += time.perf_counter() - t0
+        offer_seconds = time.perf_counter() - start
+        sniffer.stop_capture_queue()
+        sniffer.stop_inference_worker()
+        drain_seconds = time.perf_counter() - start - offer_seconds
+    finally:
+        sniffer.handle_verdict = handle_verdict
+        stop.set()
+        probe.join()
+    stats = sniffer.get_capture_queue_stats()
+    shed = dict(stats['shed']) if stats else {}
+    dropped = sniffer.get_inference_stats()['dropped']
+    if dropped:
+        shed['inference_queue_full'] = dropped
+    return {
+        'policy': policy or 'inline',
+        'capture_us': callback_time / len(frames) * 1e6,
+        'offered_pps': len(frames) / offer_seconds,
+        'drain_s': drain_seconds,
+        'scored': {k: scored[k] / offered[k] for k in offered},
+        'shed': shed,
+        'max_depth': stats['max_depth'] if stats else 0,
+        'dashboard_ms': (statistics.median(probe_samples) * 1e3, max(probe_samples) * 1e3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture queue shed policies under a flood.")
+    parser.add_argument('--rate', type=int, default=10000, help='offered packets per second')
+    parser.add_argument('--seconds', type=float, default=8.0)
+    parser.add_argument('--normal', type=int, default=200, help='ordinary source hosts')
+    parser.add_argument('--queue-size', type=int, default=2000)
+    parser.add_argument('--stall-us', type=float, default=200.0, help='extra scoring cost per row')
+    parser.add_argument('--policies', default='inline,' + ','.join(POLICIES))
+    args = parser.parse_args()
+
+    sniffer.VERBOSE_ALERTS = False
+    sniffer.block_ip = lambda ip: None # keep the flood coming
+    sniffer.SUSPICIOUS_CONFIDENCE = 1.1 # only the pre-marked attack hosts are suspicious
+    score_batch = sniffer.score_batch
+
+    def slow_score_batch(rows):
+        time.sleep(len(rows) * args.stall_us / 1e6)
+        return score_batch(rows)
+
+    sniffer.score_batch = slow_score_batch
+    if not sniffer.load_detector():
+        raise SystemExit("No model loaded. Run 'python train_model.py' first.")
+    frames = build_frames(int(args.rate * args.seconds), args.normal)
+    print(f"{len(frames)} frames at {args.rate} pkt/s ({args.seconds:.0f} s), queue size {args.queue_size}; "
+          f"+{args.stall_us:.0f} us per scored row; mix {', '.join(f'{c} {w}%' for c, w in MIX)}\n")
+
+    print(f"{'policy':18}{'capture us':>11}{'offered/s':>10}{'drain s':>9}{'flood':>8}{'normal':>8}{'attack':>8}"
+          f"{'dash p50/max ms':>17}  shed")
+    for policy in args.policies.split(','):
+        r = run(frames, args.rate, None if policy == 'inline' else policy, args.queue_size)
+        a = r['scored']
+        shed = ', '.join(f"{k}={v}" for k, v in r['shed'].items()) or '-'
+        print(f"{r['policy']:18}{r['capture_us']:>11.1f}{r['offered_pps']:>10.0f}{r['drain_s']:>9.2f}"
+              f"{a['flood']:>8.0%}{a['normal']:>8.0%}{a['attack']:>8.0%}"
+              f"{r['dashboard_ms'][0]:>9.1f}/{r['dashboard_ms'][1]:<7.1f}  {shed}")
+    database.shutdown_writer()
+
+
+if __name__ == '__main__':
+    main()
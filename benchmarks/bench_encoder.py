@@ -0,0 +1,92 @@
+"""
+Correctness check and benchmark for preprocessing.CompiledEncoder.
+
+Verifies that CompiledEncoder.transform_rows is bit-identical to
+preprocess_data(df, is_training=False) (float64, and float32 after the
+cast the model applies anyway), then times both paths per row and per batch.
+
+    python benchmarks/bench_encoder.py --rows 2048 --batch 256
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessing import COL_NAMES, CompiledEncoder, preprocess_data  # noqa: E402
+from flow_table import FlowTable, SYN, ACK  # noqa: E402
+
+
+def sample_rows(n, seed=7):
+    """Realistic rows from the flow table, plus a few unseen categories."""
+    rnd = random.Random(seed)
+    table = FlowTable()
+    rows = []
+    ts = 1_700_000_000.0
+    for i in range(n):
+        ts += 0.001
+        proto = rnd.choice(['tcp', 'tcp', 'udp', 'icmp'])
+        dport = rnd.choice([80, 21, 25, 53, 443, 8080, rnd.randrange(1, 65535)])
+        rows.append(table.update(ts, f"10.0.{rnd.randrange(4)}.{rnd.randrange(50)}",
+                                 f"10.1.0.{rnd.randrange(5)}", proto,
+                                 rnd.randrange(1024, 65535), dport,
+                                 rnd.choice([SYN, ACK, SYN | ACK]), rnd.randrange(1500),
+                                 icmp_type=rnd.choice([0, 8, 3])))
+    return rows
+
+
+def reference(rows):
+    df = pd.DataFrame(rows, columns=COL_NAMES[:-1])
+    df['label'] = 'normal'
+    X, _ = preprocess_data(df, is_training=False)
+    return X
+
+
+def timeit(fn, repeat):
+    best = float('inf')
+    for _ in range(3):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / repeat)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=2048)
+    parser.add_argument('--batch', type=int, default=256)
+    args = parser.parse_args()
+
+    rows = sample_rows(args.rows)
+    enc = CompiledEncoder.load()
+
+    ref = reference(rows)
+    got64 = enc.transform_rows(rows, dtype=np.float64)
+    got32 = enc.transform_rows(rows)
+    assert got64.shape == ref.shape, (got64.shape, ref.shape)
+    assert np.array_equal(got64, ref), "float64 output differs from preprocess_data"
+    assert got32.dtype == np.float32
+    assert np.array_equal(got32, ref.astype(np.float32)), "float32 output differs"
+    print(f"[OK] bit-identical to preprocess_data on {len(rows)} rows")
+
+    one = rows[:1]
+    batch = rows[:args.batch]
+    ref_row = timeit(lambda: reference(one), 20)
+    enc_row = timeit(lambda: enc.transform_rows(one), 2000)
+    ref_batch = timeit(lambda: reference(batch), 5)
+    enc_batch = timeit(lambda: enc.transform_rows(batch), 200)
+
+    print(f"{'':14}{'preprocess_data':>18}{'CompiledEncoder':>18}{'speedup':>10}")
+    print(f"{'1 row':14}{ref_row * 1e6:>15.1f} us{enc_row * 1e6:>15.1f} us{ref_row / enc_row:>9.0f}x")
+    print(f"{f'{args.batch} rows':14}{ref_batch * 1e6:>15.1f} us{enc_batch * 1e6:>15.1f} us{ref_batch / enc_batch:>9.0f}x")
+    print(f"{'per row @batch':14}{ref_batch / len(batch) * 1e6:>15.2f} us"
+          f"{enc_batch / len(batch) * 1e6:>15.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Startup-to-first-epoch time with a cold and a warm feature cache.
+
+Writes an NSL-KDD-format CSV and, in a fresh process per run, calls
+train_model.train() (or train_streaming() with --stream) until the first
+epoch begins, with the cache disabled, empty (cold) and filled (warm).
+The time reported is FirstEpochTimer's, the same line train_model.py
+prints. It then checks that the cached arrays equal a fresh
+preprocessing run, that they load as read-only memmaps, and that
+changing the CSV invalidates the entry and removes the stale one.
+
+    python benchmarks/bench_feature_cache.py --rows 300000
+    python benchmarks/bench_feature_cache.py --rows 300000 --stream
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from bench_streaming_train import write_csv  # noqa: E402
+
+CHILD = r'''
+import json, os, resource, sys
+import preprocessing
+workdir = sys.argv[1]
+preprocessing.MODEL_PATH = workdir
+preprocessing.ENCODER_PATH = os.path.join(workdir, 'encoders.pkl')
+preprocessing.SCALER_PATH = os.path.join(workdir, 'scaler.pkl')
+import train_model
+
+class Reached(Exception):
+    pass
+
+class StopAtFirstEpoch(train_model.FirstEpochTimer):
+    def on_epoch_begin(self, epoch, logs=None):
+        super().on_epoch_begin(epoch, logs)
+        raise Reached(self)
+
+train_model.FirstEpochTimer = StopAtFirstEpoch
+csv, stream, use_cache = sys.argv[2], sys.argv[3] == '1', sys.argv[4] == '1'
+try:
+    if stream:
+        train_model.train_streaming(csv, use_cache=use_cache)
+    else:
+        train_model.train(csv, use_cache=use_cache)
+except Reached as reached:
+    timer = reached.args[0]
+print(json.dumps({'seconds': timer.seconds, 'cache': timer.cache_state,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+'''
+
+
+def run_child(workdir, cache_dir, csv, stream, use_cache):
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3', IDPS_FEATURE_CACHE=cache_dir,
+               PYTHONPATH=os.pathsep.join(p for p in (ROOT, os.environ.get('PYTHONPATH')) if p))
+    out = subprocess.run([sys.executable, '-c', CHILD, workdir, csv, str(int(stream)), str(int(use_cache))],
+                         capture_output=True, text=True, env=env, cwd=ROOT)
+    for line in reversed(out.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return {'error': (out.stderr.strip().splitlines() or ['killed'])[-1]}
+
+
+def check_cache(workdir, cache_dir, csv, stream):
+    """Cached arrays vs fresh preprocessing, memmap loading, and invalidation on change."""
+    os.environ['IDPS_FEATURE_CACHE'] = cache_dir
+    import preprocessing
+    preprocessing.MODEL_PATH = workdir
+    preprocessing.ENCODER_PATH = os.path.join(workdir, 'encoders.pkl')
+    preprocessing.SCALER_PATH = os.path.join(workdir, 'scaler.pkl')
+    import feature_cache
+    feature_cache.CACHE_DIR = cache_dir
+    if stream:
+        params = feature_cache.preprocessing_params(pipeline='stream', validation_split=preprocessing.VALIDATION_SPLIT,
+                                                    seed=preprocessing.SPLIT_SEED, dtype='float32')
+    else:
+        params = feature_cache.preprocessing_params(pipeline='memory', test_size=0.2, random_state=42,
+                                                    dtype='float32')
+    cache = feature_cache.FeatureCache(csv, params, cache_dir)
+    if not cache.lookup():
+        return {'error': 'no entry after the cold run'}
+    arrays = cache.load(restore_preprocessors=False)
+    result = {'memmap': all(isinstance(a, np.memmap) and not a.flags.writeable for a in arrays.values())}
+
+    if stream:
+        encoders, scaler, _ = preprocessing.fit_streaming(csv)
+        parts = {'train': [], 'val': []}
+        for X, y, mask in preprocessing.encoded_chunks(csv, encoders, scaler):
+            parts['train'].append(X[~mask])
+            parts['val'].append(X[mask])
+        fresh = {'X_train': np.concatenate(parts['train']), 'X_val': np.concatenate(parts['val'])}
+    else:
+        from sklearn.model_selection import train_test_split
+        X, y = preprocessing.preprocess_data(preprocessing.load_data(csv), is_training=True)
+        X_train, X_val, _, _ = train_test_split(X.astype(np.float32), y, test_size=0.2, random_state=42)
+        fresh = {'X_train': X_train, 'X_val': X_val}
+    result['identical'] = all(np.array_equal(arrays[k], v) for k, v in fresh.items())
+
+    old_path = cache.path
+    del arrays
+    with open(csv, 'a') as f:
+        f.write('0,tcp,http,SF,1,1' + ',0' * 35 + ',normal,21\n')
+    changed = feature_cache.FeatureCache(csv, params, cache_dir)
+    result['miss_after_change'] = changed.lookup() is None
+    writer = changed.writer()
+    for name in feature_cache.ARRAYS:
+        writer.save(name, np.zeros(1, dtype=np.float32))
+    writer.commit(rows=1)
+    result['stale_removed'] = not os.path.exists(old_path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup-to-first-epoch time, cold vs warm feature cache.")
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--stream', action='store_true', help='use the chunked train_streaming() path')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    cache_dir = os.path.join(workdir, 'cache')
+    csv = os.path.join(workdir, 'train.csv')
+    write_csv(csv, args.rows)
+    size = os.path.getsize(csv) / 2**20
+    print(f"{args.rows} rows ({size:.0f} MB), {'streaming' if args.stream else 'in-memory'} pipeline\n")
+    print(f"{'run':12}{'cache':>8}{'to first epoch s':>18}{'peak RSS MB':>13}")
+    for name, use_cache in (('no cache', False), ('cold', True), ('warm', True), ('warm again', True)):
+        r = run_child(workdir, cache_dir, csv, args.stream, use_cache)
+        if 'error' in r:
+            print(f"{name:12}  failed: {r['error']}")
+            continue
+        print(f"{name:12}{r['cache']:>8}{r['seconds']:>18.2f}{r['peak_rss_mb']:>13.0f}")
+    entry_mb = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(cache_dir) for f in fs) / 2**20
+    print(f"\nCache size: {entry_mb:.0f} MB")
+    print("Cache checks:", check_cache(workdir, cache_dir, csv, args.stream))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Throughput and memory benchmark for flow_table.FlowTable.
+
+Feeds synthetic traffic (long-lived HTTP flows, a SYN flood with random
+source ports, a port scan and a UDP flood) straight into FlowTable.update,
+bypassing packet capture, and reports packets/s plus table sizes and RSS
+per chunk so unbounded growth is easy to spot.
+
+    python benchmarks/bench_flow_table.py --packets 2000000 --rate 100000
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flow_table import FlowTable, SYN, ACK, RST  # noqa: E402
+
+
+def synthetic_packets(n, rate, seed=1):
+    """Yield (ts, src, dst, proto, sport, dport, flags, payload_len) tuples at `rate` packets/s of simulated time."""
+    rnd = random.Random(seed)
+    servers = [f"10.0.0.{i}" for i in range(1, 21)]
+    clients = [f"192.168.{i // 250}.{i % 250 + 1}" for i in range(2000)]
+    victim = "10.0.0.80"
+    ts = 1_700_000_000.0
+    step = 1.0 / rate
+    for i in range(n):
+        ts += step
+        r = rnd.random()
+        if r < 0.5:
+            # Established HTTP flows: a bounded population of client ports
+            c = rnd.choice(clients)
+            s = rnd.choice(servers)
+            sport = 40000 + rnd.randrange(64)
+            if rnd.random() < 0.5:
+                yield (ts, c, s, 'tcp', sport, 80, ACK, rnd.randrange(0, 1400))
+            else:
+                yield (ts, s, c, 'tcp', 80, sport, ACK, rnd.randrange(0, 1400))
+        elif r < 0.75:
+            # SYN flood: spoofed sources, random source ports
+            src = f"172.16.{rnd.randrange(256)}.{rnd.randrange(256)}"
+            yield (ts, src, victim, 'tcp', rnd.randrange(1024, 65535), 80, SYN, 0)
+        elif r < 0.85:
+            # Port scan with RST replies
+            port = rnd.randrange(1, 1024)
+            if rnd.random() < 0.5:
+                yield (ts, "192.168.99.9", victim, 'tcp', 55555, port, SYN, 0)
+            else:
+                yield (ts, victim, "192.168.99.9", 'tcp', port, 55555, RST | ACK, 0)
+        else:
+            # UDP flood
+            src = f"172.17.{rnd.randrange(256)}.{rnd.randrange(256)}"
+            yield (ts, src, victim, 'udp', rnd.randrange(1024, 65535), 53, 0, 512)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--packets', type=int, default=1_000_000)
+    parser.add_argument('--rate', type=float, default=100_000,
+                        help='simulated packet rate (sets timestamp spacing)')
+    parser.add_argument('--chunks', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"Generating {args.packets} synthetic packets...")
+    packets = list(synthetic_packets(args.packets, args.rate))
+    table = FlowTable()
+    update = table.update
+
+    chunk = max(1, len(packets) // args.chunks)
+    total_start = time.perf_counter()
+    print(f"{'packets':>10} {'pkt/s':>10} {'conns':>8} {'2s-win':>8} {'rss_mb':>8}")
+    for start in range(0, len(packets), chunk):
+        part = packets[start:start + chunk]
+        t0 = time.perf_counter()
+        for ts, src, dst, proto, sport, dport, flags, length in part:
+            update(ts, src, dst, proto, sport, dport, flags, length)
+        dt = time.perf_counter() - t0
+        st = table.stats()
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{start + len(part):>10} {len(part) / dt:>10.0f} {st['connections']:>8} "
+              f"{st['time_window_connections']:>8} {rss:>8.1f}")
+    total = time.perf_counter() - total_start
+    print(f"Overall: {len(packets) / total:.0f} packets/s; {table.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Detection under synthetic load, up to saturation.
+
+Offers traffic_gen.py's mix (normal HTTP sessions plus SYN flood, port
+scan and UDP flood hosts) to this process's pipeline through
+sniffer.frame_callback at each --rates packets/s (0: as fast as the
+capture loop takes them), for --seconds each, with the capture queue
+and inference worker set up as start_sniffer does. Hosts are flagged but
+not blocked (--block to block them), so every packet goes through
+analysis rather than the blocklist fast path. For each rate this reports
+the offered rate, the capture loop's cost per packet, what was shed, how
+long the backlog took to drain and how soon each attacking host was
+flagged.
+
+It then checks the simulation-mode feed: sniffer.simulation_mode_sniffer
+listens on a local UDP port and traffic_gen.send_frames sends --socket-packets
+frames to it, reporting how many arrived and at what rate.
+
+    python benchmarks/bench_loadtest.py --rates 10000,25000,50000,100000,0 --seconds 5
+"""
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+_workdir = tempfile.mkdtemp(prefix='idps-load-')
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ['IDPS_DB_PATH'] = os.path.join(_workdir, 'load.db')
+os.environ.setdefault('IDPS_INFERENCE_BACKEND', 'numpy')
+os.environ.setdefault('IDPS_WARMUP', '0')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import sniffer  # noqa: E402
+import traffic_gen  # noqa: E402
+
+
+def socket_feed(packets, rate, port):
+    """Send `packets` frames to simulation_mode_sniffer on 127.0.0.1:`port`; returns (sent, received, seconds)."""
+    received = [0]
+    callback = sniffer.frame_callback
+
+    def counting_callback(frame, ts):
+        received[0] += 1
+        callback(frame, ts)
+
+    address = f'127.0.0.1:{port}'
+    sniffer.frame_callback = counting_callback
+    sniffer.running = True
+    listener = threading.Thread(target=sniffer.simulation_mode_sniffer, args=(address,), daemon=True)
+    listener.start()
+    time.sleep(0.2)
+    sniffer.start_inference_worker()
+    sniffer.start_capture_queue(sniffer.CAPTURE_QUEUE_SIZE)
+    try:
+        sent, elapsed = traffic_gen.send_frames(traffic_gen.TrafficGenerator(seed=3).frames(packets), address, rate)
+        time.sleep(0.5) # let the listener empty the socket buffer
+    finally:
+        sniffer.running = False
+        listener.join()
+        sniffer.frame_callback = callback
+        sniffer.stop_capture_queue()
+        sniffer.stop_inference_worker()
+    return sent, received[0], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection under synthetic load, up to saturation.")
+    parser.add_argument('--rates', default='10000,25000,50000,100000,0',
+                        help='comma-separated packets/s (0: as fast as possible)')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--mix', default=traffic_gen.DEFAULT_MIX)
+    parser.add_argument('--policy', help='capture queue shed policy (default IDPS_SHED_POLICY)')
+    parser.add_argument('--block', action='store_true', help='block flagged hosts as the live sniffer does')
+    parser.add_argument('--socket-packets', type=int, default=50000, help='frames for the UDP feed check (0: skip)')
+    parser.add_argument('--socket-rate', type=float, default=20000)
+    parser.add_argument('--port', type=int, default=19999)
+    args = parser.parse_args()
+
+    sniffer.VERBOSE_ALERTS = False
+    gen = traffic_gen.TrafficGenerator(args.mix)
+    print(f"mix {args.mix}, {args.seconds:g} s per rate, blocking {'on' if args.block else 'off'}, "
+          f"capture queue {sniffer.CAPTURE_QUEUE_SIZE} ({args.policy or 'default policy'})\n")
+    print(f"{'target':>10}{'offered':>10}{'capture us':>12}{'analysed':>10}{'shed':>9}{'drain s':>9}"
+          f"{'detect ms':>11}  result")
+    for rate in (float(r) for r in args.rates.split(',')):
+        database.clear_all_logs()
+        r = traffic_gen.load_test(gen, rate, args.seconds, policy=args.policy, block=args.block)
+        delays = [a['detect_ms_max'] for a in r['attacks'].values() if a['detected']]
+        detected = sum(a['detected'] for a in r['attacks'].values())
+        sources = sum(a['sources'] for a in r['attacks'].values())
+        target = f"{rate:.0f}" if rate > 0 else 'max'
+        detect = f"{max(delays):.1f}" if delays else '-'
+        print(f"{target:>10}{r['offered_pps']:>10.0f}{r['capture_us']:>12.1f}{r['analysed']:>10}{r['shed']:>9}"
+              f"{r['drain_s']:>9.2f}{detect:>11}  {'kept up' if r['kept_up'] else 'saturated'}, "
+              f"{detected}/{sources} attack hosts flagged")
+    print("\n(detect ms: worst time from an attacking host's first packet to its first alert)")
+
+    if args.socket_packets:
+        sent, received, elapsed = socket_feed(args.socket_packets, args.socket_rate, args.port)
+        print(f"\nUDP feed: sent {sent} frames at {sent / elapsed:.0f} pkt/s, "
+              f"simulation_mode_sniffer received {received} ({received / max(sent, 1):.1%})")
+
+
+if __name__ == '__main__':
+    main()
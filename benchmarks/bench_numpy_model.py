@@ -0,0 +1,109 @@
+"""
+Benchmark the Keras and NumPy inference backends against each other.
+
+Each backend runs in a fresh subprocess, so the load time and resident
+memory include everything that backend imports. The script reports the
+load time, peak RSS, batch-1 latency and batch-256 throughput, plus the
+max absolute difference between the two backends' outputs on the same
+real encoded rows.
+
+    python benchmarks/bench_numpy_model.py --rows 4096
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child process; prints one JSON line
+CHILD = r'''
+import json, resource, sys, time
+t0 = time.perf_counter()
+import numpy as np
+sys.path.insert(0, ROOT)
+if BACKEND == 'numpy':
+    from numpy_model import NumpyCNN
+    model = NumpyCNN.load()
+else:
+    from tensorflow.keras.models import load_model
+    model = load_model(ROOT + '/model/cnn_model.h5')
+load_s = time.perf_counter() - t0
+
+X = np.load(INPUT)
+predict = model.predict_on_batch
+predict(X[:256])  # warm-up
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+single = best(lambda: predict(X[:1]), 200)
+t = time.perf_counter()
+for i in range(0, len(X), 256):
+    predict(X[i:i + 256])
+batch_s = time.perf_counter() - t
+out = np.asarray(predict(X)).reshape(-1)
+np.save(OUTPUT, out)
+print(json.dumps({
+    'load_s': load_s,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'single_us': single * 1e6,
+    'rows_per_s': len(X) / batch_s,
+}))
+'''
+
+
+def run_backend(backend, input_path, output_path):
+    code = (f"ROOT = {ROOT!r}\nBACKEND = {backend!r}\nINPUT = {input_path!r}\n"
+            f"OUTPUT = {output_path!r}\n" + CHILD)
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env)
+    if out.returncode != 0:
+        sys.exit(f"{backend} run failed:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=4096)
+    parser.add_argument('--tolerance', type=float, default=1e-5)
+    args = parser.parse_args()
+
+    import numpy as np
+    sys.path.append(ROOT)
+    from bench_encoder import sample_rows
+    from preprocessing import CompiledEncoder
+    encoder = CompiledEncoder.load(os.path.join(ROOT, 'model', 'encoders.pkl'),
+                                   os.path.join(ROOT, 'model', 'scaler.pkl'))
+    X = encoder.transform_rows(sample_rows(args.rows))
+
+    tmp = os.path.join(ROOT, 'benchmarks', '.bench_numpy_model')
+    os.makedirs(tmp, exist_ok=True)
+    input_path = os.path.join(tmp, 'input.npy')
+    np.save(input_path, X)
+
+    results, outputs = {}, {}
+    for backend in ('keras', 'numpy'):
+        output_path = os.path.join(tmp, f'{backend}.npy')
+        results[backend] = run_backend(backend, input_path, output_path)
+        outputs[backend] = np.load(output_path)
+
+    print(f"{'backend':10}{'load (s)':>10}{'RSS (MB)':>10}{'batch-1 (us)':>14}{'rows/s @256':>14}")
+    for backend, r in results.items():
+        print(f"{backend:10}{r['load_s']:>10.2f}{r['rss_mb']:>10.0f}{r['single_us']:>14.0f}"
+              f"{r['rows_per_s']:>14.0f}")
+    diff = float(np.abs(outputs['keras'] - outputs['numpy']).max())
+    flips = int(((outputs['keras'] > 0.5) != (outputs['numpy'] > 0.5)).sum())
+    print(f"\nMax |keras - numpy| over {args.rows} rows: {diff:.3e}; verdict flips: {flips}")
+    if diff > args.tolerance:
+        sys.exit(f"Outputs differ by more than {args.tolerance}")
+
+
+if __name__ == '__main__':
+    main()
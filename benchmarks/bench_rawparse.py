@@ -0,0 +1,175 @@
+"""
+Check rawparse against scapy and measure the per-packet parse cost.
+
+Every frame of a capture is parsed twice: by rawparse.parse_frame, and by
+full scapy dissection followed by sniffer.packet_fields (the scapy capture
+path). The two PacketFields records must be identical; frames rawparse
+hands back to scapy (Unsupported) are counted separately. Without --pcap a
+mixed capture is generated: TCP with options, minimum-size frames with
+Ethernet padding, UDP services, ICMP queries and errors, IP options,
+fragments, VLAN and QinQ tags, IPv6, ARP, tunnels, PPPoE and frames cut
+short by a snap length.
+
+    python benchmarks/bench_rawparse.py
+    python benchmarks/bench_rawparse.py --pcap capture.pcap
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sniffer  # noqa: E402
+from rawparse import Unsupported, parse_frame  # noqa: E402
+from replay import pcap_records  # noqa: E402
+
+from scapy.all import (Ether, Dot1Q, Dot1AD, IP, IPv6, TCP, UDP, ICMP, ARP, GRE, DNS, DNSQR,  # noqa: E402
+                       Raw, PPPoE, PPP, IPOption_RR, wrpcap)
+from scapy.layers.vxlan import VXLAN  # noqa: E402
+
+MIN_FRAME = 60 # Ethernet minimum without FCS; shorter frames are padded on the wire
+
+
+def _frame(pkt, snaplen=None):
+    raw = bytes(pkt)
+    if len(raw) < MIN_FRAME:
+        raw += b'\x00' * (MIN_FRAME - len(raw))
+    return raw[:snaplen] if snaplen else raw
+
+
+def mixed_frames(n, seed=7):
+    """n Ethernet frames drawn from a weighted mix of ordinary and awkward packets."""
+    rnd = random.Random(seed)
+
+    def host():
+        return f"10.{rnd.randrange(4)}.{rnd.randrange(256)}.{rnd.randrange(1, 255)}"
+
+    def port():
+        return rnd.randrange(1024, 65536)
+
+    kinds = [
+        (30, lambda: Ether() / IP(src=host(), dst=host()) / TCP(sport=port(), dport=443, flags='PA')
+         / Raw(b'x' * rnd.randrange(1, 1400))),
+        (10, lambda: Ether() / IP(src=host(), dst=host()) / TCP(sport=port(), dport=80, flags='S',
+         options=[('MSS', 1460), ('SAckOK', b''), ('Timestamp', (1, 0)), ('WScale', 7)])),
+        (10, lambda: Ether() / IP(src=host(), dst=host()) / TCP(sport=port(), dport=22, flags='A')),
+        (5, lambda: Ether() / IP(src=host(), dst=host()) / TCP(sport=port(), dport=port(), flags='R')),
+        (10, lambda: Ether() / IP(src=host(), dst=host()) / UDP(sport=port(), dport=53)
+         / DNS(qd=DNSQR(qname=f"host{rnd.randrange(100)}.example."))),
+        (5, lambda: Ether() / IP(src=host(), dst=host()) / UDP(sport=123, dport=123) / Raw(b'n' * 48)),
+        (5, lambda: Ether() / IP(src=host(), dst=host()) / UDP(sport=port(), dport=port()) / Raw(b'u' * 3)),
+        (5, lambda: Ether() / IP(src=host(), dst=host()) / ICMP(type=8) / Raw(b'p' * 56)),
+        (2, lambda: Ether() / IP(src=host(), dst=host()) / ICMP(type=13)),
+        (2, lambda: Ether() / IP(src=host(), dst=host()) / ICMP(type=17)),
+        (3, lambda: Ether() / IP(src=host(), dst=host()) / ICMP(type=3, code=3)
+         / IP(src=host(), dst=host()) / UDP(sport=port(), dport=53)),
+        (2, lambda: Ether() / IP(src=host(), dst=host()) / ICMP(type=11)
+         / IP(src=host(), dst=host()) / TCP(sport=port(), dport=80)),
+        (2, lambda: Ether() / IP(src=host(), dst=host(), options=[IPOption_RR()])
+         / TCP(sport=port(), dport=80, flags='S')),
+        (2, lambda: Ether() / IP(src=host(), dst=host(), flags='MF', proto=17)
+         / Raw(b'f' * rnd.choice((64, 100)))),
+        (2, lambda: Ether() / IP(src=host(), dst=host(), frag=rnd.randrange(1, 8200), proto=6)
+         / Raw(b'g' * rnd.randrange(8, 600))),
+        (3, lambda: Ether() / Dot1Q(vlan=10) / IP(src=host(), dst=host()) / TCP(sport=port(), dport=443)),
+        (1, lambda: Ether() / Dot1AD(vlan=5) / Dot1Q(vlan=10) / IP(src=host(), dst=host())
+         / UDP(sport=port(), dport=161) / Raw(b's' * 20)),
+        (1, lambda: Ether() / IP(src=host(), dst=host(), proto=50) / Raw(b'e' * 80)),
+        (3, lambda: Ether() / IPv6() / TCP(sport=port(), dport=443)),
+        (3, lambda: Ether() / ARP()),
+        (1, lambda: Ether() / IP(src=host(), dst=host()) / IP(src=host(), dst=host())
+         / TCP(sport=port(), dport=80)),
+        (1, lambda: Ether() / IP(src=host(), dst=host()) / GRE() / IP(src=host(), dst=host())
+         / UDP(sport=port(), dport=53)),
+        (1, lambda: Ether() / IP(src=host(), dst=host()) / UDP(sport=port(), dport=4789) / VXLAN()
+         / Ether() / IP(src=host(), dst=host()) / TCP(sport=port(), dport=80)),
+        (1, lambda: Ether() / PPPoE() / PPP() / IP(src=host(), dst=host()) / TCP(sport=port(), dport=80)),
+    ]
+    weights = [w for w, _ in kinds]
+    frames = []
+    for _ in range(n):
+        build = rnd.choices(kinds, weights)[0][1]
+        # A few frames are cut short, as with a capture snap length
+        snaplen = rnd.choice((34, 40, 54, 64)) if rnd.random() < 0.02 else None
+        frames.append(_frame(build(), snaplen))
+    return frames
+
+
+def scapy_fields(raw, ts):
+    packet = Ether(raw)
+    packet.time = ts
+    return sniffer.packet_fields(packet) if IP in packet else None
+
+
+def per_packet_ns(fn, items, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for item in items:
+            fn(*item)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(items) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rawparse correctness (vs scapy) and parse cost.")
+    parser.add_argument('--pcap', help='check this capture instead of a generated one')
+    parser.add_argument('--packets', type=int, default=20000)
+    args = parser.parse_args()
+
+    sniffer.load_scapy()
+    path = args.pcap
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'mixed.pcap')
+        wrpcap(path, [Ether(f) for f in mixed_frames(args.packets)])
+        print(f"Wrote {args.packets} frames to {path}")
+    records = [(ts, rec) for ts, rec in pcap_records(path) if rec[1] == 1]
+    items = [(frame, ts) for ts, (frame, _) in records]
+    print(f"{len(items)} Ethernet frames\n")
+
+    outcome = Counter()
+    mismatches = []
+    handled = [] # frames rawparse decodes itself
+    for frame, ts in items:
+        expected = scapy_fields(frame, ts)
+        try:
+            got = parse_frame(frame, ts)
+        except Unsupported as e:
+            outcome[f'scapy fallback: {e}'] += 1
+            continue
+        handled.append((frame, ts))
+        if got == expected:
+            outcome['identical' if got is not None else 'identical (not IPv4)'] += 1
+        else:
+            outcome['MISMATCH'] += 1
+            mismatches.append((Ether(frame).summary(), expected, got))
+
+    for what, count in outcome.most_common():
+        print(f"  {what:48}{count:>8}{count / len(items):>9.1%}")
+    for summary, expected, got in mismatches[:10]:
+        print(f"\n  {summary}\n    scapy:    {expected}\n    rawparse: {got}")
+
+    def raw_path(frame, ts):
+        try:
+            return parse_frame(frame, ts)
+        except Unsupported:
+            return scapy_fields(frame, ts)
+
+    dissect = per_packet_ns(lambda frame, ts: Ether(frame), items)
+    scapy_ns = per_packet_ns(scapy_fields, items)
+    raw_ns = per_packet_ns(raw_path, items)
+    print(f"\n{'parse cost per packet':36}{'ns':>10}")
+    print(f"{'scapy dissection only':36}{dissect:>10.0f}")
+    print(f"{'scapy + packet_fields':36}{scapy_ns:>10.0f}")
+    print(f"{'rawparse, scapy fallback':36}{raw_ns:>10.0f}   ({scapy_ns / raw_ns:.0f}x faster)")
+    if handled:
+        print(f"{'rawparse, frames it decodes':36}{per_packet_ns(parse_frame, handled):>10.0f}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Correctness check and benchmark for bulk scoring (score.py).
+
+On a generated NSL-KDD-format file (with services and flags the model
+never saw) this checks that CompiledEncoder.transform_frame equals
+preprocess_data(is_training=False) when unseen values map to 0, and that
+the reserved code differs from every real class. It then times the
+categorical encoding (the former per-row lookup in preprocess_data vs
+the vectorized one) and score.py end to end for a few worker counts.
+
+    python benchmarks/bench_score.py --rows 200000 --workers 1,2,4
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import score  # noqa: E402
+from preprocessing import CAT_COLS, COL_NAMES, ENCODER_PATH, CompiledEncoder, preprocess_data  # noqa: E402
+from bench_streaming_train import write_csv  # noqa: E402
+
+
+def per_row_encode(df, encoders):
+    """Categorical encoding as preprocess_data(is_training=False) did it before: one lookup per value."""
+    df = df.copy()
+    for col in CAT_COLS:
+        le = encoders[col]
+        df[col] = df[col].map(lambda s: le.transform([s])[0] if s in le.classes_ else 0)
+    return df
+
+
+def vectorized_encode(df, encoders):
+    df = df.copy()
+    for col in CAT_COLS:
+        codes = pd.Index(encoders[col].classes_).get_indexer(df[col])
+        df[col] = np.where(codes < 0, 0, codes)
+    return df
+
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk scoring correctness and throughput.")
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--workers', default='1,2,4')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'records.csv')
+    write_csv(path, args.rows)
+    print(f"{args.rows} records ({os.path.getsize(path) / 2**20:.0f} MB), {os.cpu_count()} CPU(s)\n")
+
+    sample = score.parse_block(b''.join(list(open(path, 'rb'))[:20000]), len(COL_NAMES))
+    zero = CompiledEncoder.load(unseen_code=0)
+    X_frame, unseen = zero.transform_frame(sample[COL_NAMES[:-1]], dtype=np.float64)
+    X_ref, _ = preprocess_data(sample.copy(), is_training=False)
+    print(f"transform_frame vs preprocess_data: max diff {np.abs(X_frame - X_ref).max():.3g}; "
+          f"unseen values {unseen}")
+    reserved = CompiledEncoder.load(unseen_code=CompiledEncoder.UNSEEN_RESERVED)
+    codes = [u for _, _, u in reserved.lookups]
+    sizes = [len(c) for c in reserved.classes]
+    print(f"reserved codes {codes} (classes per column {sizes})\n")
+
+    with open(ENCODER_PATH, 'rb') as f:
+        encoders = pickle.load(f)
+    small = sample.iloc[:5000]
+    slow = best_of(lambda: per_row_encode(small, encoders), repeat=1) / len(small)
+    fast = best_of(lambda: vectorized_encode(small, encoders)) / len(small)
+    print(f"{'categorical encoding':28}{'us/row':>10}")
+    print(f"{'per-row lookup (before)':28}{slow * 1e6:>10.2f}")
+    print(f"{'Index.get_indexer (now)':28}{fast * 1e6:>10.2f}   ({slow / fast:.0f}x)\n")
+
+    print(f"{'score.py':28}{'rows/s':>10}{'seconds':>10}")
+    for workers in (int(w) for w in args.workers.split(',')):
+        out = path + f'.{workers}.out'
+        s = score.score_file(path, out, workers=workers)
+        print(f"{f'{workers} worker(s)':28}{s['rows_per_s']:>10.0f}{s['elapsed_s']:>10.2f}")
+        os.remove(out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Dashboard startup profile.
+
+Imports app.py in a fresh interpreter under `python -X importtime` and
+reports the total import time, the slowest top-level imports, and whether
+TensorFlow/scapy were pulled in. A second fresh interpreter measures the
+time until the first /api/stats response, and then the deferred cost of
+sniffer.load_detector().
+
+    python benchmarks/bench_startup.py --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('tensorflow', 'keras', 'scapy')
+
+FIRST_RESPONSE = r'''
+import json, time
+t0 = time.perf_counter()
+import app
+client = app.app.test_client()
+data = client.get('/api/stats').get_json()
+first = time.perf_counter() - t0
+import sniffer
+t1 = time.perf_counter()
+sniffer.load_detector()
+print(json.dumps({'first_response_s': first, 'model_before': data['model']['state'],
+                  'load_detector_s': time.perf_counter() - t1}))
+'''
+
+
+def _env():
+    return dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3', PYTHONPATH=ROOT)
+
+
+def import_profile():
+    """Returns (wall seconds, [(cumulative_us, self_us, module)], imported module names)."""
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                         cwd=ROOT, capture_output=True, text=True, env=_env())
+    wall = time.perf_counter() - t0
+    if out.returncode != 0:
+        sys.exit(f"import app failed:\n{out.stderr}")
+    entries = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return wall, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile dashboard (app.py) startup.")
+    parser.add_argument('--top', type=int, default=10, help='show this many of the slowest imports')
+    args = parser.parse_args()
+
+    wall, entries = import_profile()
+    names = {name.strip() for _, _, name in entries}
+    # Nesting is two spaces per level after the leading space; keep app and its direct imports
+    depth = lambda name: (len(name) - len(name.lstrip()) - 1) // 2
+    total_us = sum(c for c, _, name in entries if depth(name) == 0)
+    top_level = sorted((e for e in entries if depth(e[2]) <= 1), reverse=True)
+
+    print(f"import app: {total_us / 1e6:.2f} s of imports ({wall:.2f} s wall incl. interpreter)")
+    print(f"\n{'cumulative (ms)':>16}{'self (ms)':>11}  module")
+    for cumulative, self_us, name in top_level[:args.top]:
+        print(f"{cumulative / 1000:>16.1f}{self_us / 1000:>11.1f}  {name[1:]}")
+    for pkg in HEAVY:
+        print(f"{pkg:>12} imported at startup: {'yes' if pkg in names else 'no'}")
+
+    out = subprocess.run([sys.executable, '-c', FIRST_RESPONSE], cwd=ROOT,
+                         capture_output=True, text=True, env=_env())
+    if out.returncode != 0:
+        sys.exit(f"first-response run failed:\n{out.stderr}")
+    r = json.loads(out.stdout.strip().splitlines()[-1])
+    print(f"\nFirst /api/stats response: {r['first_response_s'] * 1000:.0f} ms "
+          f"(model state: {r['model_before']})")
+    print(f"Deferred load_detector():  {r['load_detector_s']:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Peak memory of the in-memory vs streaming training data pipelines.
+
+Writes NSL-KDD-format CSVs of increasing size, then, in a fresh process
+per run, takes each file from disk to the last training batch:
+
+  memory: load_data + preprocess_data + train_test_split, then the arrays
+          batched by tf.data (what model.fit does with train()'s arrays)
+  stream: fit_streaming (pass 1) + make_dataset (pass 2), the
+          train_model.py --stream path
+
+and reports wall time and peak RSS. No model is trained. It also checks
+that fit_streaming's encoders and scaler match preprocess_data's on the
+same file, and that encode_chunk gives the same inputs.
+
+    python benchmarks/bench_streaming_train.py --rows 200000,1000000,3000000
+"""
+import argparse
+import json
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import preprocessing  # noqa: E402
+
+SERVICES = ['http', 'private', 'domain_u', 'smtp', 'ftp_data', 'ecr_i', 'eco_i', 'telnet', 'finger',
+            'ftp', 'auth', 'pop_3', 'imap4', 'ssh', 'ntp_u', 'urp_i', 'other'] + [f'svc{i}' for i in range(50)]
+FLAGS = ['SF', 'S0', 'REJ', 'RSTR', 'RSTO', 'SH', 'S1', 'S2', 'S3', 'OTH', 'RSTOS0']
+LABELS = ['normal'] * 6 + ['neptune', 'smurf', 'portsweep', 'satan', 'ipsweep', 'back', 'warezclient']
+WRITE_BLOCK = 100000
+
+
+def write_csv(path, rows, seed=1):
+    """NSL-KDD-like rows (41 features, label, difficulty), generated and written in blocks."""
+    rng = np.random.default_rng(seed)
+    with open(path, 'w') as f:
+        for start in range(0, rows, WRITE_BLOCK):
+            n = min(WRITE_BLOCK, rows - start)
+            cols = [rng.integers(0, 60000, n).astype(str),
+                    rng.choice(['tcp', 'udp', 'icmp'], n, p=[0.8, 0.12, 0.08]),
+                    rng.choice(SERVICES, n), rng.choice(FLAGS, n),
+                    rng.lognormal(6, 2, n).astype(np.int64).astype(str),
+                    rng.lognormal(5, 3, n).astype(np.int64).astype(str)]
+            for _ in range(16): # land .. is_guest_login: small counters/booleans
+                cols.append(rng.integers(0, 3, n).astype(str))
+            for _ in range(2):  # count, srv_count
+                cols.append(rng.integers(0, 512, n).astype(str))
+            for _ in range(7):  # window rates
+                cols.append(np.round(rng.random(n), 2).astype(str))
+            for _ in range(2):  # dst_host_count, dst_host_srv_count
+                cols.append(rng.integers(0, 256, n).astype(str))
+            for _ in range(8):  # dst_host rates
+                cols.append(np.round(rng.random(n), 2).astype(str))
+            cols.append(rng.choice(LABELS, n))
+            cols.append(rng.integers(0, 22, n).astype(str))
+            lines = [','.join(r) for r in zip(*cols)]
+            f.write('\n'.join(lines))
+            f.write('\n')
+
+
+def _redirect_outputs(workdir):
+    preprocessing.MODEL_PATH = workdir
+    preprocessing.ENCODER_PATH = os.path.join(workdir, 'encoders.pkl')
+    preprocessing.SCALER_PATH = os.path.join(workdir, 'scaler.pkl')
+
+
+def child(mode, csv, workdir, batch_size):
+    import tensorflow as tf # imported in both modes: same baseline
+    _redirect_outputs(workdir)
+    t0 = time.perf_counter()
+    batches = 0
+    if mode == 'memory':
+        from sklearn.model_selection import train_test_split
+        df = preprocessing.load_data(csv)
+        X, y = preprocessing.preprocess_data(df, is_training=True)
+        del df
+        X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+        for _ in tf.data.Dataset.from_tensor_slices((X_train, y_train)).batch(batch_size):
+            batches += 1
+    else:
+        import train_model
+        encoders, scaler, stats = preprocessing.fit_streaming(csv)
+        ds = train_model.make_dataset(csv, encoders, scaler, 'train', stats['train_rows'],
+                                      batch_size=batch_size)
+        for _ in ds:
+            batches += 1
+    print(json.dumps({'seconds': time.perf_counter() - t0, 'batches': batches,
+                      'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def run_child(mode, csv, workdir, batch_size):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, '--csv', csv,
+                          '--workdir', workdir, '--batch-size', str(batch_size)],
+                         capture_output=True, text=True)
+    for line in reversed(out.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return {'error': (out.stderr.strip().splitlines() or ['killed'])[-1]}
+
+
+def check_equivalence(csv, workdir):
+    """Largest differences between the in-memory and streaming fits on the same file."""
+    _redirect_outputs(workdir)
+    df = preprocessing.load_data(csv)
+    X, _ = preprocessing.preprocess_data(df.copy(), is_training=True)
+    with open(preprocessing.ENCODER_PATH, 'rb') as f:
+        enc_mem = pickle.load(f)
+    with open(preprocessing.SCALER_PATH, 'rb') as f:
+        sc_mem = pickle.load(f)
+    enc, sc, _ = preprocessing.fit_streaming(csv, chunksize=7777)
+    same_classes = all(list(enc[c].classes_) == list(enc_mem[c].classes_) for c in preprocessing.CAT_COLS)
+    Xs, _ = preprocessing.encode_chunk(df, enc, sc, dtype=np.float64)
+    return {
+        'same_classes': same_classes,
+        'mean_rel_diff': float(np.max(np.abs(sc.mean_ - sc_mem.mean_) / sc_mem.scale_)),
+        'scale_rel_diff': float(np.max(np.abs(sc.scale_ / sc_mem.scale_ - 1))),
+        'input_max_diff': float(np.max(np.abs(Xs - X))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory use of in-memory vs streaming training input.")
+    parser.add_argument('--rows', default='200000,1000000,3000000')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--child')
+    parser.add_argument('--csv')
+    parser.add_argument('--workdir')
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.csv, args.workdir, args.batch_size)
+        return
+
+    workdir = tempfile.mkdtemp()
+    small = os.path.join(workdir, 'small.csv')
+    write_csv(small, 50000, seed=2)
+    print("Streaming fit vs in-memory fit (50000 rows):", check_equivalence(small, workdir))
+
+    print(f"\n{'rows':>10}{'file MB':>9}{'mode':>8}{'seconds':>9}{'peak RSS MB':>13}{'batches':>9}")
+    for rows in (int(r) for r in args.rows.split(',')):
+        csv = os.path.join(workdir, f'train_{rows}.csv')
+        write_csv(csv, rows)
+        size = os.path.getsize(csv) / 2**20
+        for mode in ('memory', 'stream'):
+            r = run_child(mode, csv, workdir, args.batch_size)
+            if 'error' in r:
+                print(f"{rows:>10}{size:>9.0f}{mode:>8}  failed: {r['error']}")
+                continue
+            print(f"{rows:>10}{size:>9.0f}{mode:>8}{r['seconds']:>9.1f}{r['peak_rss_mb']:>13.0f}{r['batches']:>9}")
+        os.remove(csv)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Hit rate and throughput gain of the verdict cache on replayed traffic.
+
+Replays a pcap (dry run, no alerts written) with the cache disabled, then
+enabled, and optionally with src_bytes quantized, starting each run from a
+fresh FlowTable. Without --pcap it writes a steady-state capture: hosts
+polling DNS, NTP and a monitoring ping at fixed intervals, the kind of
+traffic where the window features settle and feature rows repeat.
+
+    python benchmarks/bench_verdict_cache.py
+    python benchmarks/bench_verdict_cache.py --pcap capture.pcap --src-bytes-bucket 64
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import replay  # noqa: E402
+import sniffer  # noqa: E402
+from flow_table import FlowTable  # noqa: E402
+from verdict_cache import CACHE_SIZE  # noqa: E402
+
+
+def write_steady_pcap(path, seconds=120, hosts=40, seed=3):
+    """Periodic DNS/NTP/ICMP from `hosts` clients, each on its own phase within every second."""
+    from scapy.all import IP, UDP, ICMP, Raw
+    from scapy.utils import PcapWriter
+    rnd = random.Random(seed)
+    phases = [rnd.random() for _ in range(hosts)]
+    packets = []
+    for sec in range(seconds):
+        for h, phase in enumerate(phases):
+            client = f"10.20.0.{h + 10}"
+            ts = 1_700_000_000 + sec + phase
+            sport = rnd.randrange(20000, 60000) # resolver source-port randomisation
+            packets.append((ts, IP(src=client, dst="10.20.0.1") / UDP(sport=sport, dport=53)
+                            / Raw(b'q' * 32)))
+            packets.append((ts + 0.002, IP(src="10.20.0.1", dst=client) / UDP(sport=53, dport=sport)
+                            / Raw(b'a' * 64)))
+            if sec % 4 == h % 4:
+                packets.append((ts + 0.1, IP(src=client, dst="10.20.0.2") / UDP(sport=123, dport=123)
+                                / Raw(b'n' * 48)))
+            if sec % 2 == 0:
+                packets.append((ts + 0.2, IP(src=client, dst="10.20.0.3") / ICMP(type=8)
+                                / Raw(b'p' * 56)))
+    packets.sort(key=lambda p: p[0])
+    with PcapWriter(path, sync=False) as writer:
+        for ts, pkt in packets:
+            pkt.time = ts
+            writer.write(pkt)
+    return len(packets)
+
+
+def run(path, cache_size, bucket=None):
+    sniffer.flow_table = FlowTable()
+    sniffer.configure_verdict_cache(cache_size, bucket)
+    return replay.replay_pcap(path, dry_run=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verdict cache hit rate and speed-up on a pcap.")
+    parser.add_argument('--pcap', help='replay this file instead of the generated steady-state capture')
+    parser.add_argument('--src-bytes-bucket', type=int, help='also run with quantized src_bytes')
+    args = parser.parse_args()
+
+    if not sniffer.load_detector():
+        sys.exit("No model loaded. Run 'python train_model.py' first.")
+    sniffer.VERBOSE_ALERTS = False
+    path = args.pcap
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'steady.pcap')
+        print(f"Wrote {write_steady_pcap(path)} packets to {path}")
+
+    size = sniffer.VERDICT_CACHE_SIZE or CACHE_SIZE
+    configs = [('no cache', 0, None), ('cache', size, None)]
+    if args.src_bytes_bucket:
+        configs.append((f'cache, src_bytes/{args.src_bytes_bucket}', size,
+                        args.src_bytes_bucket))
+    print(f"\n{'config':28}{'packets/s':>11}{'scoring (s)':>13}{'hit rate':>10}"
+          f"{'model rows':>12}{'alerts':>8}")
+    for name, size, bucket in configs:
+        report = run(path, size, bucket)
+        c = report['verdict_cache'] or {}
+        model_rows = c.get('misses', report['ip_packets'])
+        # Cache lookup + encode + forward pass for all batches
+        lookup = report['latency']['lookup']
+        scoring = lookup['mean_us'] * lookup['count'] / 1e6 if lookup['count'] else 0.0
+        print(f"{name:28}{report['packets_per_s']:>11.0f}{scoring:>13.3f}"
+              f"{c.get('hit_rate', 0.0):>10.1%}{model_rows:>12}{report['alerts']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""
+Benchmark suite for the detection hot path.
+
+Times each stage on its own - header parsing, packet_fields,
+extract_features, preprocess_data, the compiled encoder, the model,
+predict_packet, log_attack and the alert writer, dashboard queries on a
+large attacks table, /api/stats under concurrent clients - and the full
+pipeline (replay of a generated capture), all on fixed synthetic input.
+Nothing touches a network interface: packets are built in memory, the
+database is a temporary file pre-populated with --db-rows alerts, and
+Flask is driven through its test client.
+
+Every case reports microseconds per operation (best of --repeat runs,
+plus the median). Results are written as JSON and compared with a stored
+baseline; a case more than --threshold slower than its baseline is a
+regression and the exit status is 1.
+
+    python benchmarks/suite.py --save-baseline        # record benchmarks/baseline.json
+    python benchmarks/suite.py                        # compare against it
+    python benchmarks/suite.py --only db_,api_ --threshold 0.5 --json results.json
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+THRESHOLD = 0.25   # allowed slowdown vs baseline before a case fails
+DB_ROWS = 500000   # pre-populated attacks rows for the database cases
+API_CLIENTS = 8
+API_REQUESTS = 50  # per client
+PACKETS = 2000
+BATCH = 256        # inference.BATCH_SIZE
+
+# The suite's database and settings must be in place before database/sniffer are imported
+_workdir = tempfile.mkdtemp(prefix='idps-bench-')
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ['IDPS_DB_PATH'] = os.path.join(_workdir, 'bench.db')
+os.environ.setdefault('IDPS_INFERENCE_BACKEND', 'numpy')
+os.environ.setdefault('IDPS_WARMUP', '0')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database  # noqa: E402
+import sniffer  # noqa: E402
+from rawparse import parse_frame  # noqa: E402
+
+CASES = []
+
+
+def case(name, description):
+    """Register fn(ctx) -> number of operations performed, as benchmark `name`."""
+    def register(fn):
+        CASES.append((name, description, fn))
+        return fn
+    return register
+
+
+# Fixtures --------------------------------------------------------------------
+
+class Context:
+    """Synthetic inputs shared by the cases, built once."""
+
+    def __init__(self, packets=PACKETS, db_rows=DB_ROWS, seed=7):
+        from bench_rawparse import mixed_frames
+        from scapy.all import Ether, wrpcap
+        sniffer.VERBOSE_ALERTS = False
+        if not sniffer.load_detector():
+            raise SystemExit("No model loaded. Run 'python train_model.py' first.")
+        self.frames = mixed_frames(packets, seed)
+        self.packets = []
+        for i, raw in enumerate(self.frames):
+            p = Ether(raw)
+            p.time = 1_700_000_000.0 + i * 0.001
+            self.packets.append(p)
+        self.ip_packets = [p for p in self.packets if sniffer.IP in p]
+        self.fields = [sniffer.packet_fields(p) for p in self.ip_packets]
+        sniffer.flow_table.clear()
+        self.rows = [sniffer.fields_features(f) for f in self.fields]
+        self.batch = self.rows[:BATCH]
+        self.pcap = os.path.join(_workdir, 'mixed.pcap')
+        wrpcap(self.pcap, self.packets)
+        self.db_rows = db_rows
+        populate_db(db_rows, seed)
+
+    def reset_state(self):
+        sniffer.flow_table.clear()
+        sniffer.BLOCKED_IPS.clear()
+        if sniffer.verdict_cache is not None:
+            sniffer.verdict_cache.invalidate()
+
+
+def populate_db(rows, seed=7):
+    """Fill the benchmark database with `rows` alerts in one transaction."""
+    rnd = random.Random(seed)
+    types = ['Malicious Traffic', 'Port Scan', 'SYN Flood', 'Brute Force']
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute('PRAGMA journal_mode=WAL')
+    with conn:
+        conn.executemany(database.INSERT_SQL, (
+            (f"2026-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}", f"10.0.{rnd.randrange(256)}.{rnd.randrange(256)}",
+             '192.168.1.10', rnd.choice(['TCP', 'UDP', 'ICMP']), rnd.choice(types),
+             rnd.random(), 'Blocked') for i in range(rows)))
+    conn.close()
+    # Written behind the writer's back: rebuild the dashboard's in-memory view
+    database.load_recent_alerts()
+
+
+# Cases -----------------------------------------------------------------------
+
+@case('parse_frame', 'rawparse.parse_frame, per frame')
+def _parse_frame(ctx):
+    for i, frame in enumerate(ctx.frames):
+        try:
+            parse_frame(frame, float(i))
+        except ValueError:
+            pass
+    return len(ctx.frames)
+
+
+@case('packet_fields', 'sniffer.packet_fields on a dissected scapy packet')
+def _packet_fields(ctx):
+    for p in ctx.ip_packets:
+        sniffer.packet_fields(p)
+    return len(ctx.ip_packets)
+
+
+@case('extract_features', 'sniffer.extract_features (scapy packet -> 41 features, flow table)')
+def _extract_features(ctx):
+    ctx.reset_state()
+    for p in ctx.ip_packets:
+        sniffer.extract_features(p)
+    return len(ctx.ip_packets)
+
+
+@case('fields_features', 'sniffer.fields_features (PacketFields -> 41 features, flow table)')
+def _fields_features(ctx):
+    ctx.reset_state()
+    for f in ctx.fields:
+        sniffer.fields_features(f)
+    return len(ctx.fields)
+
+
+@case('preprocess_data', f'preprocessing.preprocess_data(is_training=False), per row of a {BATCH}-row batch')
+def _preprocess_data(ctx):
+    import pandas as pd
+    from preprocessing import COL_NAMES, preprocess_data
+    df = pd.DataFrame(ctx.batch, columns=COL_NAMES[:-1])
+    df['label'] = 'normal'
+    preprocess_data(df, is_training=False)
+    return len(ctx.batch)
+
+
+@case('encode_rows', f'CompiledEncoder.transform_rows, per row of a {BATCH}-row batch')
+def _encode_rows(ctx):
+    sniffer.detector[0].transform_rows(ctx.batch)
+    return len(ctx.batch)
+
+
+@case('model_batch', f'model.predict_on_batch, per row of a {BATCH}-row batch')
+def _model_batch(ctx):
+    encoder, model = sniffer.detector
+    model.predict_on_batch(encoder.transform_rows(ctx.batch))
+    return len(ctx.batch)
+
+
+@case('predict_packet', 'sniffer.predict_packet, one packet at a time, verdict cache off')
+def _predict_packet(ctx):
+    ctx.reset_state()
+    cache = sniffer.verdict_cache
+    sniffer.verdict_cache = None
+    try:
+        for p in ctx.ip_packets[:200]:
+            sniffer.predict_packet(p)
+    finally:
+        sniffer.verdict_cache = cache
+    return 200
+
+
+@case('log_attack', 'database.log_attack (queue an alert for the writer)')
+def _log_attack(ctx):
+    n = 2000
+    for i in range(n):
+        database.log_attack('10.9.0.1', '192.168.1.10', 'TCP', 'Malicious Traffic', 0.9, 'Blocked')
+    database.flush_alerts()
+    return n
+
+
+@case('alert_writer', 'alerts queued and committed by the writer, per alert')
+def _alert_writer(ctx):
+    n = 5000
+    writer = database.get_writer()
+    for i in range(n):
+        writer.submit(('2026-01-01 00:00:00', '10.9.0.2', '192.168.1.10', 'UDP', 'Port Scan', 0.8, 'Blocked'))
+    writer.flush()
+    return n
+
+
+@case('db_snapshot', 'database.get_dashboard_snapshot on the large attacks table')
+def _db_snapshot(ctx):
+    for _ in range(50):
+        database.get_dashboard_snapshot(10)
+    return 50
+
+
+@case('live_snapshot', 'database.get_live_snapshot (what /api/stats reads, from memory)')
+def _live_snapshot(ctx):
+    for _ in range(5000):
+        database.get_live_snapshot(10)
+    return 5000
+
+
+@case('db_recent', 'database.get_recent_alerts(100) on the large attacks table')
+def _db_recent(ctx):
+    for _ in range(50):
+        database.get_recent_alerts(100)
+    return 50
+
+
+@case('api_stats', f'GET /api/stats, {API_CLIENTS} concurrent clients (per request)')
+def _api_stats(ctx):
+    import app
+    errors = []
+
+    def client():
+        c = app.app.test_client()
+        for _ in range(API_REQUESTS):
+            r = c.get('/api/stats')
+            if r.status_code != 200:
+                errors.append(r.status_code)
+
+    threads = [threading.Thread(target=client) for _ in range(API_CLIENTS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise RuntimeError(f"/api/stats failed: {errors[:5]}")
+    return API_CLIENTS * API_REQUESTS
+
+
+@case('pipeline', 'replay of the generated capture (parse, features, cache, model, alerts), per packet')
+def _pipeline(ctx):
+    import replay
+    ctx.reset_state()
+    report = replay.replay_pcap(ctx.pcap)
+    return report['packets']
+
+
+# Runner ----------------------------------------------------------------------
+
+def run_case(fn, ctx, repeat):
+    fn(ctx) # warm-up
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        ops = fn(ctx)
+        samples.append((time.perf_counter() - t0) / ops * 1e6)
+    return {'us_per_op': min(samples), 'median_us': statistics.median(samples),
+            'ops_per_s': 1e6 / min(samples), 'repeat': repeat}
+
+
+def machine():
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'backend': sniffer.INFERENCE_BACKEND}
+
+
+def compare(results, baseline, threshold):
+    """(case, base, now, change) for every case in both; change > threshold is a regression."""
+    rows = []
+    for name, r in results['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if base is None:
+            rows.append((name, None, r['us_per_op'], None))
+            continue
+        change = r['us_per_op'] / base['us_per_op'] - 1
+        rows.append((name, base['us_per_op'], r['us_per_op'], change))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection hot path benchmark suite.")
+    parser.add_argument('--only', help='comma-separated case name prefixes')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db-rows', type=int, default=DB_ROWS)
+    parser.add_argument('--packets', type=int, default=PACKETS)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='fail when a case is this much slower than baseline (0.25 = 25%%)')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, description, _ in CASES:
+            print(f"{name:18}{description}")
+        return
+    prefixes = args.only.split(',') if args.only else None
+    selected = [(n, d, fn) for n, d, fn in CASES if not prefixes or any(n.startswith(p) for p in prefixes)]
+
+    t0 = time.perf_counter()
+    ctx = Context(args.packets, args.db_rows)
+    print(f"[*] Fixtures ready in {time.perf_counter() - t0:.1f} s: {len(ctx.frames)} frames, "
+          f"{args.db_rows} alerts in {database.DB_PATH}\n")
+    results = {'machine': machine(), 'created': time.time(), 'packets': args.packets,
+               'db_rows': args.db_rows, 'cases': {}}
+    print(f"{'case':18}{'us/op':>12}{'median':>12}{'ops/s':>14}")
+    for name, description, fn in selected:
+        r = run_case(fn, ctx, args.repeat)
+        r['description'] = description
+        results['cases'][name] = r
+        print(f"{name:18}{r['us_per_op']:>12.2f}{r['median_us']:>12.2f}{r['ops_per_s']:>14.0f}")
+    database.shutdown_writer()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one.")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('machine') != results['machine']:
+        print(f"\n[!] Baseline was recorded on {baseline.get('machine')}; comparisons may not be meaningful")
+    regressions = []
+    print(f"\n{'case':18}{'baseline us':>13}{'now us':>12}{'change':>10}")
+    for name, base, now, change in compare(results, baseline, args.threshold):
+        if change is None:
+            print(f"{name:18}{'-':>13}{now:>12.2f}{'new':>10}")
+            continue
+        flag = ''
+        if change > args.threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:18}{base:>13.2f}{now:>12.2f}{change:>+10.1%}{flag}")
+    if regressions:
+        print(f"\n[!] {len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\nNo regressions over {args.threshold:.0%}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+import heapq
+import ipaddress
+import itertools
+import socket
+import threading
+import time
+
+FOREVER = float('inf')
+
+
+class Blocklist:
+    """
+    Blocked sources: single addresses and CIDR prefixes, IPv4 and IPv6,
+    each with an optional TTL.
+
+    Exact addresses live in a set (permanent blocks) and a dict of expiry
+    times (blocks with a TTL), keyed by the address string, so the common
+    case - a packet from a host we blocked - is one set lookup on the
+    string scapy already gives us. Prefixes live in a multibit trie
+    (one level per address byte, a prefix that ends mid-byte expanded
+    across the byte values it covers), so a lookup is at most 4 hops for
+    IPv4 and 16 for IPv6, independent of the number of prefixes. Each slot
+    holds the latest expiry of the prefixes covering it, so matching is a
+    float comparison per level; an address family with no prefixes skips
+    the trie altogether.
+
+    Expired entries stop matching immediately and are removed lazily, from
+    a heap of expiry times, on the next add/len/export. Set-style usage
+    (`ip in blocklist`, add, discard, clear, len, iteration) keeps working
+    for code written against the old set.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._seq = itertools.count() # heap tie-breaker
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._permanent = set()                 # address strings blocked without a TTL
+            self._hosts = {}                        # address string -> expiry, for TTL blocks
+            self._prefixes = {}                     # (version, packed network, prefixlen) -> expiry
+            self._families = {4: 0, 6: 0}           # prefixes per address family
+            # Trie node: [{byte: slot}, {(bits, base byte): expiry of a prefix ending here} or None]
+            # slot: latest expiry of the prefixes covering this byte value, or
+            # [that expiry, child node] where longer prefixes continue below it
+            self._roots = {4: [{}, None], 6: [{}, None]}
+            self._default = {4: 0.0, 6: 0.0}        # expiry of a /0 entry
+            self._expiries = []                     # heap of (expiry, seq, key)
+
+    # Lookup ------------------------------------------------------------------
+
+    def __contains__(self, ip):
+        if ip in self._permanent:
+            return True
+        hosts = self._hosts
+        if not hosts and not self._prefixes:
+            return False
+        now = self.clock()
+        exp = hosts.get(ip)
+        if exp is not None and exp > now:
+            return True
+        return self._match_prefix(ip, now)
+
+    def _match_prefix(self, ip, now):
+        try:
+            if ':' in ip:
+                if not self._families[6]:
+                    return False
+                packed, version = socket.inet_pton(socket.AF_INET6, ip), 6
+            else:
+                if not self._families[4]:
+                    return False
+                packed, version = socket.inet_aton(ip), 4
+        except (OSError, TypeError):
+            return False
+        if self._default[version] > now:
+            return True
+        node = self._roots[version]
+        for byte in packed:
+            slot = node[0].get(byte)
+            if slot is None:
+                return False
+            if slot.__class__ is not list:
+                return slot > now
+            if slot[0] > now:
+                return True
+            node = slot[1]
+        return False
+
+    # Mutation ----------------------------------------------------------------
+
+    def add(self, entry, ttl=None):
+        """Block an address or CIDR prefix ('10.0.0.0/8', '2001:db8::/32') for ttl seconds (None: forever)."""
+        net = ipaddress.ip_network(entry, strict=False)
+        now = self.clock()
+        expiry = FOREVER if ttl is None else now + ttl
+        with self._lock:
+            if net.prefixlen == net.max_prefixlen:
+                key = str(net.network_address)
+                if ttl is None:
+                    self._permanent.add(key)
+                    self._hosts.pop(key, None)
+                else:
+                    self._hosts[key] = expiry
+                    self._permanent.discard(key)
+            else:
+                key = (net.version, net.network_address.packed, net.prefixlen)
+                if key not in self._prefixes:
+                    self._families[net.version] += 1
+                self._prefixes[key] = expiry
+                self._set_prefix(key, expiry)
+            if ttl is not None:
+                heapq.heappush(self._expiries, (expiry, next(self._seq), key))
+            self._expire_locked(now)
+
+    def discard(self, entry):
+        net = ipaddress.ip_network(entry, strict=False)
+        with self._lock:
+            if net.prefixlen == net.max_prefixlen:
+                key = str(net.network_address)
+                self._permanent.discard(key)
+                self._hosts.pop(key, None)
+                return
+            key = (net.version, net.network_address.packed, net.prefixlen)
+            if self._prefixes.pop(key, None) is not None:
+                self._families[net.version] -= 1
+                self._set_prefix(key, None)
+
+    def remove(self, entry):
+        if entry not in self._entries():
+            raise KeyError(entry)
+        self.discard(entry)
+
+    def _set_prefix(self, key, expiry):
+        """Record (or with expiry=None, forget) a prefix in the trie and refresh the slots it covers."""
+        version, packed, plen = key
+        if plen == 0:
+            self._default[version] = expiry or 0.0
+            return
+        level = (plen - 1) // 8
+        bits = plen - 8 * level # 1..8 significant bits in the last byte
+        node = self._roots[version]
+        path = [] # (node, byte) walked to reach the prefix's node, for pruning
+        for byte in packed[:level]:
+            slot = node[0].get(byte)
+            if slot.__class__ is not list:
+                if expiry is None:
+                    return
+                slot = node[0][byte] = [slot or 0.0, [{}, None]]
+            path.append((node, byte))
+            node = slot[1]
+        slots, marks = node
+        if marks is None:
+            if expiry is None:
+                return
+            marks = node[1] = {}
+        base = packed[level]
+        covered = range(base, base + (1 << (8 - bits)))
+        mark = (bits, base)
+        old = marks.get(mark)
+        if expiry is not None:
+            marks[mark] = expiry
+            if old is None or expiry >= old:
+                # Adding or extending a prefix can only raise the slots' latest expiry
+                for byte in covered:
+                    slot = slots.get(byte)
+                    if slot is None:
+                        slots[byte] = expiry
+                    elif slot.__class__ is list:
+                        if expiry > slot[0]:
+                            slot[0] = expiry
+                    elif expiry > slot:
+                        slots[byte] = expiry
+                return
+        elif old is None:
+            return
+        else:
+            del marks[mark]
+
+        # A prefix was removed or shortened: recompute the slots from the prefixes left
+        for byte in covered:
+            latest = 0.0
+            for b in range(1, 9):
+                e = marks.get((b, byte & _MASKS[b]))
+                if e is not None and e > latest:
+                    latest = e
+            slot = slots.get(byte)
+            if slot.__class__ is list:
+                slot[0] = latest
+            elif latest:
+                slots[byte] = latest
+            elif slot is not None:
+                del slots[byte]
+        if not marks:
+            node[1] = None
+        # Drop nodes left empty, and parent slots that only led to them
+        while path and not node[0] and node[1] is None:
+            parent, byte = path.pop()
+            latest = parent[0][byte][0]
+            if latest:
+                parent[0][byte] = latest
+            else:
+                del parent[0][byte]
+            node = parent
+
+    def _expire_locked(self, now):
+        removed = 0
+        heap = self._expiries
+        while heap and heap[0][0] <= now:
+            expiry, _, key = heapq.heappop(heap)
+            if isinstance(key, str):
+                if self._hosts.get(key) == expiry:
+                    del self._hosts[key]
+                    removed += 1
+            elif self._prefixes.get(key) == expiry:
+                del self._prefixes[key]
+                self._families[key[0]] -= 1
+                self._set_prefix(key, None)
+                removed += 1
+        return removed
+
+    def expire(self):
+        """Drop entries whose TTL has passed; returns how many were removed."""
+        with self._lock:
+            return self._expire_locked(self.clock())
+
+    # Bulk load / export ------------------------------------------------------
+
+    def load(self, entries, ttl=None):
+        """
+        Add many entries: strings, or (entry, ttl) pairs overriding `ttl`.
+        Invalid entries are skipped. Returns the number added.
+        """
+        added = bad = 0
+        for item in entries:
+            entry, entry_ttl = item if isinstance(item, (tuple, list)) else (item, ttl)
+            try:
+                self.add(entry, entry_ttl)
+                added += 1
+            except ValueError:
+                bad += 1
+        if bad:
+            print(f"[!] Blocklist: skipped {bad} invalid entries")
+        return added
+
+    def load_file(self, path, ttl=None):
+        """One entry per line, optionally followed by a TTL in seconds; '#' starts a comment."""
+        entries = []
+        with open(path) as f:
+            for line in f:
+                fields = line.split('#', 1)[0].split()
+                if not fields:
+                    continue
+                entries.append((fields[0], float(fields[1]) if len(fields) > 1 else ttl))
+        return self.load(entries)
+
+    def export(self):
+        """Live entries as (entry, expires_at) pairs; expires_at is None for permanent blocks."""
+        with self._lock:
+            self._expire_locked(self.clock())
+            items = [(host, FOREVER) for host in self._permanent] + list(self._hosts.items()) + [
+                (str(ipaddress.ip_network((packed, plen))), e)
+                for (_, packed, plen), e in self._prefixes.items()]
+        return [(entry, None if exp == FOREVER else exp) for entry, exp in items]
+
+    def save_file(self, path):
+        """Write the live entries in load_file() format (remaining TTL for expiring ones)."""
+        now = self.clock()
+        with open(path, 'w') as f:
+            for entry, expires_at in self.export():
+                f.write(entry if expires_at is None else f"{entry} {max(0.0, expires_at - now):.0f}")
+                f.write('\n')
+
+    def _entries(self):
+        return [entry for entry, _ in self.export()]
+
+    def __iter__(self):
+        return iter(self._entries())
+
+    def __len__(self):
+        with self._lock:
+            self._expire_locked(self.clock())
+            return len(self._permanent) + len(self._hosts) + len(self._prefixes)
+
+    def stats(self):
+        with self._lock:
+            self._expire_locked(self.clock())
+            return {'hosts': len(self._permanent) + len(self._hosts), 'prefixes': len(self._prefixes),
+                    'expiring': len(self._expiries)}
+
+
+# Network bits of a byte for 1..8 significant bits
+_MASKS = [0] + [(0xFF << (8 - b)) & 0xFF for b in range(1, 9)]
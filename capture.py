@@ -0,0 +1,204 @@
+"""
+Capture configuration for start_sniffer: which packets reach Python at all.
+
+Everything is compiled into a single BPF expression, evaluated in the
+kernel (or by Npcap) before a packet is copied to user space:
+
+  - a base expression (default "ip"),
+  - excluded subnets and ports, e.g. the backup network or the
+    dashboard's own port,
+  - per-flow sampling: keep a deterministic fraction of IPv4 flows,
+    decided by a direction-independent hash of the 5-tuple, so a flow is
+    either inspected completely or not at all.
+
+The sampling hash is ((src ^ dst ^ sport ^ dport) * 2654435761) mod 2^32,
+top 10 bits, compared against rate * 1024. sample_bucket() computes the
+same thing in Python. If the filter cannot be installed (no libpcap or
+tcpdump for scapy to compile it), the exclusions and sampling are
+applied in Python instead, with identical per-flow decisions.
+"""
+import ipaddress
+import os
+import socket
+import struct
+import threading
+
+CAPTURE_FILTER = os.environ.get('IDPS_CAPTURE_FILTER', 'ip')
+EXCLUDE_SUBNETS = [s for s in os.environ.get('IDPS_EXCLUDE_SUBNETS', '').split(',') if s.strip()]
+EXCLUDE_PORTS = [int(p) for p in os.environ.get('IDPS_EXCLUDE_PORTS', '').split(',') if p.strip()]
+SAMPLE_RATE = float(os.environ.get('IDPS_SAMPLE_RATE', '1.0'))
+
+SAMPLE_BUCKETS = 1024    # sampling granularity: rates are rounded to n/1024
+_HASH_MULTIPLIER = 2654435761 # 2^32 / golden ratio
+_BUCKET_SHIFT = 22       # top 10 bits of the 32-bit product
+
+# Linux AF_PACKET socket option (linux/if_packet.h)
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+
+
+def _ipv4_int(addr):
+    return struct.unpack('!I', socket.inet_aton(addr))[0]
+
+
+def _bucket(src_int, dst_int, sport, dport):
+    return (((src_int ^ dst_int ^ sport ^ dport) * _HASH_MULTIPLIER) & 0xFFFFFFFF) >> _BUCKET_SHIFT
+
+
+def sample_bucket(src, dst, sport=0, dport=0):
+    """Sampling bucket (0..1023) of a flow; same value for both directions and as the BPF filter."""
+    return _bucket(_ipv4_int(src), _ipv4_int(dst), sport, dport)
+
+
+def _bpf_bucket(key):
+    return f"((({key}) * {_HASH_MULTIPLIER}) >> {_BUCKET_SHIFT})"
+
+
+def build_capture_filter(base=CAPTURE_FILTER, exclude_subnets=(), exclude_ports=(),
+                         sample_threshold=SAMPLE_BUCKETS):
+    """
+    BPF expression for `base` minus the excluded subnets/ports, keeping
+    only IPv4 flows whose sample bucket is below `sample_threshold`.
+    Non-first fragments carry no ports, so they are bucketed on addresses
+    alone; non-IPv4 traffic allowed by `base` is not sampled.
+    """
+    clauses = [f"({base})" if base else "ip"]
+    excluded = [f"net {n}" for n in exclude_subnets] + [f"port {p}" for p in sorted(exclude_ports)]
+    if excluded:
+        clauses.append(f"not ({' or '.join(excluded)})")
+    if sample_threshold < SAMPLE_BUCKETS:
+        addrs = "ip[12:4] ^ ip[16:4]"
+        first = "ip[6:2] & 0x1fff = 0"
+        sampled = " or ".join([
+            f"(tcp and {first} and {_bpf_bucket(addrs + ' ^ tcp[0:2] ^ tcp[2:2]')} < {sample_threshold})",
+            f"(udp and {first} and {_bpf_bucket(addrs + ' ^ udp[0:2] ^ udp[2:2]')} < {sample_threshold})",
+            f"(((not tcp and not udp) or ip[6:2] & 0x1fff != 0) and {_bpf_bucket(addrs)} < {sample_threshold})",
+        ])
+        clauses.append(f"(not ip or {sampled})")
+    return " and ".join(clauses)
+
+
+class CaptureConfig:
+    """
+    Capture filter settings plus the counters that go with them.
+    open_socket() installs the filter in the kernel when it can;
+    lfilter() is the Python fallback to pass to sniff() otherwise.
+    """
+
+    def __init__(self, bpf=CAPTURE_FILTER, exclude_subnets=EXCLUDE_SUBNETS,
+                 exclude_ports=EXCLUDE_PORTS, sample_rate=SAMPLE_RATE):
+        self.bpf = bpf
+        self.exclude_subnets = [ipaddress.ip_network(n.strip(), strict=False) for n in exclude_subnets]
+        self.exclude_ports = {int(p) for p in exclude_ports}
+        # (network, netmask) integers of the IPv4 exclusions, for the Python fallback
+        self._v4_excludes = [(int(n.network_address), int(n.netmask))
+                             for n in self.exclude_subnets if n.version == 4]
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be between 0 and 1, got {sample_rate}")
+        self.sample_threshold = round(sample_rate * SAMPLE_BUCKETS)
+        self.kernel_filter = None # True once installed in the kernel, False if filtering in Python
+        self.socket = None
+        self._lock = threading.Lock()
+        # Python-side filtering (fallback mode only)
+        self.passed = 0
+        self.excluded = 0
+        self.sampled_out = 0
+        # Accumulated PACKET_STATISTICS (the kernel resets them on every read)
+        self.kernel_received = 0
+        self.kernel_dropped = 0
+
+    @property
+    def sample_rate(self):
+        return self.sample_threshold / SAMPLE_BUCKETS
+
+    def filter_expression(self):
+        return build_capture_filter(self.bpf, self.exclude_subnets, self.exclude_ports,
+                                    self.sample_threshold)
+
+    def open_socket(self, iface=None):
+        """Listening socket with the filter compiled into the kernel, or unfiltered if that fails."""
+        from scapy.all import conf
+        try:
+            self.socket = conf.L2listen(iface=iface, filter=self.filter_expression())
+            self.kernel_filter = True
+            print(f"[*] Capture filter (kernel): {self.filter_expression()}")
+        except Exception as e:
+            print(f"[!] Could not install the capture filter in the kernel ({e}); "
+                  f"filtering in Python instead")
+            if self.bpf not in ('ip', '', None):
+                print(f"[!] Base filter '{self.bpf}' cannot be applied in Python; capturing all IPv4")
+            self.socket = conf.L2listen(iface=iface)
+            self.kernel_filter = False
+        return self.socket
+
+    def lfilter(self):
+        """sniff(lfilter=...) callback when the filter is not in the kernel, else None."""
+        return None if self.kernel_filter else self.accept
+
+    def accept(self, packet):
+        """Python equivalent of filter_expression() (base filter: IPv4 only)."""
+        from scapy.all import IP, TCP, UDP
+        ip = packet.getlayer(IP)
+        if ip is None:
+            return False
+        l4 = ip.payload
+        if isinstance(l4, (TCP, UDP)) and ip.frag == 0:
+            return self._decide(ip.src, ip.dst, l4.sport, l4.dport, True)
+        return self._decide(ip.src, ip.dst, 0, 0, False)
+
+    def accept_fields(self, fields):
+        """accept() for a rawparse.PacketFields record."""
+        return self._decide(fields.src, fields.dst, fields.sport, fields.dport,
+                            fields.proto == 'tcp' or fields.proto == 'udp')
+
+    def _decide(self, src, dst, sport, dport, has_ports):
+        if has_ports and (sport in self.exclude_ports or dport in self.exclude_ports):
+            self.excluded += 1
+            return False
+        src, dst = _ipv4_int(src), _ipv4_int(dst)
+        for net, mask in self._v4_excludes:
+            if src & mask == net or dst & mask == net:
+                self.excluded += 1
+                return False
+        if (self.sample_threshold < SAMPLE_BUCKETS
+                and _bucket(src, dst, sport, dport) >= self.sample_threshold):
+            self.sampled_out += 1
+            return False
+        self.passed += 1
+        return True
+
+    def read_kernel_stats(self):
+        """Fold the socket's PACKET_STATISTICS into the totals (Linux AF_PACKET only)."""
+        sock = getattr(self.socket, 'ins', None)
+        if not self.kernel_filter or not isinstance(sock, socket.socket):
+            return False
+        try:
+            received, dropped = struct.unpack('II', sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8))
+        except OSError:
+            return False
+        with self._lock:
+            self.kernel_received += received
+            self.kernel_dropped += dropped
+        return True
+
+    def stats(self):
+        kernel = self.read_kernel_stats()
+        out = {
+            'filter': self.filter_expression(),
+            'mode': {True: 'kernel', False: 'python', None: 'not_started'}[self.kernel_filter],
+            'sample_rate': self.sample_rate,
+            'excluded_subnets': [str(n) for n in self.exclude_subnets],
+            'excluded_ports': sorted(self.exclude_ports),
+        }
+        if kernel:
+            out.update({
+                'received': self.kernel_received,
+                'kernel_dropped': self.kernel_dropped,
+                # Filtered-out packets never reach us in kernel mode; estimate from the rate
+                'sampled_out_estimate': (round(self.kernel_received * (1 - self.sample_rate) / self.sample_rate)
+                                         if self.sample_rate else None),
+            })
+        else:
+            out.update({'received': self.passed, 'excluded': self.excluded,
+                        'sampled_out': self.sampled_out})
+        return out
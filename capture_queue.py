@@ -0,0 +1,246 @@
+import threading
+import time
+from collections import deque
+
+# Packets waiting between capture and analysis
+QUEUE_SIZE = 20000
+# What to shed when the queue is full:
+#   drop_oldest      - discard the oldest queued packet (the newest traffic is kept)
+#   fair             - every source gets an equal share of the queue; a source over
+#                      its share loses its own packets, and sources are served round-robin
+#   suspicious_first - sources marked suspicious are queued and served ahead of the rest;
+#                      ordinary traffic is shed first
+POLICIES = ('drop_oldest', 'fair', 'suspicious_first')
+DEFAULT_POLICY = 'fair'
+SUSPICIOUS_TTL = 300.0 # seconds a source stays marked suspicious
+SUSPICIOUS_MAX = 10000 # marked sources remembered (oldest forgotten first)
+DRAIN_BATCH = 64 # packets taken per lock acquisition by the analysis thread
+
+
+class CaptureQueue:
+    """
+    Bounded queue between the capture loop and packet analysis.
+
+    The capture thread calls put(src, handler, item), which never blocks:
+    when the queue is full the policy decides which packet is shed, and the
+    reason is counted. A single analysis thread takes packets in policy
+    order and calls handler(item). `skip(src)` is checked again when a
+    packet is taken, so packets from a source blocked while they waited are
+    not analysed.
+    """
+
+    def __init__(self, maxsize=QUEUE_SIZE, policy=DEFAULT_POLICY, skip=None,
+                 suspicious_ttl=SUSPICIOUS_TTL, clock=time.monotonic):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown shed policy {policy!r}; expected one of {', '.join(POLICIES)}")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.skip = skip
+        self.suspicious_ttl = suspicious_ttl
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._size = 0
+        self._fifo = deque() # drop_oldest, and ordinary traffic for suspicious_first
+        self._priority = deque() # suspicious_first: marked sources
+        self._sources = {} # fair: src -> deque of its queued packets
+        self._ring = deque() # fair: (src, its deque) in service order; stale once the deque is replaced
+        self._by_length = {} # fair: queued length -> {src: None}, to find the longest in O(1)
+        self._longest = 0
+        self._suspicious = {} # src -> expiry time
+        self._thread = None
+        self._stopping = False
+        self.enqueued = 0
+        self.processed = 0
+        self.skipped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.shed = {}
+
+    # Capture side ------------------------------------------------------------
+
+    def put(self, src, handler, item):
+        """Queue one packet; returns False if it was shed instead."""
+        entry = (src, handler, item)
+        with self._cond:
+            if self._stopping:
+                self._count_shed('stopping')
+                return False
+            if self._size >= self.maxsize and not self._make_room(src):
+                return False
+            if self.policy == 'fair':
+                queue = self._sources.get(src)
+                if queue is None:
+                    queue = self._sources[src] = deque()
+                    self._ring.append((src, queue))
+                    if len(self._ring) > 4 * self.maxsize:
+                        self._compact_ring()
+                queue.append(entry)
+                self._relength(src, len(queue) - 1, len(queue))
+            elif self.policy == 'suspicious_first' and self.is_suspicious(src):
+                self._priority.append(entry)
+            else:
+                self._fifo.append(entry)
+            self._size += 1
+            self.enqueued += 1
+            if self._size > self.max_depth:
+                self.max_depth = self._size
+            self._cond.notify()
+        return True
+
+    def _count_shed(self, reason, n=1):
+        self.shed[reason] = self.shed.get(reason, 0) + n
+
+    def _make_room(self, src):
+        """Shed one packet for an arrival from `src` to a full queue; False sheds the arrival itself."""
+        if self.policy == 'drop_oldest':
+            self._fifo.popleft()
+            self._count_shed('oldest')
+        elif self.policy == 'fair':
+            own = self._sources.get(src)
+            if own is not None and len(own) >= self.maxsize / len(self._sources):
+                self._count_shed('over_share')
+                return False
+            # Shed the oldest packet of the source with the most queued
+            self._pop_source(next(iter(self._by_length[self._longest])))
+            self._count_shed('over_share')
+        else:
+            if self._fifo:
+                self._fifo.popleft()
+                self._count_shed('low_priority')
+            elif self.is_suspicious(src):
+                self._priority.popleft()
+                self._count_shed('oldest')
+            else:
+                # Full of suspicious traffic: ordinary arrivals wait their turn
+                self._count_shed('low_priority')
+                return False
+        self._size -= 1
+        return True
+
+    def _relength(self, src, old, new):
+        by_length = self._by_length
+        if old:
+            bucket = by_length[old]
+            del bucket[src]
+            if not bucket:
+                del by_length[old]
+        if new:
+            by_length.setdefault(new, {})[src] = None
+        # Lengths change by one, so the longest moves by at most one
+        if new > self._longest:
+            self._longest = new
+        elif old == self._longest and old not in by_length:
+            self._longest = new
+
+    def _compact_ring(self):
+        # Sources emptied by shedding leave stale ring entries; under a spoofed-source flood they pile up
+        sources = self._sources
+        self._ring = deque(e for e in self._ring if sources.get(e[0]) is e[1])
+
+    def _pop_source(self, src):
+        queue = self._sources[src]
+        entry = queue.popleft()
+        self._relength(src, len(queue) + 1, len(queue))
+        if not queue:
+            # Its ring entry goes stale and is dropped when reached
+            del self._sources[src]
+        return entry
+
+    # Suspicious sources --------------------------------------------------------
+
+    def mark_suspicious(self, src):
+        """Serve `src` first (suspicious_first policy) for the next suspicious_ttl seconds."""
+        with self._cond:
+            suspicious = self._suspicious
+            suspicious.pop(src, None)
+            suspicious[src] = self.clock() + self.suspicious_ttl
+            if len(suspicious) > SUSPICIOUS_MAX:
+                del suspicious[next(iter(suspicious))]
+
+    def is_suspicious(self, src):
+        expiry = self._suspicious.get(src)
+        if expiry is None:
+            return False
+        if expiry < self.clock():
+            self._suspicious.pop(src, None)
+            return False
+        return True
+
+    # Analysis side -------------------------------------------------------------
+
+    def _take(self, limit):
+        """Up to `limit` packets in policy order; call with the lock held."""
+        batch = []
+        while self._size and len(batch) < limit:
+            if self.policy == 'fair':
+                src, queue = self._ring.popleft()
+                if self._sources.get(src) is not queue:
+                    continue
+                batch.append(self._pop_source(src))
+                if queue:
+                    self._ring.append((src, queue))
+            elif self._priority:
+                batch.append(self._priority.popleft())
+            else:
+                batch.append(self._fifo.popleft())
+            self._size -= 1
+        return batch
+
+    def start(self):
+        if self.is_alive():
+            return self
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="capture-analysis")
+        self._thread.daemon = True
+        self._thread.start()
+        print(f"[*] Capture queue started (size={self.maxsize}, policy={self.policy})")
+        return self
+
+    def stop(self, timeout=5.0):
+        """Analyse what is already queued, then stop the analysis thread."""
+        if not self.is_alive():
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._size and not self._stopping:
+                    self._cond.wait()
+                if not self._size:
+                    return
+                batch = self._take(DRAIN_BATCH)
+            for src, handler, item in batch:
+                if self.skip is not None and self.skip(src):
+                    self.skipped += 1
+                    continue
+                try:
+                    handler(item)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[!] Packet analysis error: {e}")
+                self.processed += 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                'running': self.is_alive(),
+                'policy': self.policy,
+                'maxsize': self.maxsize,
+                'depth': self._size,
+                'max_depth': self.max_depth,
+                'enqueued': self.enqueued,
+                'processed': self.processed,
+                'skipped_blocked': self.skipped,
+                'errors': self.errors,
+                'shed_total': sum(self.shed.values()),
+                'shed': dict(self.shed),
+                'sources_queued': len(self._sources) if self.policy == 'fair' else None,
+                'suspicious_sources': len(self._suspicious),
+            }
@@ -1,11 +1,72 @@
 import sqlite3
 import datetime
 import os
+import queue
+import threading
+import time
+import atexit
 
-DB_PATH = os.path.join(os.path.dirname(__file__), 'idps.db')
+try:
+    import metrics
+    from recent_alerts import RecentAlerts
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import metrics
+    from recent_alerts import RecentAlerts
+
+DB_PATH = os.environ.get('IDPS_DB_PATH') or os.path.join(os.path.dirname(__file__), 'idps.db')
+
+# Background alert writer settings
+WRITER_QUEUE_SIZE = 10000     # alerts waiting to be written
+WRITER_BATCH_SIZE = 500       # max rows per INSERT transaction
+WRITER_FLUSH_INTERVAL = 0.25  # seconds before a partial batch is written
+# When the queue is full: 'drop' discards the new alert (counted in 'dropped'),
+# 'block' waits up to WRITER_PUT_TIMEOUT seconds for room, then drops.
+WRITER_FULL_POLICY = 'drop'
+WRITER_PUT_TIMEOUT = 0.5
+
+# Alerts for the same (src, dst, protocol, attack type) within this many
+# seconds of the first are folded into one row, updated in place with the
+# packet count, last-seen time and max/mean confidence. 0 writes one row per alert.
+ALERT_WINDOW = float(os.environ.get('IDPS_ALERT_WINDOW', 60))
+
+# Alert rows older than this many days are deleted by the writer thread
+# (0 keeps everything). The per-type totals and the hourly rollups are kept;
+# the per-minute rollups are kept for MINUTE_ROLLUP_RETENTION_DAYS.
+RETENTION_DAYS = float(os.environ.get('IDPS_RETENTION_DAYS', 30))
+MINUTE_ROLLUP_RETENTION_DAYS = float(os.environ.get('IDPS_MINUTE_ROLLUP_RETENTION_DAYS', 90))
+PRUNE_INTERVAL = 300.0 # seconds between retention passes
+PRUNE_BATCH = 5000 # rows deleted per transaction; the next chunk follows one flush interval later
+
+# Rollup tables by resolution; buckets are UTC timestamps truncated to the minute/hour
+ROLLUP_TABLES = {'minute': 'attack_rollup_minute', 'hour': 'attack_rollup_hour'}
+
+# Latest alerts and totals as committed by the writer, read by the dashboard
+_recent = RecentAlerts()
+
+# Bumped after every committed change to attacks, so readers (the live
+# dashboard feed) can wait for new data instead of polling the database.
+_change_cond = threading.Condition()
+_data_version = 0
+
+def _notify_change():
+    global _data_version
+    with _change_cond:
+        _data_version += 1
+        _change_cond.notify_all()
+
+def data_version():
+    return _data_version
+
+def wait_for_change(version, timeout=None):
+    """Block until data_version() differs from `version` (or timeout); return the current version."""
+    with _change_cond:
+        _change_cond.wait_for(lambda: _data_version != version, timeout)
+        return _data_version
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=10)
     c = conn.cursor()
     c.execute('''
         CREATE TABLE IF NOT EXISTS attacks (
@@ -16,50 +77,714 @@ def init_db():
             protocol TEXT,
             attack_type TEXT,
             confidence REAL,
-            action_taken TEXT
+            action_taken TEXT,
+            last_seen DATETIME,
+            packet_count INTEGER NOT NULL DEFAULT 1,
+            max_confidence REAL,
+            mean_confidence REAL
         )
     ''')
     conn.commit()
-    conn.close()
 
-def log_attack(src_ip, dst_ip, protocol, attack_type, confidence, action):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    # Aggregation columns, for databases from before alert windows (one row per packet)
+    columns = {row[1] for row in c.execute('PRAGMA table_info(attacks)')}
+    if 'packet_count' not in columns:
+        c.execute('BEGIN IMMEDIATE')
+        c.execute('ALTER TABLE attacks ADD COLUMN last_seen DATETIME')
+        c.execute('ALTER TABLE attacks ADD COLUMN packet_count INTEGER NOT NULL DEFAULT 1')
+        c.execute('ALTER TABLE attacks ADD COLUMN max_confidence REAL')
+        c.execute('ALTER TABLE attacks ADD COLUMN mean_confidence REAL')
+        c.execute('UPDATE attacks SET last_seen = timestamp, max_confidence = confidence, mean_confidence = confidence')
+        conn.commit()
+
+    # Per-type counters kept current by a trigger, so get_stats never scans attacks
+    c.execute('BEGIN IMMEDIATE')
+    c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='attack_summary'")
+    needs_backfill = c.fetchone() is None
     c.execute('''
-        INSERT INTO attacks (src_ip, dst_ip, protocol, attack_type, confidence, action_taken)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (src_ip, dst_ip, protocol, attack_type, float(confidence), action))
+        CREATE TABLE IF NOT EXISTS attack_summary (
+            attack_type TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0,
+            packets INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    if not needs_backfill and 'packets' not in {row[1] for row in c.execute('PRAGMA table_info(attack_summary)')}:
+        # Before alert windows every row was one packet
+        c.execute('ALTER TABLE attack_summary ADD COLUMN packets INTEGER NOT NULL DEFAULT 0')
+        c.execute('UPDATE attack_summary SET packets = count')
+    # Recreated so older databases pick up the packet counting
+    c.execute('DROP TRIGGER IF EXISTS attacks_summary_insert')
+    c.execute('''
+        CREATE TRIGGER attacks_summary_insert AFTER INSERT ON attacks
+        BEGIN
+            INSERT INTO attack_summary (attack_type, count, packets)
+            VALUES (COALESCE(NEW.attack_type, 'Unknown'), 1, NEW.packet_count)
+            ON CONFLICT(attack_type) DO UPDATE SET count = count + 1, packets = packets + NEW.packet_count;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS attacks_summary_update AFTER UPDATE OF packet_count ON attacks
+        BEGIN
+            UPDATE attack_summary SET packets = packets + NEW.packet_count - OLD.packet_count
+            WHERE attack_type = COALESCE(NEW.attack_type, 'Unknown');
+        END
+    ''')
+    if needs_backfill:
+        # Existing database from before the summary table: count what is there once
+        c.execute('''
+            INSERT INTO attack_summary (attack_type, count, packets)
+            SELECT COALESCE(attack_type, 'Unknown'), count(*), sum(packet_count) FROM attacks GROUP BY 1
+        ''')
+    conn.commit()
+
+    # History: indexes for time-range and per-source queries, and per-minute/per-hour
+    # rollups kept current by triggers (an aggregated alert counts in the bucket it started in)
+    c.execute('BEGIN IMMEDIATE')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_attacks_timestamp ON attacks (timestamp)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_attacks_src ON attacks (src_ip, timestamp)')
+    for resolution, bucket in (('minute', "substr(NEW.timestamp, 1, 16) || ':00'"),
+                               ('hour', "substr(NEW.timestamp, 1, 13) || ':00:00'")):
+        table = ROLLUP_TABLES[resolution]
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+        needs_backfill = c.fetchone() is None
+        c.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                attack_type TEXT NOT NULL,
+                alerts INTEGER NOT NULL DEFAULT 0,
+                packets INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, attack_type)
+            ) WITHOUT ROWID
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS attacks_rollup_{resolution}_insert AFTER INSERT ON attacks
+            BEGIN
+                INSERT INTO {table} (bucket, attack_type, alerts, packets)
+                VALUES ({bucket}, COALESCE(NEW.attack_type, 'Unknown'), 1, NEW.packet_count)
+                ON CONFLICT(bucket, attack_type) DO UPDATE SET alerts = alerts + 1, packets = packets + NEW.packet_count;
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS attacks_rollup_{resolution}_update AFTER UPDATE OF packet_count ON attacks
+            BEGIN
+                UPDATE {table} SET packets = packets + NEW.packet_count - OLD.packet_count
+                WHERE bucket = {bucket} AND attack_type = COALESCE(NEW.attack_type, 'Unknown');
+            END
+        ''')
+        if needs_backfill:
+            c.execute(f'''
+                INSERT INTO {table} (bucket, attack_type, alerts, packets)
+                SELECT {bucket.replace('NEW.', '')}, COALESCE(attack_type, 'Unknown'), count(*), sum(packet_count)
+                FROM attacks GROUP BY 1, 2
+            ''')
     conn.commit()
     conn.close()
+    load_recent_alerts()
+
+# One alert per row: (timestamp, src_ip, dst_ip, protocol, attack_type, confidence, action_taken)
+INSERT_SQL = '''
+    INSERT INTO attacks (timestamp, src_ip, dst_ip, protocol, attack_type, confidence, action_taken,
+                         last_seen, max_confidence, mean_confidence)
+    VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?1, ?6, ?6)
+'''
+WINDOW_INSERT_SQL = '''
+    INSERT INTO attacks (timestamp, src_ip, dst_ip, protocol, attack_type, confidence, action_taken,
+                         last_seen, packet_count, max_confidence, mean_confidence)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+WINDOW_UPDATE_SQL = '''
+    UPDATE attacks SET last_seen = ?, packet_count = ?, max_confidence = ?, mean_confidence = ?
+    WHERE id = ?
+'''
+
+def _format_time(t):
+    # UTC, like CURRENT_TIMESTAMP
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(t))
+
+class AlertWindow:
+    """One aggregated alert: every matching alert from `first_seen` to `first_seen + window`."""
+    __slots__ = ('key', 'action', 'first_seen', 'last_seen', 'count', 'first_confidence',
+                 'max_confidence', 'confidence_sum', 'rowid', 'stored_count', 'queued')
+
+    def __init__(self, key, action, now, confidence):
+        self.key = key
+        self.action = action
+        self.first_seen = self.last_seen = now
+        self.count = 1
+        self.first_confidence = self.max_confidence = self.confidence_sum = confidence
+        self.rowid = None # set by the writer once the row is inserted
+        self.stored_count = 0 # packet count last committed
+        self.queued = False # an insert/update for this window is waiting in the writer queue
+
+class AlertAggregator:
+    """
+    Folds repeated alerts into AlertWindows. The first alert of a window is
+    queued for the writer at once; later ones only update the window, and a
+    window is re-queued (one pending update at a time) when it changes, so a
+    flood costs one UPDATE per window per writer batch instead of one row
+    per packet.
+    """
+
+    def __init__(self, window=ALERT_WINDOW, clock=time.time):
+        self.window = window
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._windows = {}
+        self._last_prune = clock()
+        self.alerts = 0
+        self.opened = 0
+
+    def add(self, src_ip, dst_ip, protocol, attack_type, confidence, action):
+        """Record one alert; returns True if it opened a new window (a new row)."""
+        key = (src_ip, dst_ip, protocol, attack_type)
+        now = self.clock()
+        with self._lock:
+            self.alerts += 1
+            w = self._windows.get(key)
+            if w is None or now - w.first_seen >= self.window:
+                w = self._windows[key] = AlertWindow(key, action, now, confidence)
+                self.opened += 1
+                opened = True
+            else:
+                w.last_seen = now
+                w.count += 1
+                w.confidence_sum += confidence
+                if confidence > w.max_confidence:
+                    w.max_confidence = confidence
+                opened = False
+            if w.queued:
+                return opened
+            w.queued = True
+            if now - self._last_prune >= self.window:
+                self._prune(now)
+        if not get_writer().submit(w):
+            with self._lock:
+                w.queued = False # retried on the window's next alert
+        return opened
+
+    def _prune(self, now):
+        self._last_prune = now
+        expired = [k for k, w in self._windows.items() if now - w.first_seen >= self.window and not w.queued]
+        for k in expired:
+            del self._windows[k]
+
+    def snapshot(self, windows):
+        """Parameters to write each window as it is now; clears their queued flags."""
+        out = []
+        with self._lock:
+            for w in windows:
+                w.queued = False
+                last_seen, count = _format_time(w.last_seen), w.count
+                mean = w.confidence_sum / count
+                if w.rowid is None:
+                    src_ip, dst_ip, protocol, attack_type = w.key
+                    out.append((w, (_format_time(w.first_seen), src_ip, dst_ip, protocol, attack_type,
+                                    w.first_confidence, w.action, last_seen, count, w.max_confidence, mean)))
+                else:
+                    out.append((w, (last_seen, count, w.max_confidence, mean, w.rowid)))
+        return out
+
+    def release(self, windows):
+        """Clear the queued flags of windows whose write failed."""
+        with self._lock:
+            for w in windows:
+                w.queued = False
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'window_s': self.window, 'alerts': self.alerts, 'windows_opened': self.opened,
+                    'open_windows': len(self._windows)}
+
+class _Flush:
+    """Queue marker: the writer sets `done` once everything before it is committed."""
+    def __init__(self):
+        self.done = threading.Event()
+
+class AlertWriter:
+    """
+    Background thread that owns one WAL-mode connection and writes queued
+    alerts with executemany, one transaction per batch. A batch is written
+    when it reaches batch_size rows or flush_interval seconds after its
+    first row arrived. Queued AlertWindows are inserted (first time) or
+    updated in place in the same transaction. Every PRUNE_INTERVAL seconds
+    it also deletes rows past retention_days, one PRUNE_BATCH chunk at a
+    time between alert batches.
+    """
+
+    def __init__(self, db_path=None, queue_size=WRITER_QUEUE_SIZE, batch_size=WRITER_BATCH_SIZE,
+                 flush_interval=WRITER_FLUSH_INTERVAL, full_policy=WRITER_FULL_POLICY,
+                 put_timeout=WRITER_PUT_TIMEOUT, retention_days=None):
+        self.db_path = db_path or DB_PATH
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.full_policy = full_policy
+        self.put_timeout = put_timeout
+        self.retention_days = RETENTION_DAYS if retention_days is None else retention_days
+        # Held while a batch is being committed; clear_all_logs takes it too
+        self.write_lock = threading.Lock()
+        self.queued = 0
+        self.written = 0
+        self.updated = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self.pruned = 0
+        self._next_prune = time.monotonic() # first pass as soon as the writer starts
+        # Bumped by discard_pending; rows queued under an older epoch are not written
+        self.epoch = 0
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="alert-writer")
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def submit(self, row):
+        """Queue one alert row. Returns False if it was dropped because the queue is full."""
+        if self._stopping:
+            self.dropped += 1
+            return False
+        # Tagged with the epoch now: a row queued before clear_all_logs is dropped, not resurrected
+        item = (self.epoch, row)
+        try:
+            if self.full_policy == 'block':
+                self.queue.put(item, timeout=self.put_timeout)
+            else:
+                self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.queued += 1
+        return True
+
+    def flush(self, timeout=10):
+        """Block until every alert queued before this call has been committed."""
+        if not self.is_alive():
+            return False
+        marker = _Flush()
+        try:
+            self.queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def stop(self, timeout=10):
+        """Write everything still queued, then close the connection."""
+        if not self.is_alive():
+            return
+        self._stopping = True
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+    def discard_pending(self):
+        """
+        Drop alerts that are queued or collected but not yet written.
+        Call with write_lock held (clear_all_logs does).
+        """
+        self.epoch += 1
+        discarded = 0
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _Flush):
+                item.done.set()
+            elif item is None:
+                # Keep the stop request
+                self.queue.put(None)
+                break
+            else:
+                discarded += 1
+        return discarded
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _write(self, conn, tagged):
+        with self.write_lock:
+            rows, windows = [], []
+            for epoch, item in tagged:
+                if epoch == self.epoch:
+                    (windows if isinstance(item, AlertWindow) else rows).append(item)
+            if not rows and not windows:
+                return
+            t0 = time.perf_counter()
+            inserted, updated = [], []
+            try:
+                with conn:
+                    if rows:
+                        conn.executemany(INSERT_SQL, rows)
+                        # Nothing else inserts into attacks inside this transaction, so the ids are consecutive
+                        first_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0] - len(rows) + 1
+                    for window, params in get_aggregator().snapshot(windows) if windows else ():
+                        if window.rowid is None:
+                            inserted.append((window, conn.execute(WINDOW_INSERT_SQL, params).lastrowid, params))
+                        elif conn.execute(WINDOW_UPDATE_SQL, params).rowcount:
+                            updated.append((window, params))
+                        # else its row is gone (a window queued just after clear_all_logs):
+                        # nothing was written, so nothing to record either
+                metrics.stage_db_write.observe(time.perf_counter() - t0)
+            except sqlite3.Error as e:
+                self.errors += 1
+                self.dropped += len(rows) + len(windows)
+                if windows:
+                    # Unflag them so their next alert queues them again (as an insert if never stored)
+                    get_aggregator().release(windows)
+                print(f"[!] Alert writer failed to store {len(rows) + len(windows)} alerts: {e}")
+                return
+            # Row ids only once committed, so a failed insert is retried as an insert
+            new_rows = [(first_id + i, ts, src, dst, proto, attack_type, conf, action, ts, 1, conf, conf)
+                        for i, (ts, src, dst, proto, attack_type, conf, action) in enumerate(rows)]
+            for window, rowid, params in inserted:
+                window.rowid = rowid
+                window.stored_count = params[8]
+                new_rows.append((rowid,) + params)
+            changed = []
+            for window, params in updated:
+                last_seen, count, max_confidence, mean_confidence, rowid = params
+                row = ((rowid, _format_time(window.first_seen)) + window.key +
+                       (window.first_confidence, window.action, last_seen, count, max_confidence, mean_confidence))
+                changed.append((row, count - window.stored_count))
+                window.stored_count = count
+            _recent.record(new_rows, changed)
+            self.written += len(new_rows)
+            self.updated += len(updated)
+            self.batches += 1
+        _notify_change()
+
+    def _prune(self, conn):
+        with self.write_lock:
+            try:
+                deleted = prune_chunk(conn, self.retention_days)
+            except sqlite3.Error as e:
+                self.errors += 1
+                deleted = 0
+                print(f"[!] Alert writer failed to prune old alerts: {e}")
+        self.pruned += deleted
+        # A full chunk means more is due: continue after the next alert batch
+        delay = self.flush_interval if deleted >= PRUNE_BATCH else PRUNE_INTERVAL
+        self._next_prune = time.monotonic() + delay
+        if deleted:
+            _notify_change()
+
+    def _run(self):
+        conn = self._connect()
+        rows = []
+        markers = []
+        first_at = None
+        running = True
+        pruning = self.retention_days > 0
+        while running:
+            now = time.monotonic()
+            timeout = max(0.0, self._next_prune - now) if pruning else None
+            if rows:
+                flush_in = max(0.0, first_at + self.flush_interval - now)
+                timeout = flush_in if timeout is None else min(timeout, flush_in)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False # Interval elapsed
+
+            if item is None:
+                running = False
+            elif isinstance(item, _Flush):
+                markers.append(item)
+            elif item is not False:
+                if not rows:
+                    first_at = time.monotonic()
+                rows.append(item)
+
+            if rows and (len(rows) >= self.batch_size or item is False or markers or not running):
+                self._write(conn, rows)
+                rows = []
+            for marker in markers:
+                marker.done.set()
+            markers = []
+            if pruning and running and time.monotonic() >= self._next_prune:
+                self._prune(conn)
+        conn.close()
+
+    def stats(self):
+        return {
+            'queued': self.queued,
+            'written': self.written,
+            'updated': self.updated,
+            'dropped': self.dropped,
+            'pending': self.queue.qsize(),
+            'batches': self.batches,
+            'errors': self.errors,
+            'pruned': self.pruned,
+        }
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """Return the process-wide alert writer, starting it on first use."""
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        with _writer_lock:
+            if _writer is None or not _writer.is_alive():
+                _writer = AlertWriter().start()
+    return _writer
+
+def flush_alerts(timeout=10):
+    if _writer is not None:
+        return _writer.flush(timeout)
+    return True
+
+def shutdown_writer():
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+def get_writer_stats():
+    if _writer is None:
+        return {'queued': 0, 'written': 0, 'updated': 0, 'dropped': 0, 'pending': 0, 'batches': 0, 'errors': 0,
+                'pruned': 0}
+    return _writer.stats()
+
+atexit.register(shutdown_writer)
+
+@metrics.register_collector
+def _writer_metrics():
+    s = get_writer_stats()
+    yield 'alert_writer_pending', 'gauge', 'Alerts queued for the database writer.', s['pending']
+    yield 'alert_writer_written_total', 'counter', 'Alert rows inserted into the database.', s['written']
+    yield 'alert_writer_updated_total', 'counter', 'Aggregated alert rows updated in place.', s['updated']
+    yield 'alert_writer_dropped_total', 'counter', 'Alerts dropped (queue full or write error).', s['dropped']
+    yield 'alert_writer_batches_total', 'counter', 'Write transactions committed.', s['batches']
+    yield 'alert_writer_pruned_total', 'counter', 'Alert rows deleted past the retention window.', s['pruned']
+
+_aggregator = None
+
+def get_aggregator():
+    """The process-wide AlertAggregator (recreated if ALERT_WINDOW changed)."""
+    global _aggregator
+    if _aggregator is None or _aggregator.window != ALERT_WINDOW:
+        with _writer_lock:
+            if _aggregator is None or _aggregator.window != ALERT_WINDOW:
+                _aggregator = AlertAggregator(ALERT_WINDOW)
+    return _aggregator
+
+def get_aggregation_stats():
+    if ALERT_WINDOW <= 0:
+        return None
+    return get_aggregator().stats()
+
+def log_attack(src_ip, dst_ip, protocol, attack_type, confidence, action):
+    """
+    Queue an alert for the background writer; returns immediately.
+    The timestamp is taken now (UTC, like CURRENT_TIMESTAMP), not at write time.
+    With ALERT_WINDOW set, repeats of a recent alert only update its row.
+    Returns True if a new alert row was queued.
+    """
+    if ALERT_WINDOW > 0:
+        return get_aggregator().add(src_ip, dst_ip, protocol, attack_type, float(confidence), action)
+    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return get_writer().submit((timestamp, src_ip, dst_ip, protocol, attack_type, float(confidence), action))
 
 def get_recent_alerts(limit=10):
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
+    # id is the rowid, so this walks the table b-tree backwards: no sort, no extra index
     c.execute('SELECT * FROM attacks ORDER BY id DESC LIMIT ?', (limit,))
     rows = c.fetchall()
     conn.close()
     return rows
 
+def _read_stats(c):
+    c.execute('SELECT attack_type, count, packets FROM attack_summary WHERE count > 0')
+    rows = c.fetchall()
+    types = {attack_type: count for attack_type, count, _ in rows}
+    return sum(types.values()), types, sum(packets for _, _, packets in rows)
+
 def get_stats():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    c.execute('SELECT count(*) FROM attacks')
-    total_attacks = c.fetchone()[0]
-    
-    # Group by attack type
-    c.execute('SELECT attack_type, count(*) FROM attacks GROUP BY attack_type')
-    types = c.fetchall()
-    
+    total_attacks, types, _ = _read_stats(c)
     conn.close()
-    return total_attacks, dict(types)
+    return total_attacks, types
 
-def clear_all_logs():
-    conn = sqlite3.connect(DB_PATH, timeout=10)
+def load_recent_alerts():
+    """Rebuild the in-memory recent alerts and totals from the database (init_db does this)."""
+    writer = _writer
+    lock = writer.write_lock if writer is not None else threading.Lock()
+    with lock:
+        total_attacks, types, recent_rows, total_packets = get_dashboard_snapshot(_recent.size)
+        _recent.load(total_attacks, types, recent_rows, total_packets)
+
+def get_live_snapshot(limit=10):
+    """get_dashboard_snapshot from memory: what the writer has committed, no database access."""
+    return _recent.snapshot(limit)
+
+def get_dashboard_snapshot(limit=10):
+    """Alert totals, per-type counts, the latest alerts and the packets they cover, read in one transaction."""
+    conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    c.execute('DELETE FROM attacks')
-    conn.commit()
+    c.execute('BEGIN')
+    total_attacks, types, total_packets = _read_stats(c)
+    c.execute('SELECT * FROM attacks ORDER BY id DESC LIMIT ?', (limit,))
+    recent = c.fetchall()
+    conn.rollback()
+    conn.close()
+    return total_attacks, types, recent, total_packets
+
+def get_alerts(limit=50, before=None, src_ip=None, since=None, until=None):
+    """
+    One page of alerts, newest first, by (timestamp, id). `before` is the
+    (timestamp, id) of the last alert on the previous page: keyset
+    pagination, so every page is an index range scan from that point
+    however deep it is (OFFSET would step over every earlier row).
+    since/until are UTC 'YYYY-MM-DD HH:MM:SS' bounds (until exclusive).
+    Returns (rows, next_before); next_before is None on the last page.
+    """
+    where, params = [], []
+    if src_ip:
+        where.append('src_ip = ?') # idx_attacks_src
+        params.append(src_ip)
+    if since:
+        where.append('timestamp >= ?')
+        params.append(since)
+    if until:
+        where.append('timestamp < ?')
+        params.append(until)
+    if before:
+        where.append('(timestamp, id) < (?, ?)')
+        params.extend(before)
+    sql = 'SELECT * FROM attacks'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(sql, params + [limit + 1]).fetchall()
+    conn.close()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1][1], rows[-1][0])
+
+def get_rollups(resolution='hour', since=None, until=None, attack_type=None):
+    """Alert and packet counts per bucket and type: [(bucket, attack_type, alerts, packets)], oldest first."""
+    if resolution not in ROLLUP_TABLES:
+        raise ValueError(f"Unknown rollup resolution {resolution!r}; expected one of {', '.join(ROLLUP_TABLES)}")
+    where, params = [], []
+    if since:
+        where.append('bucket >= ?')
+        params.append(since)
+    if until:
+        where.append('bucket < ?')
+        params.append(until)
+    if attack_type:
+        where.append('attack_type = ?')
+        params.append(attack_type)
+    sql = f'SELECT bucket, attack_type, alerts, packets FROM {ROLLUP_TABLES[resolution]}'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY bucket, attack_type'
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+def get_source_summary(src_ip, since=None, until=None):
+    """
+    What one source did, per attack type:
+    [(attack_type, alerts, packets, first_seen, last_seen, max_confidence)].
+    Reads only that source's rows through idx_attacks_src.
+    """
+    sql = '''
+        SELECT COALESCE(attack_type, 'Unknown'), count(*), sum(packet_count), min(timestamp),
+               max(COALESCE(last_seen, timestamp)), max(COALESCE(max_confidence, confidence))
+        FROM attacks WHERE src_ip = ?
+    '''
+    params = [src_ip]
+    if since:
+        sql += ' AND timestamp >= ?'
+        params.append(since)
+    if until:
+        sql += ' AND timestamp < ?'
+        params.append(until)
+    sql += ' GROUP BY 1 ORDER BY 2 DESC'
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(sql, params).fetchall()
     conn.close()
+    return rows
+
+def prune_chunk(conn, retention_days=None, batch=PRUNE_BATCH, now=None):
+    """
+    Delete up to `batch` alert rows older than retention_days (oldest first)
+    and per-minute rollups older than MINUTE_ROLLUP_RETENTION_DAYS, in one
+    transaction. The summary and rollups are left as they are (no delete
+    trigger), so totals still cover the pruned history. Returns rows deleted.
+    """
+    retention_days = RETENTION_DAYS if retention_days is None else retention_days
+    if retention_days <= 0:
+        return 0
+    now = time.time() if now is None else now
+    with conn:
+        deleted = conn.execute('''
+            DELETE FROM attacks WHERE id IN
+                (SELECT id FROM attacks WHERE timestamp < ? ORDER BY timestamp LIMIT ?)
+        ''', (_format_time(now - retention_days * 86400), batch)).rowcount
+        if MINUTE_ROLLUP_RETENTION_DAYS > 0:
+            conn.execute(f"DELETE FROM {ROLLUP_TABLES['minute']} WHERE bucket < ?",
+                         (_format_time(now - MINUTE_ROLLUP_RETENTION_DAYS * 86400),))
+    return deleted
+
+def prune_old_alerts(retention_days=None, now=None):
+    """Delete every alert row past retention now, chunk by chunk (the writer does this on its own)."""
+    writer = _writer
+    lock = writer.write_lock if writer is not None else threading.Lock()
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    total = 0
+    try:
+        while True:
+            with lock:
+                deleted = prune_chunk(conn, retention_days, now=now)
+            total += deleted
+            if deleted < PRUNE_BATCH:
+                break
+    finally:
+        conn.close()
+    if total:
+        _notify_change()
+    return total
+
+def clear_all_logs():
+    # Hold the writer's lock so no batch lands between the discard and the DELETE
+    writer = _writer
+    lock = writer.write_lock if writer is not None else threading.Lock()
+    with lock:
+        if writer is not None:
+            writer.discard_pending()
+        if _aggregator is not None:
+            _aggregator.clear()
+        conn = sqlite3.connect(DB_PATH, timeout=10)
+        c = conn.cursor()
+        # One transaction so the summary and rollups never disagree with attacks
+        c.execute('DELETE FROM attacks')
+        c.execute('DELETE FROM attack_summary')
+        for table in ROLLUP_TABLES.values():
+            c.execute(f'DELETE FROM {table}')
+        conn.commit()
+        conn.close()
+        _recent.clear()
+    _notify_change()
 
-# Initialize on module load
-if not os.path.exists(DB_PATH):
-    init_db()
+# Initialize on module load (idempotent; also upgrades older databases)
+init_db()
@@ -0,0 +1,156 @@
+"""
+On-disk cache of preprocessed training features.
+
+Parsing the CSV and encoding/scaling it is most of the time before the
+first training epoch, and it gives the same result every run until the
+dataset or the preprocessing changes. An entry keeps that result as .npy
+files (X_train, y_train, X_val, y_val) that are opened with mmap_mode='r',
+so training and evaluation read them zero-copy straight from the page
+cache, plus the encoders.pkl/scaler.pkl that produced them.
+
+Entries are keyed by a SHA-256 of the source file's contents and of the
+preprocessing parameters (columns, split, dtype, CACHE_VERSION), so an
+edited dataset or a changed split misses and is rebuilt. An entry is
+written to a temporary directory and renamed into place once complete;
+older entries for the same source file are removed then.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+import preprocessing
+
+CACHE_DIR = os.environ.get('IDPS_FEATURE_CACHE', os.path.join(preprocessing.MODEL_PATH, 'cache'))
+# Bump when preprocessing output changes in a way the parameters do not capture
+CACHE_VERSION = 1
+HASH_BLOCK = 1 << 20
+ARRAYS = ('X_train', 'y_train', 'X_val', 'y_val')
+META_FILE = 'meta.json'
+
+
+def file_digest(file_path):
+    """SHA-256 hex digest of a file's contents, read in blocks."""
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def preprocessing_params(**params):
+    """Parameters that determine the cached arrays, with the shared column layout."""
+    return dict(params, version=CACHE_VERSION, columns=preprocessing.COL_NAMES,
+                cat_cols=preprocessing.CAT_COLS)
+
+
+def cache_key(digest, params):
+    blob = json.dumps({'data': digest, 'params': params}, sort_keys=True).encode()
+    return hashlib.sha256(blob).hexdigest()[:32]
+
+
+class FeatureCache:
+    """Cache entries for one source file and one set of preprocessing parameters."""
+
+    def __init__(self, file_path, params, cache_dir=CACHE_DIR):
+        self.file_path = os.path.abspath(file_path)
+        self.params = params
+        self.cache_dir = cache_dir
+        self.digest = file_digest(file_path)
+        self.key = cache_key(self.digest, params)
+        self.path = os.path.join(cache_dir, self.key)
+
+    def lookup(self):
+        """Entry metadata if a complete entry exists, else None."""
+        try:
+            with open(os.path.join(self.path, META_FILE)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('key') != self.key:
+            return None
+        if not all(os.path.exists(os.path.join(self.path, name + '.npy')) for name in ARRAYS):
+            return None
+        return meta
+
+    def load(self, restore_preprocessors=True):
+        """
+        Memory-mapped (read-only) arrays of the entry, by name. With
+        restore_preprocessors the entry's encoders/scaler are copied over
+        preprocessing.ENCODER_PATH/SCALER_PATH, as a fresh fit would have.
+        """
+        arrays = {name: np.load(os.path.join(self.path, name + '.npy'), mmap_mode='r')
+                  for name in ARRAYS}
+        if restore_preprocessors:
+            os.makedirs(os.path.dirname(preprocessing.ENCODER_PATH), exist_ok=True)
+            shutil.copyfile(os.path.join(self.path, 'encoders.pkl'), preprocessing.ENCODER_PATH)
+            shutil.copyfile(os.path.join(self.path, 'scaler.pkl'), preprocessing.SCALER_PATH)
+        return arrays
+
+    def writer(self):
+        return CacheWriter(self)
+
+    def prune(self):
+        """Remove other entries built from the same source file (stale) and leftover temp dirs."""
+        removed = 0
+        if not os.path.isdir(self.cache_dir):
+            return removed
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name == self.key or not os.path.isdir(path):
+                continue
+            if name.startswith('.tmp-'):
+                # Interrupted writes; skip ones that may still be in progress
+                if time.time() - os.path.getmtime(path) > 3600:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            try:
+                with open(os.path.join(path, META_FILE)) as f:
+                    source = json.load(f).get('source')
+            except (OSError, ValueError):
+                source = None
+            if source == self.file_path:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+
+class CacheWriter:
+    """
+    Builds one entry in a temporary directory. Arrays are either saved
+    whole (save) or allocated as writable .npy memmaps and filled in
+    place (allocate), for data that does not fit in memory.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        os.makedirs(cache.cache_dir, exist_ok=True)
+        self.tmp = tempfile.mkdtemp(prefix='.tmp-', dir=cache.cache_dir)
+
+    def save(self, name, array):
+        np.save(os.path.join(self.tmp, name + '.npy'), array)
+
+    def allocate(self, name, shape, dtype):
+        return open_memmap(os.path.join(self.tmp, name + '.npy'), mode='w+', dtype=dtype, shape=shape)
+
+    def commit(self, **extra):
+        """Add the current encoders/scaler and the metadata, then move the entry into place."""
+        cache = self.cache
+        shutil.copyfile(preprocessing.ENCODER_PATH, os.path.join(self.tmp, 'encoders.pkl'))
+        shutil.copyfile(preprocessing.SCALER_PATH, os.path.join(self.tmp, 'scaler.pkl'))
+        meta = dict(extra, key=cache.key, source=cache.file_path, digest=cache.digest,
+                    params=cache.params, created=time.time())
+        with open(os.path.join(self.tmp, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=1)
+        shutil.rmtree(cache.path, ignore_errors=True) # incomplete entry under the same key
+        os.replace(self.tmp, cache.path)
+        cache.prune()
+        return meta
+
+    def abort(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
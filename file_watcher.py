@@ -0,0 +1,44 @@
+import os
+import time
+
+CHECK_INTERVAL = 2.0 # seconds between stat() passes over the watched files
+
+
+class FileWatcher:
+    """
+    Notices when any of a set of files (model, encoders, scaler) changes on
+    disk, by comparing size/mtime against a snapshot. changed() stats the
+    files at most every `check_interval` seconds; snapshot() records their
+    current state, and is taken only after the files were loaded
+    successfully, so a failed load keeps reporting a change until one works.
+    """
+
+    def __init__(self, paths=(), check_interval=CHECK_INTERVAL):
+        self.paths = tuple(paths)
+        self.check_interval = check_interval
+        self._fingerprint = self._file_fingerprint()
+        self._next_check = time.monotonic() + check_interval
+
+    def _file_fingerprint(self):
+        fp = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                fp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                fp.append(None)
+        return tuple(fp)
+
+    def snapshot(self, paths=None):
+        """Record the files' current state (watching `paths` from now on, if given)."""
+        if paths is not None:
+            self.paths = tuple(paths)
+        self._fingerprint = self._file_fingerprint()
+
+    def changed(self):
+        """True when a watched file differs from the last snapshot (rate-limited stat calls)."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        return self._file_fingerprint() != self._fingerprint
@@ -0,0 +1,467 @@
+"""
+Connection/host state table for the NSL-KDD traffic features.
+
+The NSL-KDD "time-based" features (count, srv_count, *_rate) are computed
+over the connections seen in the last TIME_WINDOW seconds, and the
+"host-based" features (dst_host_*) over the last HOST_WINDOW connections.
+Both windows are kept as deques of Connection objects plus running counters,
+so each packet costs O(1) amortized: a connection is counted once when it
+enters a window and un-counted once when it leaves.
+
+A connection's error class (S0 -> SYN error, REJ -> rejected) can change
+after it has been counted (e.g. the SYN-ACK arrives), so the error counters
+of any window still holding it are adjusted in place.
+
+Content features (hot, num_failed_logins, logged_in, ...) need payload
+inspection and are still reported as 0.
+"""
+import zlib
+from collections import OrderedDict, deque
+
+# Window sizes as defined by NSL-KDD
+TIME_WINDOW = 2.0
+HOST_WINDOW = 100
+
+# Memory bounds
+IDLE_TIMEOUT = 60.0        # seconds without packets before a connection is dropped
+MAX_CONNECTIONS = 100000   # hard cap on tracked connections (oldest evicted first)
+MAX_WINDOW_EVENTS = 200000 # hard cap on connections held by the 2-second window
+
+# TCP flag bits
+FIN = 0x01
+SYN = 0x02
+RST = 0x04
+ACK = 0x10
+URG = 0x20
+
+FEATURE_NAMES = ["duration","protocol_type","service","flag","src_bytes",
+    "dst_bytes","land","wrong_fragment","urgent","hot","num_failed_logins",
+    "logged_in","num_compromised","root_shell","su_attempted","num_root",
+    "num_file_creations","num_shells","num_access_files","num_outbound_cmds",
+    "is_host_login","is_guest_login","count","srv_count","serror_rate",
+    "srv_serror_rate","rerror_rate","srv_rerror_rate","same_srv_rate",
+    "diff_srv_rate","srv_diff_host_rate","dst_host_count","dst_host_srv_count",
+    "dst_host_same_srv_rate","dst_host_diff_srv_rate","dst_host_same_src_port_rate",
+    "dst_host_srv_diff_host_rate","dst_host_serror_rate","dst_host_srv_serror_rate",
+    "dst_host_rerror_rate","dst_host_srv_rerror_rate"]
+
+# Responder port -> NSL-KDD service name. Anything else is 'private'.
+TCP_SERVICES = {
+    20: 'ftp_data', 21: 'ftp', 22: 'ssh', 23: 'telnet', 25: 'smtp',
+    37: 'time', 43: 'whois', 53: 'domain', 70: 'gopher', 79: 'finger',
+    80: 'http', 109: 'pop_2', 110: 'pop_3', 111: 'sunrpc', 113: 'auth',
+    119: 'nntp', 143: 'imap4', 179: 'bgp', 389: 'ldap', 443: 'http_443',
+    512: 'exec', 513: 'login', 514: 'shell', 515: 'printer', 543: 'klogin',
+    544: 'kshell', 6000: 'X11', 8001: 'http_8001', 2784: 'http_2784',
+}
+UDP_SERVICES = {
+    53: 'domain_u', 69: 'tftp_u', 123: 'ntp_u',
+}
+ICMP_SERVICES = {
+    0: 'ecr_i', 3: 'urp_i', 8: 'eco_i', 13: 'tim_i', 14: 'tim_i', 17: 'red_i',
+}
+
+# Flag -> error class counted by the *_serror_rate / *_rerror_rate features
+SERROR = 1
+RERROR = 2
+FLAG_ERRORS = {'S0': SERROR, 'S1': SERROR, 'S2': SERROR, 'S3': SERROR, 'REJ': RERROR}
+
+
+def service_name(proto, dport, icmp_type=None):
+    if proto == 'tcp':
+        return TCP_SERVICES.get(dport, 'private')
+    if proto == 'udp':
+        return UDP_SERVICES.get(dport, 'private')
+    if proto == 'icmp':
+        return ICMP_SERVICES.get(icmp_type, 'oth_i')
+    return 'other'
+
+
+def flow_hash(src, dst, sport, dport, proto):
+    """
+    Direction-independent 32-bit hash of a 5-tuple: A->B and B->A hash the
+    same. Uses crc32 rather than hash() so it is stable across processes/runs.
+    """
+    a, b = (src, sport), (dst, dport)
+    if b < a:
+        a, b = b, a
+    return zlib.crc32(f"{a[0]}|{a[1]}|{b[0]}|{b[1]}|{proto}".encode())
+
+
+def is_wrong_fragment(more_fragments, frag_offset, ip_payload_len):
+    """A fragment is 'wrong' if a non-final piece is not 8-byte aligned or it overruns 64 KB."""
+    if more_fragments and ip_payload_len % 8:
+        return True
+    return frag_offset * 8 + ip_payload_len > 65535
+
+
+# Connection.hs bits: what has been seen of the TCP handshake
+HS_SYN = 1
+HS_SYNACK = 2
+HS_RST_ORIG = 4
+HS_RST_RESP = 8
+
+
+class Connection:
+    __slots__ = ('src', 'dst', 'sport', 'dport', 'proto', 'service', 'start',
+                 'last', 'src_bytes', 'dst_bytes', 'urgent', 'wrong_fragment',
+                 'land', 'hs', 'flag', 'err', 'c_host', 'c_srv', 'c_host_srv',
+                 'in_time', 'in_host')
+
+    def __init__(self, ts, src, dst, sport, dport, proto, service):
+        self.src = src
+        self.dst = dst
+        self.sport = sport
+        self.dport = dport
+        self.proto = proto
+        self.service = service
+        self.start = ts
+        self.last = ts
+        self.src_bytes = 0
+        self.dst_bytes = 0
+        self.urgent = 0
+        self.wrong_fragment = 0
+        self.land = 1 if (src == dst and sport == dport) else 0
+        self.hs = 0
+        self.flag = 'SF'
+        self.err = 0
+        # Counters of its host, service and (host, service), set when it
+        # enters the windows; in_time/in_host say which windows still hold it
+        self.in_time = self.in_host = False
+
+    def compute_flag(self):
+        """Map the observed handshake to the NSL-KDD connection flag."""
+        hs = self.hs
+        if self.proto != 'tcp' or not hs & HS_SYN:
+            return 'SF'
+        if not hs & HS_SYNACK:
+            if hs & HS_RST_RESP:
+                return 'REJ'
+            if hs & HS_RST_ORIG:
+                return 'RSTOS0'
+            return 'S0'
+        if hs & HS_RST_ORIG:
+            return 'RSTO'
+        if hs & HS_RST_RESP:
+            return 'RSTR'
+        return 'SF'
+
+
+class FlowTable:
+    """
+    Incremental NSL-KDD feature extractor.
+    Not thread-safe: feed it from a single capture/analysis thread.
+
+    Both windows share one counter list per key, so a new connection costs
+    three dict lookups however many features it feeds:
+        hosts      dst  -> [n, serror, rerror] in the 2-second window, then the same in the host window
+        srvs       service -> [n, serror, rerror] in the 2-second window, n in the host window
+        host_srvs  (dst, service) -> n in the 2-second window, [n, serror, rerror] in the host window
+    An entry is deleted once neither window counts anything under it.
+    """
+
+    def __init__(self, time_window=TIME_WINDOW, host_window=HOST_WINDOW,
+                 idle_timeout=IDLE_TIMEOUT, max_connections=MAX_CONNECTIONS,
+                 max_window_events=MAX_WINDOW_EVENTS):
+        self.time_window = time_window
+        self.host_window = host_window
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.max_window_events = max_window_events
+        self.clear()
+
+    def clear(self):
+        # (src, sport, dst, dport, proto) -> Connection, ordered by last activity
+        self.connections = OrderedDict()
+        self.now = 0.0
+        self._next_sweep = 0.0
+
+        # Connections in the 2-second window and in the last-100 window, oldest first
+        self.recent = deque()
+        self.last_conns = deque()
+        self.hosts = {}
+        self.srvs = {}
+        self.host_srvs = {}
+        # Host window only: connections per (dst host, src port)
+        self.h_host_sport = {}
+
+        self.total_connections = 0
+        self.expired = 0
+        self.evicted = 0
+
+    # Window bookkeeping -----------------------------------------------------
+
+    def _enter_windows(self, conn):
+        h, s = conn.dst, conn.service
+        hs = (h, s)
+        err = conn.err
+
+        # Counter lookups are inlined: this runs once per new connection
+        t = self.hosts
+        c1 = t.get(h)
+        if c1 is None:
+            c1 = t[h] = [0, 0, 0, 0, 0, 0]
+        t = self.srvs
+        c2 = t.get(s)
+        if c2 is None:
+            c2 = t[s] = [0, 0, 0, 0]
+        t = self.host_srvs
+        c3 = t.get(hs)
+        if c3 is None:
+            c3 = t[hs] = [0, 0, 0, 0]
+
+        conn.c_host, conn.c_srv, conn.c_host_srv = c1, c2, c3
+        conn.in_time = conn.in_host = True
+        c1[0] += 1
+        c1[3] += 1
+        c2[0] += 1
+        c2[3] += 1
+        c3[0] += 1
+        c3[1] += 1
+        if err:
+            c1[err] += 1
+            c1[3 + err] += 1
+            c2[err] += 1
+            c3[1 + err] += 1
+        self.recent.append(conn)
+
+        hp = (h, conn.sport)
+        t = self.h_host_sport
+        t[hp] = t.get(hp, 0) + 1
+        last = self.last_conns
+        last.append(conn)
+        if len(last) > self.host_window:
+            self._leave_host_window(last.popleft())
+
+    def _leave_time_window(self, conn):
+        c1, c2, c3 = conn.c_host, conn.c_srv, conn.c_host_srv
+        err = conn.err
+        if err:
+            c1[err] -= 1
+            c2[err] -= 1
+        conn.in_time = False
+        c1[0] -= 1
+        if not c1[0] and not c1[3]:
+            del self.hosts[conn.dst]
+        c2[0] -= 1
+        if not c2[0] and not c2[3]:
+            del self.srvs[conn.service]
+        c3[0] -= 1
+        if not c3[0] and not c3[1]:
+            del self.host_srvs[(conn.dst, conn.service)]
+
+    def _leave_host_window(self, conn):
+        c1, c2, c3 = conn.c_host, conn.c_srv, conn.c_host_srv
+        err = conn.err
+        if err:
+            c1[3 + err] -= 1
+            c3[1 + err] -= 1
+        conn.in_host = False
+        h = conn.dst
+        c1[3] -= 1
+        if not c1[3] and not c1[0]:
+            del self.hosts[h]
+        c2[3] -= 1
+        if not c2[3] and not c2[0]:
+            del self.srvs[conn.service]
+        c3[1] -= 1
+        if not c3[1] and not c3[0]:
+            del self.host_srvs[(h, conn.service)]
+
+        hp = (h, conn.sport)
+        t = self.h_host_sport
+        n = t[hp] - 1
+        if n:
+            t[hp] = n
+        else:
+            del t[hp]
+
+    def _set_flag(self, conn, flag):
+        """Change a connection's flag, moving it between error counters of windows that still hold it."""
+        conn.flag = flag
+        old, new = conn.err, FLAG_ERRORS.get(flag, 0)
+        if old == new:
+            return
+        conn.err = new
+        if conn.in_time:
+            c1, c2 = conn.c_host, conn.c_srv
+            if old:
+                c1[old] -= 1
+                c2[old] -= 1
+            if new:
+                c1[new] += 1
+                c2[new] += 1
+        if conn.in_host:
+            c1, c3 = conn.c_host, conn.c_host_srv
+            if old:
+                c1[3 + old] -= 1
+                c3[1 + old] -= 1
+            if new:
+                c1[3 + new] += 1
+                c3[1 + new] += 1
+
+    def _expire(self, now):
+        recent = self.recent
+        horizon = now - self.time_window
+        while recent and (recent[0].start < horizon or len(recent) > self.max_window_events):
+            self._leave_time_window(recent.popleft())
+
+        conns = self.connections
+        if now >= self._next_sweep:
+            # Idle sweep at most once per second of packet time
+            self._next_sweep = now + 1.0
+            idle_horizon = now - self.idle_timeout
+            while conns:
+                key, oldest = next(iter(conns.items()))
+                if oldest.last >= idle_horizon:
+                    break
+                del conns[key]
+                self.expired += 1
+        while len(conns) > self.max_connections:
+            conns.popitem(last=False)
+            self.evicted += 1
+
+    # Public API -------------------------------------------------------------
+
+    def update(self, ts, src, dst, proto, sport=0, dport=0, tcp_flags=0,
+               payload_len=0, wrong_fragment=False, icmp_type=None):
+        """
+        Account for one packet and return its 41-value NSL-KDD feature row.
+        proto is 'tcp', 'udp', 'icmp' or anything else for other IP protocols.
+        """
+        if ts > self.now:
+            self.now = ts
+        now = self.now
+
+        conns = self.connections
+        key = (src, sport, dst, dport, proto)
+        conn = conns.get(key)
+        forward = True
+        if conn is None:
+            rkey = (dst, dport, src, sport, proto)
+            conn = conns.get(rkey)
+            if conn is not None:
+                key = rkey
+                forward = False
+
+        # A fresh SYN on a connection that never completed (or was reset)
+        # is a new connection attempt, e.g. SYN floods reusing one port.
+        if (conn is not None and forward and proto == 'tcp'
+                and (tcp_flags & (SYN | ACK)) == SYN
+                and conn.hs & HS_SYN and conn.hs & (HS_SYNACK | HS_RST_ORIG | HS_RST_RESP) != HS_SYNACK):
+            del conns[key]
+            conn = None
+
+        if conn is None:
+            conn = Connection(ts, src, dst, sport, dport, proto,
+                              service_name(proto, dport, icmp_type))
+            conns[key] = conn
+            self.total_connections += 1
+            new = True
+        else:
+            conns.move_to_end(key)
+            new = False
+
+        conn.last = ts
+        if forward:
+            conn.src_bytes += payload_len
+        else:
+            conn.dst_bytes += payload_len
+        if wrong_fragment:
+            conn.wrong_fragment += 1
+
+        if tcp_flags and proto == 'tcp':
+            if tcp_flags & URG:
+                conn.urgent += 1
+            if tcp_flags & (SYN | RST):
+                if tcp_flags & SYN:
+                    if forward and not tcp_flags & ACK:
+                        conn.hs |= HS_SYN
+                    elif not forward and tcp_flags & ACK:
+                        conn.hs |= HS_SYNACK
+                if tcp_flags & RST:
+                    conn.hs |= HS_RST_ORIG if forward else HS_RST_RESP
+                flag = conn.compute_flag()
+                if flag != conn.flag:
+                    self._set_flag(conn, flag)
+
+        if new:
+            self._enter_windows(conn)
+        # Window/idle expiry, called only when something is due
+        recent = self.recent
+        if ((recent and (recent[0].start < now - self.time_window or len(recent) > self.max_window_events))
+                or now >= self._next_sweep or len(conns) > self.max_connections):
+            self._expire(now)
+
+        return self._row(conn, now)
+
+    def _row(self, conn, now):
+        h, s = conn.dst, conn.service
+
+        # Time-window features; the connection may already have left the
+        # 2-second window, in which case the counters are looked up by key.
+        if conn.in_time:
+            th, ts_, ths = conn.c_host, conn.c_srv, conn.c_host_srv
+        else:
+            th, ts_, ths = self.hosts.get(h), self.srvs.get(s), self.host_srvs.get((h, s))
+        count = th[0] if th else 0
+        host_srv = ths[0] if ths else 0
+        if count:
+            serror_rate = th[1] / count
+            rerror_rate = th[2] / count
+            same_srv_rate = host_srv / count
+            diff_srv_rate = (count - host_srv) / count
+        else:
+            serror_rate = rerror_rate = same_srv_rate = diff_srv_rate = 0.0
+        srv_count = ts_[0] if ts_ else 0
+        if srv_count:
+            srv_serror_rate = ts_[1] / srv_count
+            srv_rerror_rate = ts_[2] / srv_count
+            srv_diff_host_rate = (srv_count - host_srv) / srv_count
+        else:
+            srv_serror_rate = srv_rerror_rate = srv_diff_host_rate = 0.0
+
+        # Host-window features
+        if conn.in_host:
+            hh, hs_, hhs = conn.c_host, conn.c_srv, conn.c_host_srv
+        else:
+            hh, hs_, hhs = th, ts_, ths
+        dh_count = hh[3] if hh else 0
+        dh_srv_count = hhs[1] if hhs else 0
+        if dh_count:
+            dh_same_srv = dh_srv_count / dh_count
+            dh_diff_srv = (dh_count - dh_srv_count) / dh_count
+            dh_same_sport = self.h_host_sport.get((h, conn.sport), 0) / dh_count
+            dh_serror = hh[4] / dh_count
+            dh_rerror = hh[5] / dh_count
+        else:
+            dh_same_srv = dh_diff_srv = dh_same_sport = dh_serror = dh_rerror = 0.0
+        if dh_srv_count:
+            dh_srv_serror = hhs[2] / dh_srv_count
+            dh_srv_rerror = hhs[3] / dh_srv_count
+        else:
+            dh_srv_serror = dh_srv_rerror = 0.0
+        dh_s = hs_[3] if hs_ else 0
+        dh_srv_diff_host = (dh_s - dh_srv_count) / dh_s if dh_s else 0.0
+
+        return [
+            int(now - conn.start), conn.proto if conn.proto in ('tcp', 'udp', 'icmp') else 'tcp',
+            s, conn.flag, conn.src_bytes, conn.dst_bytes, conn.land,
+            conn.wrong_fragment, conn.urgent,
+            # Content features (need payload inspection)
+            0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+            count, srv_count, serror_rate, srv_serror_rate, rerror_rate,
+            srv_rerror_rate, same_srv_rate, diff_srv_rate, srv_diff_host_rate,
+            dh_count, dh_srv_count, dh_same_srv, dh_diff_srv, dh_same_sport,
+            dh_srv_diff_host, dh_serror, dh_srv_serror, dh_rerror, dh_srv_rerror,
+        ]
+
+    def stats(self):
+        return {
+            'connections': len(self.connections),
+            'time_window_connections': len(self.recent),
+            'host_window_connections': len(self.last_conns),
+            'total_connections': self.total_connections,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
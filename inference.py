@@ -0,0 +1,155 @@
+import queue
+import threading
+import time
+
+# Defaults: flush a batch when it reaches BATCH_SIZE rows or when the oldest
+# row has waited BATCH_DEADLINE_MS, whichever comes first.
+BATCH_SIZE = 256
+BATCH_DEADLINE_MS = 5.0
+
+_STOP = object()
+
+
+class BatchInferenceWorker:
+    """
+    Micro-batching inference stage.
+    Capture threads call submit(row, meta); a single worker thread drains the
+    queue into batches and runs one forward pass per batch, then hands each
+    (meta, confidence) pair to the verdict callback.
+
+    score_fn(rows) -> sequence of confidences, one per row
+    verdict_fn(meta, confidence) -> None
+    """
+
+    def __init__(self, score_fn, verdict_fn, batch_size=BATCH_SIZE,
+                 deadline_ms=BATCH_DEADLINE_MS, max_queue=None):
+        self.score_fn = score_fn
+        self.verdict_fn = verdict_fn
+        self.batch_size = max(1, int(batch_size))
+        self.deadline = max(0.0, float(deadline_ms)) / 1000.0
+        if max_queue is None:
+            max_queue = self.batch_size * 64
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.submitted = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rows = 0
+        self.max_batch = 0
+        self.last_batch = 0
+        self.errors = 0
+        # Achieved batch sizes, bucketed by power of two: {1: n, 2: n, 4: n, ...}
+        self.batch_size_hist = {}
+
+    def start(self):
+        if self.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="inference-worker")
+        self._thread.daemon = True
+        self._thread.start()
+        print(f"[*] Inference worker started (batch_size={self.batch_size}, "
+              f"deadline={self.deadline * 1000:.1f} ms)")
+
+    def stop(self, timeout=5.0):
+        """Process everything already queued, then stop the worker thread."""
+        if not self.is_alive():
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, row, meta, timeout=None):
+        """
+        Queue one feature row. With a timeout, wait up to that many seconds
+        for room. Returns False if the queue is full and the row was dropped.
+        """
+        try:
+            if timeout is None:
+                self.queue.put_nowait((row, meta))
+            else:
+                self.queue.put((row, meta), timeout=timeout)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def _collect(self, first):
+        """Build a batch starting with `first`, bounded by size cap and deadline."""
+        batch = [first]
+        deadline = time.perf_counter() + self.deadline
+        get_nowait = self.queue.get_nowait
+        while len(batch) < self.batch_size:
+            try:
+                item = get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                # Re-queue so the run loop sees it after this batch is flushed
+                self.queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is _STOP:
+                break
+            batch = self._collect(first)
+            self._process(batch)
+
+    def _process(self, batch):
+        rows = [item[0] for item in batch]
+        try:
+            confidences = self.score_fn(rows)
+        except Exception as e:
+            print(f"Batch inference error: {e}")
+            self.errors += 1
+            confidences = [0] * len(batch)
+
+        n = len(batch)
+        with self._lock:
+            self.batches += 1
+            self.rows += n
+            self.last_batch = n
+            if n > self.max_batch:
+                self.max_batch = n
+            bucket = 1 << (n - 1).bit_length()
+            self.batch_size_hist[bucket] = self.batch_size_hist.get(bucket, 0) + 1
+
+        for (_, meta), confidence in zip(batch, confidences):
+            try:
+                self.verdict_fn(meta, confidence)
+            except Exception as e:
+                print(f"Verdict handling error: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self.is_alive(),
+                'batch_size': self.batch_size,
+                'deadline_ms': self.deadline * 1000.0,
+                'queue_depth': self.queue.qsize(),
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'batches': self.batches,
+                'rows': self.rows,
+                'mean_batch': (self.rows / self.batches) if self.batches else 0.0,
+                'max_batch': self.max_batch,
+                'last_batch': self.last_batch,
+                'errors': self.errors,
+                'batch_size_hist': {str(k): v for k, v in sorted(self.batch_size_hist.items())},
+            }
@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+
+try:
+    import database
+except ImportError:
+    import os, sys
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import database
+
+# At most this many pushes per second to each client; bursts in between are coalesced
+MAX_UPDATES_PER_SEC = 4
+# The publisher re-reads stats at least this often even without new alerts
+# (sniffer status, inference counters), and only pushes if something changed.
+IDLE_REFRESH = 1.0
+# Comment line sent to idle clients so proxies keep the stream open
+HEARTBEAT_INTERVAL = 15.0
+
+
+class LiveFeed:
+    """
+    One publisher thread builds the stats snapshot when the database reports
+    a change (or every IDLE_REFRESH seconds) and shares the serialized result
+    with every connected client. Viewers never query the database themselves;
+    each one just waits on a shared condition variable.
+    """
+
+    def __init__(self, snapshot_fn, max_rate=MAX_UPDATES_PER_SEC):
+        self.snapshot_fn = snapshot_fn
+        self.min_interval = 1.0 / max_rate
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._payload = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.clients = 0
+        self.published = 0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._publish() # Snapshot ready for the first client
+                self._thread = threading.Thread(target=self._run, name="live-feed")
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _publish(self):
+        try:
+            payload = json.dumps(self.snapshot_fn())
+        except Exception as e:
+            print(f"[!] Live feed snapshot failed: {e}")
+            return
+        with self._cond:
+            if payload != self._payload:
+                self._payload = payload
+                self._seq += 1
+                self.published += 1
+                self._cond.notify_all()
+
+    def _run(self):
+        version = database.data_version()
+        while True:
+            version = database.wait_for_change(version, timeout=IDLE_REFRESH)
+            self._publish()
+            # Coalesce bursts: anything arriving during this pause goes out in the next snapshot
+            time.sleep(self.min_interval)
+
+    def latest(self):
+        with self._cond:
+            return self._seq, self._payload
+
+    def wait(self, seq, timeout):
+        """Wait for a snapshot newer than `seq`; returns (seq, payload), unchanged on timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != seq, timeout)
+            return self._seq, self._payload
+
+    def stream(self):
+        """Generator of Server-Sent Events for one client: snapshot first, then changes."""
+        self.start()
+        with self._cond:
+            self.clients += 1
+        try:
+            seq, payload = self.latest()
+            yield f"retry: 3000\ndata: {payload}\n\n"
+            last_sent = time.monotonic()
+            while True:
+                new_seq, payload = self.wait(seq, HEARTBEAT_INTERVAL)
+                if new_seq == seq:
+                    yield ": heartbeat\n\n"
+                    continue
+                # Per-client rate cap; the latest snapshot is taken after the pause
+                pause = self.min_interval - (time.monotonic() - last_sent)
+                if pause > 0:
+                    time.sleep(pause)
+                    new_seq, payload = self.latest()
+                seq = new_seq
+                yield f"data: {payload}\n\n"
+                last_sent = time.monotonic()
+        finally:
+            with self._cond:
+                self.clients -= 1
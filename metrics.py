@@ -0,0 +1,307 @@
+"""
+Pipeline instrumentation: counters and latency histograms.
+
+Metrics are plain module-level objects updated in place from the hot path
+(one list increment and one float add per observation, no locks). That is
+only exact while each metric has one writing thread:
+
+  - packets and the parse stage: the capture thread
+  - features: the analysis thread (the capture queue's, or the capture
+    thread without one)
+  - preprocess, inference, alerts and blocks: whichever thread delivers
+    verdicts (the inference worker, the sharded result collector, or the
+    analysis thread when scoring falls back inline)
+  - database writes: the alert writer
+  - with sharded analysis, the parse, features, preprocess and inference
+    stages: the result collector, merging the workers' changes (below)
+
+When two of those threads overlap, e.g. for the moment the inference
+worker is restarted, concurrent updates can be lost; the counts are for
+monitoring, not accounting. Components that already keep their own
+counters (inference queue, alert writer, verdict cache, blocklist)
+register a collector instead of double counting.
+
+With sharded analysis (sharding.py) each worker process records the
+parse, features, preprocess and inference stages in its own copy of these
+metrics and sends what changed (changes_since) with its periodic stats;
+the parent's result collector adds them in with merge(), so /api/metrics
+covers the workers with up to sharding.STATS_INTERVAL of delay.
+
+render() produces the Prometheus text exposition format served at
+/api/metrics; summary() is the compact view shown on the dashboard.
+Set IDPS_METRICS=0 to turn recording off.
+"""
+import bisect
+import os
+import threading
+import time
+from collections import deque
+
+ENABLED = os.environ.get('IDPS_METRICS', '1') == '1'
+PREFIX = 'idps_'
+# Upper bounds (seconds) of the latency buckets, 5 us to 1 s
+LATENCY_BUCKETS = (5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                   1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+RATE_WINDOW = 10.0 # seconds of history behind the per-second rates in summary()
+
+_registry = []
+_collectors = []
+
+
+class Counter:
+    """Monotonic count (Prometheus counter)."""
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.value = 0
+
+    def inc(self, n=1):
+        if ENABLED:
+            self.value += n
+
+    def reset(self):
+        self.value = 0
+
+    def samples(self):
+        yield self.name, self.labels, self.value
+
+
+class Histogram:
+    """Latency distribution over fixed buckets (Prometheus histogram)."""
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=None, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self.reset()
+
+    def observe(self, seconds):
+        if ENABLED:
+            # bucket i counts values <= buckets[i]; the last slot is +Inf
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.sum += seconds
+
+    def reset(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """Estimate of the q-quantile, interpolated within its bucket (as histogram_quantile does)."""
+        counts = list(self.counts)
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def samples(self):
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float('inf'),), list(self.counts)):
+            cumulative += n
+            yield self.name + '_bucket', {**self.labels, 'le': _format_value(bound)}, cumulative
+        yield self.name + '_sum', self.labels, self.sum
+        yield self.name + '_count', self.labels, cumulative
+
+
+def counter(name, help, **labels):
+    metric = Counter(PREFIX + name, help, labels)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name, help, buckets=LATENCY_BUCKETS, **labels):
+    metric = Histogram(PREFIX + name, help, labels, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def register_collector(fn):
+    """fn() -> iterable of (name, kind, help, value[, labels]) read at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+
+def reset():
+    for metric in _registry:
+        metric.reset()
+    _history.clear()
+
+
+# Pipeline metrics ------------------------------------------------------------
+
+STAGE_HELP = 'Time spent in each stage of the detection pipeline (inference stages per batch).'
+packets = counter('packets_total', 'Packets handed to the detector (after capture filtering).')
+alerts = counter('alerts_total', 'Packets scored above the attack threshold.')
+blocks = counter('blocks_total', 'Source addresses added to the blocklist by the detector.')
+stage_parse = histogram('stage_seconds', STAGE_HELP, stage='parse')
+stage_features = histogram('stage_seconds', STAGE_HELP, stage='features')
+stage_preprocess = histogram('stage_seconds', STAGE_HELP, stage='preprocess')
+stage_inference = histogram('stage_seconds', STAGE_HELP, stage='inference')
+stage_db_write = histogram('stage_seconds', STAGE_HELP, stage='db_write')
+STAGES = (stage_parse, stage_features, stage_preprocess, stage_inference, stage_db_write)
+
+
+# Worker processes ------------------------------------------------------------
+
+def _key(metric):
+    return metric.name, tuple(sorted(metric.labels.items()))
+
+
+def snapshot():
+    """Current value of every metric: {key: value} for counters, {key: (bucket counts, sum)} for histograms."""
+    return {_key(m): (list(m.counts), m.sum) if m.kind == 'histogram' else m.value for m in _registry}
+
+
+def changes_since(previous):
+    """
+    (snapshot, deltas): the current snapshot() and what changed since
+    `previous` (an earlier snapshot, or {}), in the form merge() takes.
+    """
+    current = snapshot()
+    deltas = {}
+    for key, value in current.items():
+        old = previous.get(key)
+        if isinstance(value, tuple):
+            counts = [c - o for c, o in zip(value[0], old[0])] if old else value[0]
+            if any(counts):
+                deltas[key] = (counts, value[1] - (old[1] if old else 0.0))
+        elif value != (old or 0):
+            deltas[key] = value - (old or 0)
+    return current, deltas
+
+
+def merge(deltas):
+    """Add another process's changes_since() deltas to this process's metrics."""
+    if not ENABLED:
+        return
+    by_key = {_key(m): m for m in _registry}
+    for key, delta in deltas.items():
+        metric = by_key.get(key)
+        if metric is None:
+            continue
+        if metric.kind == 'histogram':
+            counts, total = delta
+            for i, n in enumerate(counts):
+                metric.counts[i] += n
+            metric.sum += total
+        else:
+            metric.value += delta
+
+
+# Exposition ------------------------------------------------------------------
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+                    for k, v in labels.items())
+    return '{' + body + '}'
+
+
+def _collected():
+    """Metric families from the registered collectors: {name: (kind, help, [(labels, value)])}."""
+    families = {}
+    for fn in _collectors:
+        try:
+            items = list(fn())
+        except Exception as e:
+            print(f"[!] Metrics collector {getattr(fn, '__name__', fn)} failed: {e}")
+            continue
+        for item in items:
+            name, kind, help, value = item[:4]
+            if value is None:
+                continue
+            labels = item[4] if len(item) > 4 else {}
+            family = families.setdefault(PREFIX + name, (kind, help, []))
+            family[2].append((labels, value))
+    return families
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    described = set()
+    for metric in _registry:
+        if metric.name not in described:
+            described.add(metric.name)
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    for name, (kind, help, values) in _collected().items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in values:
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+# Dashboard summary -----------------------------------------------------------
+
+_history = deque() # (monotonic time, packets, alerts, blocks), one sample per summary() call
+_history_lock = threading.Lock()
+
+
+def _rates():
+    now = time.monotonic()
+    current = (now, packets.value, alerts.value, blocks.value)
+    with _history_lock:
+        _history.append(current)
+        while len(_history) > 1 and now - _history[1][0] >= RATE_WINDOW:
+            _history.popleft()
+        first = _history[0]
+    elapsed = now - first[0]
+    if elapsed <= 0:
+        return 0.0, 0.0, 0.0
+    return tuple((c - f) / elapsed for c, f in zip(current[1:], first[1:]))
+
+
+def summary():
+    """Compact view for the dashboard: totals, per-second rates and per-stage p50/p99 (microseconds, pipeline order)."""
+    packets_per_s, alerts_per_s, blocks_per_s = _rates()
+    latency = []
+    for h in STAGES:
+        p50, p99 = h.quantile(0.5), h.quantile(0.99)
+        latency.append({
+            'stage': h.labels['stage'],
+            'count': h.count,
+            'p50_us': p50 * 1e6 if p50 is not None else None,
+            'p99_us': p99 * 1e6 if p99 is not None else None,
+        })
+    return {
+        'enabled': ENABLED,
+        'packets': packets.value,
+        'alerts': alerts.value,
+        'blocks': blocks.value,
+        'packets_per_s': round(packets_per_s, 1),
+        'alerts_per_s': round(alerts_per_s, 2),
+        'blocks_per_s': round(blocks_per_s, 2),
+        'latency': latency,
+    }
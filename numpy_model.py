@@ -0,0 +1,261 @@
+"""
+TensorFlow-free inference for the CNN built by train_model.build_cnn_model.
+
+export_model() walks a trained Keras Sequential model and writes its
+weights to a single .npz file. BatchNormalization layers are folded into
+neighbouring linear layers. In build_cnn_model the BN sits *after* the
+ReLU, so it cannot be folded into the conv before it. Instead it is
+pushed forward through MaxPooling1D (valid when every BN scale is
+positive, since max(a*x + b) = a*max(x) + b for a > 0) and Flatten into
+the next Conv1D/Dense. Any BN that cannot be folded is kept as an
+explicit per-channel affine op.
+
+NumpyCNN loads that file and runs a batched float32 forward pass with
+plain NumPy (one GEMM per conv via im2col).
+
+    python numpy_model.py export                  # model/cnn_model.h5 -> model/cnn_model.npz
+    python numpy_model.py check                   # compare against Keras on random inputs
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model')
+KERAS_MODEL_PATH = os.path.join(MODEL_DIR, 'cnn_model.h5')
+NUMPY_MODEL_PATH = os.path.join(MODEL_DIR, 'cnn_model.npz')
+
+FORMAT_VERSION = 1
+# Rows per forward pass; bounds the im2col buffers for very large inputs
+MAX_CHUNK = 4096
+
+
+# Export --------------------------------------------------------------------
+
+def _keras_ops(model):
+    """Translate Keras layers into a list of op dicts (float64 weights)."""
+    ops = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        cfg = layer.get_config()
+        weights = [np.asarray(w, dtype=np.float64) for w in layer.get_weights()]
+
+        if kind == 'Conv1D':
+            if (cfg.get('padding') != 'valid' or tuple(cfg.get('strides', (1,))) != (1,)
+                    or tuple(cfg.get('dilation_rate', (1,))) != (1,)
+                    or cfg.get('data_format', 'channels_last') != 'channels_last'):
+                raise ValueError(f"Unsupported Conv1D configuration in layer {layer.name}")
+            W = weights[0]
+            b = weights[1] if cfg.get('use_bias', True) else np.zeros(W.shape[-1])
+            ops.append({'op': 'conv1d', 'act': cfg['activation'], 'W': W, 'b': b})
+        elif kind == 'Dense':
+            W = weights[0]
+            b = weights[1] if cfg.get('use_bias', True) else np.zeros(W.shape[-1])
+            ops.append({'op': 'dense', 'act': cfg['activation'], 'W': W, 'b': b})
+        elif kind == 'BatchNormalization':
+            it = iter(weights)
+            gamma = next(it) if cfg.get('scale', True) else None
+            beta = next(it) if cfg.get('center', True) else None
+            mean, var = next(it), next(it)
+            if gamma is None:
+                gamma = np.ones_like(mean)
+            if beta is None:
+                beta = np.zeros_like(mean)
+            a = gamma / np.sqrt(var + cfg['epsilon'])
+            ops.append({'op': 'affine', 'a': a, 'b': beta - mean * a})
+        elif kind == 'MaxPooling1D':
+            if cfg.get('padding') != 'valid':
+                raise ValueError(f"Unsupported MaxPooling1D padding in layer {layer.name}")
+            pool = int(np.ravel(cfg['pool_size'])[0])
+            strides = cfg.get('strides') or pool
+            ops.append({'op': 'maxpool', 'pool': pool, 'stride': int(np.ravel(strides)[0])})
+        elif kind == 'Flatten':
+            ops.append({'op': 'flatten'})
+        elif kind in ('Dropout', 'InputLayer'):
+            continue # Identity at inference time
+        else:
+            raise ValueError(f"Unsupported layer type for NumPy export: {kind}")
+    return ops
+
+
+def _fold_into(target, a, b, tiles=1):
+    """Fold y = a*x + b (per input channel) into the following conv/dense op."""
+    if target['op'] == 'conv1d':
+        W = target['W'] # (k, cin, cout)
+        target['b'] = target['b'] + np.einsum('kco,c->o', W, b)
+        target['W'] = W * a[None, :, None]
+    else:
+        W = target['W'] # (tiles * C, out) after Flatten of (tiles, C)
+        a_t, b_t = np.tile(a, tiles), np.tile(b, tiles)
+        target['b'] = target['b'] + b_t @ W
+        target['W'] = W * a_t[:, None]
+
+
+def fold_batchnorm(ops):
+    """Remove affine (BatchNorm) ops by folding them into adjacent linear layers where exact."""
+    out = []
+    for i, op in enumerate(ops):
+        if op['op'] != 'affine':
+            out.append(op)
+            continue
+        a, b = op['a'], op['b']
+
+        # Directly after a linear conv/dense: scale its outputs
+        prev = out[-1] if out else None
+        if prev is not None and prev['op'] in ('conv1d', 'dense') and prev['act'] == 'linear':
+            prev['W'] = prev['W'] * a
+            prev['b'] = prev['b'] * a + b
+            continue
+
+        # Forward through max-pooling / flatten into the next linear layer
+        j = i + 1
+        while j < len(ops) and ops[j]['op'] in ('maxpool', 'flatten'):
+            j += 1
+        between = [o['op'] for o in ops[i + 1:j]]
+        if j < len(ops) and ops[j]['op'] in ('conv1d', 'dense') \
+                and ('maxpool' not in between or np.all(a > 0)):
+            target = ops[j]
+            if target['op'] == 'conv1d' and 'flatten' not in between:
+                _fold_into(target, a, b)
+                continue
+            if target['op'] == 'dense' and target['W'].shape[0] % a.size == 0:
+                _fold_into(target, a, b, tiles=target['W'].shape[0] // a.size)
+                continue
+
+        out.append(op) # Keep as an explicit per-channel scale/shift
+    return out
+
+
+def export_model(model, path=NUMPY_MODEL_PATH):
+    """Write a trained Keras model to `path` as a NumPy .npz (BatchNorm folded)."""
+    ops = fold_batchnorm(_keras_ops(model))
+    spec, arrays = [], {}
+    for i, op in enumerate(ops):
+        entry = {k: v for k, v in op.items() if not isinstance(v, np.ndarray)}
+        for k, v in op.items():
+            if isinstance(v, np.ndarray):
+                arrays[f'op{i}_{k}'] = v.astype(np.float32)
+        spec.append(entry)
+    meta = {'version': FORMAT_VERSION, 'input_shape': list(model.input_shape[1:]), 'ops': spec}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez(path, spec=np.array(json.dumps(meta)), **arrays)
+    return path
+
+
+# Inference -----------------------------------------------------------------
+
+def _activate(y, act):
+    if act == 'relu':
+        np.maximum(y, 0, out=y)
+    elif act == 'sigmoid':
+        with np.errstate(over='ignore'):
+            y = 1.0 / (1.0 + np.exp(-y))
+    elif act not in ('linear', None):
+        raise ValueError(f"Unsupported activation: {act}")
+    return y
+
+
+class NumpyCNN:
+    """Batched float32 forward pass over an exported model; drop-in for model.predict_on_batch."""
+
+    def __init__(self, meta, arrays):
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported NumPy model format: {meta.get('version')}")
+        self.input_shape = tuple(meta['input_shape'])
+        self.ops = []
+        for i, op in enumerate(meta['ops']):
+            op = dict(op)
+            for key in ('W', 'b', 'a'):
+                name = f'op{i}_{key}'
+                if name in arrays:
+                    op[key] = np.ascontiguousarray(arrays[name], dtype=np.float32)
+            if op['op'] == 'conv1d':
+                k, cin, cout = op['W'].shape
+                # im2col columns are the k shifted inputs side by side: (k, cin) order
+                op['Wm'] = op['W'].reshape(k * cin, cout)
+                op['k'] = k
+            self.ops.append(op)
+
+    @classmethod
+    def load(cls, path=NUMPY_MODEL_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['spec']))
+            arrays = {k: data[k] for k in data.files if k != 'spec'}
+        return cls(meta, arrays)
+
+    def _forward(self, x):
+        for op in self.ops:
+            kind = op['op']
+            if kind == 'conv1d':
+                n, length, cin = x.shape
+                out_len = length - op['k'] + 1
+                if op['k'] == 1:
+                    cols = x.reshape(n * length, cin)
+                else:
+                    cols = np.concatenate([x[:, j:j + out_len] for j in range(op['k'])], axis=2)
+                    cols = cols.reshape(n * out_len, op['k'] * cin)
+                y = cols @ op['Wm']
+                y += op['b']
+                x = _activate(y, op['act']).reshape(n, out_len, -1)
+            elif kind == 'dense':
+                y = x @ op['W']
+                y += op['b']
+                x = _activate(y, op['act'])
+            elif kind == 'maxpool':
+                n, length, c = x.shape
+                pool, stride = op['pool'], op['stride']
+                out_len = (length - pool) // stride + 1
+                if pool == stride:
+                    # Elementwise maximum of strided slices beats reshape().max() here
+                    y = x[:, 0:out_len * pool:pool]
+                    for j in range(1, pool):
+                        y = np.maximum(y, x[:, j:out_len * pool:pool])
+                    x = y
+                else:
+                    win = np.lib.stride_tricks.sliding_window_view(x, pool, axis=1)[:, ::stride]
+                    x = win.max(axis=-1)
+            elif kind == 'flatten':
+                x = x.reshape(x.shape[0], -1)
+            elif kind == 'affine':
+                x = x * op['a'] + op['b']
+        return x
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 2:
+            X = X[..., None]
+        if X.shape[0] <= MAX_CHUNK:
+            return self._forward(X)
+        return np.concatenate([self._forward(X[i:i + MAX_CHUNK])
+                               for i in range(0, X.shape[0], MAX_CHUNK)])
+
+    predict_on_batch = predict
+    __call__ = predict
+
+
+def _load_keras(path):
+    from tensorflow.keras.models import load_model
+    return load_model(path)
+
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else 'export'
+    src = sys.argv[2] if len(sys.argv) > 2 else KERAS_MODEL_PATH
+    dst = sys.argv[3] if len(sys.argv) > 3 else NUMPY_MODEL_PATH
+    if cmd == 'export':
+        export_model(_load_keras(src), dst)
+        print(f"Exported {src} -> {dst} ({os.path.getsize(dst) / 1024:.0f} KB)")
+    elif cmd == 'check':
+        keras_model = _load_keras(src)
+        np_model = NumpyCNN.load(dst)
+        X = np.random.default_rng(0).normal(size=(2048,) + np_model.input_shape).astype(np.float32)
+        diff = np.abs(keras_model.predict_on_batch(X) - np_model.predict(X)).max()
+        print(f"Max |keras - numpy| over {len(X)} rows: {diff:.3e}")
+    else:
+        print("usage: python numpy_model.py [export|check] [keras.h5] [model.npz]")
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
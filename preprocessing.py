@@ -4,6 +4,7 @@ from sklearn.preprocessing import LabelEncoder, StandardScaler, MinMaxScaler
 from sklearn.model_selection import train_test_split
 import pickle
 import os
+from collections import Counter
 
 # Define column names for NSL-KDD dataset
 COL_NAMES = ["duration","protocol_type","service","flag","src_bytes",
@@ -23,8 +24,14 @@ MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model')
 ENCODER_PATH = os.path.join(MODEL_PATH, 'encoders.pkl')
 SCALER_PATH = os.path.join(MODEL_PATH, 'scaler.pkl')
 
-def load_data(file_name='KDDTrain+.txt'):
-    """Loads the dataset from the data directory."""
+# Streaming (chunked) training path for files that do not fit in memory
+CAT_COLS = ['protocol_type', 'service', 'flag']
+CHUNK_ROWS = 100000
+VALIDATION_SPLIT = 0.2
+SPLIT_SEED = 42
+
+def resolve_data_path(file_name='KDDTrain+.txt'):
+    """Path of the dataset in the data directory, falling back to dummy.csv."""
     file_path = os.path.join(DATA_PATH, file_name)
     if not os.path.exists(file_path):
         # Fallback to dummy data if main file doesn't exist
@@ -32,7 +39,11 @@ def load_data(file_name='KDDTrain+.txt'):
         file_path = os.path.join(DATA_PATH, 'dummy.csv')
         if not os.path.exists(file_path):
             create_dummy_data()
-    
+    return file_path
+
+def load_data(file_name='KDDTrain+.txt'):
+    """Loads the dataset from the data directory."""
+    file_path = resolve_data_path(file_name)
     print(f"Loading data from {file_path}...")
     df = pd.read_csv(file_path, names=COL_NAMES, index_col=False)
     return df
@@ -91,9 +102,10 @@ def preprocess_data(df, is_training=True):
             encoders = pickle.load(f)
         for col in cat_cols:
             le = encoders[col]
-            # Handle unseen labels by mapping to a default or skipping (simplified here)
-            # using map and fillna for safety
-            df[col] = df[col].map(lambda s: le.transform([s])[0] if s in le.classes_ else 0)
+            # Vectorized lookup: classes_ is sorted, so category positions are the
+            # LabelEncoder codes; unseen labels map to 0
+            codes = pd.Index(le.classes_).get_indexer(df[col])
+            df[col] = np.where(codes < 0, 0, codes)
             
             
     # 3. Scale Numerical Features
@@ -112,3 +124,202 @@ def preprocess_data(df, is_training=True):
     X = np.reshape(X, (X.shape[0], X.shape[1], 1))
     
     return X, labels
+
+
+def read_chunks(file_path, chunksize=CHUNK_ROWS):
+    """DataFrames of `chunksize` rows from an NSL-KDD CSV (columns past COL_NAMES are ignored, as in load_data)."""
+    return pd.read_csv(file_path, names=COL_NAMES, usecols=range(len(COL_NAMES)),
+                       dtype={col: str for col in CAT_COLS + ['label']}, chunksize=chunksize)
+
+def split_masks(seed=SPLIT_SEED, validation_split=VALIDATION_SPLIT):
+    """Function giving, chunk after chunk, the validation mask; same sequence on every pass."""
+    rng = np.random.default_rng(seed)
+    return lambda n: rng.random(n) < validation_split
+
+def fit_streaming(file_path, chunksize=CHUNK_ROWS, validation_split=VALIDATION_SPLIT):
+    """
+    First pass of the streaming path: fit the label encoders and the scaler
+    one chunk at a time and save them like preprocess_data(is_training=True).
+
+    Numeric columns go through StandardScaler.partial_fit. Label-encoded
+    columns only get their final codes once every category has been seen,
+    so their mean/variance are computed from category counts at the end;
+    the result matches fitting on the whole file at once. Returns
+    (encoders, scaler, row counts).
+    """
+    feature_cols = COL_NAMES[:-1]
+    num_cols = [c for c in feature_cols if c not in CAT_COLS]
+    counts = {col: Counter() for col in CAT_COLS}
+    num_scaler = StandardScaler()
+    val_mask = split_masks(validation_split=validation_split)
+    rows = val_rows = attacks = 0
+    for chunk in read_chunks(file_path, chunksize):
+        for col in CAT_COLS:
+            counts[col].update(chunk[col].value_counts().to_dict())
+        num_scaler.partial_fit(chunk[num_cols].to_numpy(dtype=np.float64))
+        attacks += int((chunk['label'] != 'normal').sum())
+        val_rows += int(val_mask(len(chunk)).sum())
+        rows += len(chunk)
+    if not rows:
+        raise ValueError(f"No rows in {file_path}")
+
+    encoders = {}
+    mean = np.empty(len(feature_cols))
+    var = np.empty(len(feature_cols))
+    scale = np.empty(len(feature_cols))
+    for col in CAT_COLS:
+        le = LabelEncoder()
+        le.classes_ = np.array(sorted(counts[col]), dtype=object)
+        encoders[col] = le
+        codes = np.arange(len(le.classes_), dtype=np.float64)
+        weights = np.array([counts[col][c] for c in le.classes_], dtype=np.float64)
+        i = feature_cols.index(col)
+        mean[i] = codes @ weights / rows
+        var[i] = ((codes - mean[i]) ** 2) @ weights / rows
+        scale[i] = np.sqrt(var[i]) if var[i] > 0 else 1.0
+    num_idx = [feature_cols.index(c) for c in num_cols]
+    mean[num_idx] = num_scaler.mean_
+    var[num_idx] = num_scaler.var_
+    scale[num_idx] = num_scaler.scale_
+
+    scaler = StandardScaler()
+    scaler.n_features_in_ = len(feature_cols)
+    scaler.feature_names_in_ = np.array(feature_cols, dtype=object)
+    scaler.n_samples_seen_ = rows
+    scaler.mean_, scaler.var_, scaler.scale_ = mean, var, scale
+
+    if not os.path.exists(MODEL_PATH):
+        os.makedirs(MODEL_PATH)
+    with open(ENCODER_PATH, 'wb') as f:
+        pickle.dump(encoders, f)
+    with open(SCALER_PATH, 'wb') as f:
+        pickle.dump(scaler, f)
+    stats = {'rows': rows, 'train_rows': rows - val_rows, 'val_rows': val_rows, 'attacks': attacks}
+    return encoders, scaler, stats
+
+def encode_chunk(chunk, encoders, scaler, dtype=np.float32):
+    """(X, y) for one DataFrame chunk, encoded and scaled as preprocess_data does."""
+    y = (chunk['label'] != 'normal').to_numpy(dtype=np.float32)
+    features = chunk.drop(columns='label')
+    for col in CAT_COLS:
+        codes = pd.Index(encoders[col].classes_).get_indexer(features[col])
+        features[col] = np.where(codes < 0, 0, codes) # unseen -> 0, as in preprocess_data
+    X = features.to_numpy(dtype=np.float64)
+    X -= scaler.mean_
+    X /= scaler.scale_
+    X = X.astype(dtype, copy=False)
+    return X.reshape(X.shape[0], X.shape[1], 1), y
+
+def encoded_chunks(file_path, encoders, scaler, chunksize=CHUNK_ROWS,
+                   validation_split=VALIDATION_SPLIT):
+    """(X, y, validation mask) for every chunk of the file, in file order, split as in stream_chunks."""
+    val_mask = split_masks(validation_split=validation_split)
+    for chunk in read_chunks(file_path, chunksize):
+        mask = val_mask(len(chunk))
+        X, y = encode_chunk(chunk, encoders, scaler)
+        yield X, y, mask
+
+def stream_chunks(file_path, encoders, scaler, subset='train', chunksize=CHUNK_ROWS,
+                  validation_split=VALIDATION_SPLIT, shuffle=True):
+    """
+    Second pass of the streaming path: yield (X, y) arrays of one split
+    ('train' or 'val'), at most `chunksize` rows each. Rows are assigned to
+    the splits exactly as fit_streaming counted them; shuffle permutes the
+    rows within each chunk (differently on every call).
+    """
+    val_mask = split_masks(validation_split=validation_split)
+    rng = np.random.default_rng()
+    for chunk in read_chunks(file_path, chunksize):
+        mask = val_mask(len(chunk))
+        part = chunk[mask] if subset == 'val' else chunk[~mask]
+        if part.empty:
+            continue
+        X, y = encode_chunk(part, encoders, scaler)
+        if shuffle:
+            order = rng.permutation(len(y))
+            X, y = X[order], y[order]
+        yield X, y
+
+
+class CompiledEncoder:
+    """
+    Inference-time replacement for preprocess_data(df, is_training=False).
+    Loads the fitted encoders/scaler once and turns raw feature rows (in
+    COL_NAMES order, without the label) straight into the scaled
+    (n, 41, 1) model input, using dict lookups for the categorical columns
+    and a single vectorized (X - mean) / scale pass. The float64 result is
+    bit-identical to preprocess_data on the same rows.
+
+    Categories not seen in training get `unseen_code` (0, as in
+    preprocess_data), or with UNSEEN_RESERVED a code of their own per
+    column, one past the last class, so they do not alias a real one.
+    """
+    UNSEEN_RESERVED = 'reserved'
+
+    def __init__(self, encoders, scaler, unseen_code=0):
+        feature_cols = COL_NAMES[:-1]
+        self.unseen_code = unseen_code
+        # (column index, {category: code}, unseen code) for each categorical column
+        self.lookups = []
+        self.classes = []
+        for col in CAT_COLS:
+            classes = encoders[col].classes_
+            unseen = len(classes) if unseen_code == self.UNSEEN_RESERVED else unseen_code
+            self.lookups.append((feature_cols.index(col),
+                                 {c: i for i, c in enumerate(classes)}, unseen))
+            self.classes.append(pd.Index(classes))
+        n = len(feature_cols)
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else np.zeros(n)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else np.ones(n)
+        self.n_features = n
+
+    @classmethod
+    def load(cls, encoder_path=ENCODER_PATH, scaler_path=SCALER_PATH, unseen_code=0):
+        with open(encoder_path, 'rb') as f:
+            encoders = pickle.load(f)
+        with open(scaler_path, 'rb') as f:
+            scaler = pickle.load(f)
+        return cls(encoders, scaler, unseen_code=unseen_code)
+
+    def transform_rows(self, rows, dtype=np.float32):
+        """Encode and scale a list of raw feature rows into a (n, 41, 1) array."""
+        (i1, m1, u1), (i2, m2, u2), (i3, m3, u3) = self.lookups
+        encoded = []
+        append = encoded.append
+        for row in rows:
+            r = list(row)
+            r[i1] = m1.get(r[i1], u1)
+            r[i2] = m2.get(r[i2], u2)
+            r[i3] = m3.get(r[i3], u3)
+            append(r)
+        X = np.array(encoded, dtype=np.float64).reshape(len(encoded), self.n_features)
+        return self._scale(X, dtype)
+
+    def transform_frame(self, df, dtype=np.float32):
+        """
+        transform_rows() for a DataFrame of raw features (COL_NAMES order,
+        label excluded), fully vectorized: categorical columns are looked
+        up in a pandas Index (a hash table), so bulk inputs never loop in
+        Python. Also returns the number of unseen categorical values per column.
+        """
+        X = np.empty((len(df), self.n_features), dtype=np.float64)
+        unseen_counts = {}
+        cat_index = {i for i, _, _ in self.lookups}
+        for j in range(self.n_features):
+            if j not in cat_index:
+                X[:, j] = pd.to_numeric(df.iloc[:, j], errors='coerce')
+        for col, (i, _, unseen), classes in zip(CAT_COLS, self.lookups, self.classes):
+            codes = classes.get_indexer(df.iloc[:, i])
+            missing = codes < 0
+            unseen_counts[col] = int(missing.sum())
+            X[:, i] = np.where(missing, unseen, codes)
+        # Unparseable numeric fields score as 0 before scaling
+        np.nan_to_num(X, copy=False, nan=0.0)
+        return self._scale(X, dtype), unseen_counts
+
+    def _scale(self, X, dtype):
+        X -= self.mean
+        X /= self.scale
+        if dtype is not None and X.dtype != dtype:
+            X = X.astype(dtype)
+        return X.reshape(X.shape[0], X.shape[1], 1)
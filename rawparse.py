@@ -0,0 +1,156 @@
+"""
+Raw frame parser for the capture path.
+
+Reads only the header fields the detector needs (addresses, protocol,
+ports, TCP flags, payload length, fragment bits) straight from the frame
+bytes with struct offsets, without building scapy layer objects. The
+result is a PacketFields tuple, the same record sniffer.packet_fields()
+builds from a dissected scapy packet, so both paths feed the same
+feature pipeline.
+
+Lengths follow what scapy reports: a layer's payload is every captured
+byte after its header, link-layer padding included.
+
+Frames this parser does not decode itself (tunnels that scapy would look
+inside, PPPoE, truncated or malformed headers) raise Unsupported; the
+caller then dissects them with scapy as before.
+"""
+import socket
+import struct
+from collections import namedtuple
+
+try:
+    from flow_table import is_wrong_fragment
+except ImportError:
+    import os
+    import sys
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from flow_table import is_wrong_fragment
+
+# pcap link types
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101        # bare IP packets
+LINKTYPE_LINUX_SLL = 113  # Linux "any" device
+
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+VLAN_ETHERTYPES = (0x8100, 0x88A8) # 802.1Q, 802.1ad
+ETH_P_PPP_SES = 0x8864
+
+# IP protocols scapy dissects into further IP layers (IP-in-IP, IPv6, GRE, AH)
+TUNNEL_PROTOCOLS = frozenset((4, 41, 47, 51))
+# UDP ports scapy decodes as tunnels that can carry TCP/UDP (VXLAN, GRE-in-UDP, L2TP)
+TUNNEL_UDP_PORTS = frozenset((4789, 4790, 6633, 8472, 48879, 4754, 1701))
+
+PacketFields = namedtuple('PacketFields', [
+    'time', 'src', 'dst', 'proto', 'sport', 'dport', 'tcp_flags',
+    'payload_len', 'wrong_frag', 'icmp_type', 'ip_proto'])
+
+PROTO_LABELS = {'tcp': 'TCP', 'udp': 'UDP', 'icmp': 'ICMP', 'other': 'OTHER'}
+
+_ETHERTYPE = struct.Struct('!H')
+# version/ihl, flags/fragment offset, protocol, source, destination
+_IPV4 = struct.Struct('!B5xHxB2x4s4s')
+_PORTS = struct.Struct('!HH')
+_TCP_OFFSET_FLAGS = struct.Struct('!12xH')
+_inet_ntoa = socket.inet_ntoa
+
+
+class Unsupported(ValueError):
+    """The frame needs full scapy dissection."""
+
+
+def ip_offset(frame, linktype=LINKTYPE_ETHERNET):
+    """Offset of the IPv4 header in `frame`, or None if the frame carries no IPv4."""
+    try:
+        if linktype == LINKTYPE_ETHERNET:
+            ethertype = _ETHERTYPE.unpack_from(frame, 12)[0]
+            offset = 14
+            while ethertype in VLAN_ETHERTYPES:
+                ethertype = _ETHERTYPE.unpack_from(frame, offset + 2)[0]
+                offset += 4
+        elif linktype == LINKTYPE_RAW:
+            version = frame[0] >> 4
+            ethertype = ETH_P_IP if version == 4 else ETH_P_IPV6 if version == 6 else None
+            offset = 0
+        elif linktype == LINKTYPE_LINUX_SLL:
+            ethertype = _ETHERTYPE.unpack_from(frame, 14)[0]
+            offset = 16
+        else:
+            raise Unsupported(f"link type {linktype}")
+    except (struct.error, IndexError):
+        raise Unsupported("truncated link-layer header")
+    if ethertype == ETH_P_IP:
+        return offset
+    if ethertype == ETH_P_IPV6:
+        # IPv4 inside IPv6 still counts as an IP packet to scapy
+        if len(frame) > offset + 6 and frame[offset + 6] == 4:
+            raise Unsupported("IPv4 in IPv6")
+        return None
+    if ethertype == ETH_P_PPP_SES:
+        raise Unsupported("PPPoE session")
+    return None
+
+
+def parse_ip(frame, offset, ts=0.0):
+    """PacketFields for the IPv4 packet starting at `offset`; raises Unsupported."""
+    try:
+        vihl, flags_frag, ip_proto, src, dst = _IPV4.unpack_from(frame, offset)
+    except struct.error:
+        raise Unsupported("truncated IPv4 header")
+    ihl = (vihl & 0x0F) * 4
+    if vihl >> 4 != 4 or ihl < 20:
+        raise Unsupported("bad IPv4 header")
+    if ip_proto in TUNNEL_PROTOCOLS:
+        raise Unsupported(f"IP protocol {ip_proto}")
+    l4 = offset + ihl
+    ip_payload = len(frame) - l4
+    if ip_payload < 0:
+        raise Unsupported("truncated IPv4 options")
+    frag = flags_frag & 0x1FFF
+    wrong_frag = is_wrong_fragment(flags_frag & 0x2000, frag, ip_payload)
+
+    sport = dport = tcp_flags = 0
+    icmp_type = None
+    proto = 'other'
+    payload_len = ip_payload
+    if frag == 0:
+        if ip_proto == 6:
+            if ip_payload < 20:
+                raise Unsupported("truncated TCP header")
+            sport, dport = _PORTS.unpack_from(frame, l4)
+            offset_flags = _TCP_OFFSET_FLAGS.unpack_from(frame, l4)[0]
+            header = (offset_flags >> 12) * 4
+            if header < 20:
+                raise Unsupported("bad TCP data offset")
+            proto = 'tcp'
+            tcp_flags = offset_flags & 0x1FF
+            payload_len = max(0, ip_payload - header)
+        elif ip_proto == 17:
+            if ip_payload < 8:
+                raise Unsupported("truncated UDP header")
+            sport, dport = _PORTS.unpack_from(frame, l4)
+            if sport in TUNNEL_UDP_PORTS or dport in TUNNEL_UDP_PORTS:
+                raise Unsupported("UDP tunnel")
+            proto = 'udp'
+            payload_len = ip_payload - 8
+        elif ip_proto == 1:
+            if ip_payload < 8:
+                raise Unsupported("truncated ICMP header")
+            icmp_type = frame[l4]
+            # scapy's ICMP header: 8 bytes, plus the timestamp/address-mask fields
+            header = 20 if icmp_type in (13, 14) else 12 if icmp_type in (17, 18) else 8
+            if ip_payload < header or (icmp_type in (3, 11, 12) and frame[l4 + 5]):
+                raise Unsupported("ICMP extensions or truncated header") # RFC 4884
+            proto = 'icmp'
+            payload_len = ip_payload - header
+    return PacketFields(ts, _inet_ntoa(src), _inet_ntoa(dst), proto, sport, dport, tcp_flags,
+                        payload_len, wrong_frag, icmp_type, ip_proto)
+
+
+def parse_frame(frame, ts=0.0, linktype=LINKTYPE_ETHERNET):
+    """PacketFields for a captured frame, None if it is not IPv4; raises Unsupported."""
+    offset = ip_offset(frame, linktype)
+    if offset is None:
+        return None
+    return parse_ip(frame, offset, ts)
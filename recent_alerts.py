@@ -0,0 +1,83 @@
+"""
+In-memory view of the latest alerts and the alert totals.
+
+The alert writer records each batch here right after committing it, so
+the dashboard (/api/stats and the live feed) reads memory instead of
+re-reading rows this process has just written; the database serves the
+history queries. database.init_db() rebuilds it from the database and
+clear_all_logs() empties it, both under the writer's lock, so it always
+matches what is committed.
+"""
+import os
+import threading
+
+# Latest alert rows kept (the dashboard shows 10)
+RECENT_SIZE = int(os.environ.get('IDPS_RECENT_ALERTS', 100))
+
+
+class RecentAlerts:
+    """
+    Fixed-size ring of the latest alert rows (attacks table tuples, id
+    first) with the running totals of get_stats. Aggregated rows updated in
+    place are replaced in their slot. The lock is held only to copy a few
+    references, once per writer batch and once per read.
+    """
+
+    def __init__(self, size=RECENT_SIZE):
+        self.size = max(1, int(size))
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._ring = [None] * self.size
+            self._head = 0 # next slot to fill
+            self._slots = {} # alert id -> slot
+            self.total = 0
+            self.types = {}
+            self.packets = 0
+
+    def load(self, total, types, rows, packets):
+        """Replace the contents with totals and the latest rows (newest first) read from the database."""
+        self.clear()
+        with self._lock:
+            self.total, self.types, self.packets = total, dict(types), packets
+            for row in reversed(rows[:self.size]):
+                self._put(row)
+
+    def _put(self, row):
+        slot = self._head
+        old = self._ring[slot]
+        if old is not None:
+            self._slots.pop(old[0], None)
+        self._ring[slot] = row
+        self._slots[row[0]] = slot
+        self._head = (slot + 1) % self.size
+
+    def record(self, inserted=(), updated=()):
+        """One committed batch: new rows, and (row, packets added) for rows updated in place."""
+        with self._lock:
+            types = self.types
+            for row in inserted:
+                self._put(row)
+                attack_type = row[5] or 'Unknown'
+                types[attack_type] = types.get(attack_type, 0) + 1
+                self.total += 1
+                self.packets += row[9]
+            for row, added in updated:
+                slot = self._slots.get(row[0])
+                if slot is not None:
+                    self._ring[slot] = row
+                self.packets += added
+
+    def snapshot(self, limit=10):
+        """(total, per-type counts, latest `limit` rows newest first, total packets)."""
+        with self._lock:
+            ring, head = self._ring, self._head
+            rows = []
+            for i in range(1, min(limit, self.size) + 1):
+                row = ring[(head - i) % self.size]
+                if row is None:
+                    break
+                rows.append(row)
+            return self.total, dict(self.types), rows, self.packets
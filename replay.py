@@ -0,0 +1,268 @@
+"""
+Offline pcap/pcapng replay through the detection pipeline.
+
+Streams packets from a capture file (PcapReader, nothing is kept in memory)
+through the live sniffer's per-packet stages:
+
+    header parse -> extract_features -> verdict cache -> encoder -> model -> handle_verdict (log_attack / block_ip)
+
+and reports packets/s, per-stage latency percentiles and alert counts.
+Use it for capacity planning and to compare builds on identical traffic.
+
+Unlike live capture, everything runs in this one thread: packets are
+batched here (same batch size and deadline as the inference worker) and
+never pass through the capture queue or the inference worker thread, so
+queueing and shedding do not show up in the numbers. traffic_gen.load_test
+(benchmarks/bench_loadtest.py) drives those under load.
+
+    python replay.py capture.pcap                      # as fast as possible
+    python replay.py capture.pcap --realtime           # honour original timestamps
+    python replay.py capture.pcap --db /tmp/replay.db --json report.json
+    python replay.py capture.pcap --parser scapy       # full scapy dissection per packet
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+try:
+    import database
+    import sniffer
+    from rawparse import PROTO_LABELS, Unsupported, parse_frame
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import database
+    import sniffer
+    from rawparse import PROTO_LABELS, Unsupported, parse_frame
+
+from scapy.config import conf
+from scapy.utils import PcapReader, RawPcapReader
+
+PERCENTILES = (50, 90, 99)
+
+
+def _summary(samples):
+    """Latency percentiles in microseconds for a list of durations in seconds."""
+    if not samples:
+        return {'count': 0}
+    arr = np.asarray(samples) * 1e6
+    out = {'count': int(arr.size), 'mean_us': float(arr.mean()), 'max_us': float(arr.max())}
+    for p, v in zip(PERCENTILES, np.percentile(arr, PERCENTILES)):
+        out[f'p{p}_us'] = float(v)
+    return out
+
+
+def pcap_records(path, parser='raw'):
+    """(timestamp, record) per packet: a scapy packet, or (frame bytes, link type) for parser='raw'."""
+    if parser == 'scapy':
+        with PcapReader(path) as reader:
+            for packet in reader:
+                yield float(packet.time), packet
+        return
+    with RawPcapReader(path) as reader:
+        for frame, meta in reader:
+            if hasattr(meta, 'tsresol'): # pcapng
+                yield ((meta.tshigh << 32) | meta.tslow) / meta.tsresol, (frame, meta.linktype)
+            else:
+                yield meta.sec + meta.usec / (1e9 if reader.nano else 1e6), (frame, reader.linktype)
+
+
+def record_fields(ts, record):
+    """PacketFields for a pcap_records() record, None if it is not an IPv4 packet."""
+    if isinstance(record, tuple):
+        frame, linktype = record
+        try:
+            return parse_frame(frame, ts, linktype)
+        except Unsupported:
+            record = conf.l2types.num2layer.get(linktype, conf.raw_layer)(frame)
+            record.time = ts
+    if sniffer.IP not in record:
+        return None
+    return sniffer.packet_fields(record)
+
+
+def replay_pcap(path, realtime=False, speed=1.0, batch_size=sniffer.BATCH_SIZE,
+                batch_deadline_ms=sniffer.BATCH_DEADLINE_MS, limit=None, dry_run=False,
+                parser='raw'):
+    """
+    Replay `path` through the pipeline and return a report dict.
+    realtime: sleep so packets are processed at their capture timestamps (scaled by speed).
+    dry_run: count alerts but do not call log_attack/block_ip.
+    parser: 'raw' reads headers with rawparse (as live capture does), 'scapy' dissects every packet.
+    Raises RuntimeError when no model can be loaded.
+    """
+    if not sniffer.load_detector():
+        raise RuntimeError("No model loaded. Run 'python train_model.py' first.")
+    timings = {'extract': [], 'lookup': [], 'encode': [], 'infer': [], 'alert': [],
+               'end_to_end': []}
+    counts = {'packets': 0, 'ip_packets': 0, 'skipped': 0, 'blocked': 0, 'batches': 0, 'alerts': 0}
+    alert_sources = set()
+    deadline = batch_deadline_ms / 1000.0
+
+    rows, metas, arrivals = [], [], []
+
+    def flush():
+        if not rows:
+            return
+        def score(miss_rows):
+            encoder, model = sniffer.detector
+            t0 = time.perf_counter()
+            X = encoder.transform_rows(miss_rows)
+            t1 = time.perf_counter()
+            out = np.asarray(model.predict_on_batch(X)).reshape(-1)
+            timings['encode'].append(t1 - t0)
+            timings['infer'].append(time.perf_counter() - t1)
+            return out
+
+        # Same path as sniffer.predict_rows, with the encode/infer stages timed
+        cache = sniffer.verdict_cache
+        t0 = time.perf_counter()
+        confidences = cache.score(rows, score) if cache is not None else score(rows)
+        timings['lookup'].append(time.perf_counter() - t0)
+        counts['batches'] += 1
+
+        for (src_ip, dst_ip, proto), confidence, arrived in zip(metas, confidences, arrivals):
+            if confidence > 0.5:
+                counts['alerts'] += 1
+                alert_sources.add(src_ip)
+                if not dry_run:
+                    ta = time.perf_counter()
+                    sniffer.handle_verdict(src_ip, dst_ip, proto, confidence)
+                    timings['alert'].append(time.perf_counter() - ta)
+            timings['end_to_end'].append(time.perf_counter() - arrived)
+        rows.clear()
+        metas.clear()
+        arrivals.clear()
+
+    first_ts = None
+    wall_start = time.perf_counter()
+    for ts, record in pcap_records(path, parser):
+        if limit is not None and counts['packets'] >= limit:
+            break
+        counts['packets'] += 1
+
+        if realtime:
+            if first_ts is None:
+                first_ts = ts
+            due = wall_start + (ts - first_ts) / speed
+            # Flush a partial batch rather than sleep past its deadline
+            while True:
+                now = time.perf_counter()
+                if rows and now - arrivals[0] >= deadline:
+                    flush()
+                    continue
+                if due <= now:
+                    break
+                wait = due - now
+                if rows:
+                    wait = min(wait, arrivals[0] + deadline - now)
+                time.sleep(max(wait, 0))
+
+        arrived = time.perf_counter()
+        fields = record_fields(ts, record)
+        if fields is None:
+            counts['skipped'] += 1
+            continue
+        counts['ip_packets'] += 1
+        # Same fast path as sniffer.packet_callback
+        if fields.src in sniffer.BLOCKED_IPS:
+            counts['blocked'] += 1
+            continue
+        row = sniffer.fields_features(fields)
+        timings['extract'].append(time.perf_counter() - arrived)
+
+        rows.append(row)
+        metas.append((fields.src, fields.dst, PROTO_LABELS[fields.proto]))
+        arrivals.append(arrived)
+        if len(rows) >= batch_size:
+            flush()
+    flush()
+    if not dry_run:
+        # Alerts are written asynchronously; include the final commit in the timing
+        database.flush_alerts()
+    elapsed = time.perf_counter() - wall_start
+
+    return {
+        'file': path,
+        'mode': 'realtime' if realtime else 'max',
+        'parser': parser,
+        'speed': speed,
+        'batch_size': batch_size,
+        'elapsed_s': elapsed,
+        'packets_per_s': counts['packets'] / elapsed if elapsed else 0.0,
+        **counts,
+        'mean_batch': ((counts['ip_packets'] - counts['blocked']) / counts['batches']
+                       if counts['batches'] else 0.0),
+        'alert_sources': len(alert_sources),
+        'latency': {stage: _summary(samples) for stage, samples in timings.items()},
+        'flow_table': sniffer.flow_table.stats(),
+        'verdict_cache': sniffer.get_cache_stats(),
+        'alert_writer': database.get_writer_stats(),
+    }
+
+
+def print_report(report):
+    print(f"\n=== Replay of {report['file']} ({report['mode']}, {report['parser']} parser) ===")
+    print(f"Packets: {report['packets']} ({report['ip_packets']} IP, {report['skipped']} skipped, "
+          f"{report['blocked']} from blocked sources)")
+    print(f"Elapsed: {report['elapsed_s']:.2f} s -> {report['packets_per_s']:.0f} packets/s")
+    print(f"Batches: {report['batches']} (mean {report['mean_batch']:.1f} rows)")
+    print(f"Alerts:  {report['alerts']} from {report['alert_sources']} sources")
+    c = report['verdict_cache']
+    if c:
+        print(f"Cache:   {c['hit_rate']:.1%} hit rate ({c['hits']} hits, {c['misses']} misses, "
+              f"{c['evictions']} evictions, {c['size']} entries)")
+    w = report['alert_writer']
+    print(f"Writer:  {w['written']} written in {w['batches']} batches, {w['dropped']} dropped")
+    print(f"\n{'stage':12}{'count':>9}{'mean':>11}{'p50':>11}{'p90':>11}{'p99':>11}{'max':>11}  (us)")
+    for stage, s in report['latency'].items():
+        if not s['count']:
+            print(f"{stage:12}{0:>9}")
+            continue
+        print(f"{stage:12}{s['count']:>9}{s['mean_us']:>11.1f}{s['p50_us']:>11.1f}"
+              f"{s['p90_us']:>11.1f}{s['p99_us']:>11.1f}{s['max_us']:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a pcap/pcapng file through the IDPS pipeline.")
+    parser.add_argument('pcap')
+    parser.add_argument('--realtime', action='store_true', help='play at the original timestamps')
+    parser.add_argument('--speed', type=float, default=1.0, help='speed multiplier for --realtime')
+    parser.add_argument('--batch-size', type=int, default=sniffer.BATCH_SIZE)
+    parser.add_argument('--deadline-ms', type=float, default=sniffer.BATCH_DEADLINE_MS)
+    parser.add_argument('--cache-size', type=int, default=sniffer.VERDICT_CACHE_SIZE,
+                        help='verdict cache entries (default IDPS_VERDICT_CACHE, 0: off)')
+    parser.add_argument('--src-bytes-bucket', type=int, help='quantize src_bytes in cache keys')
+    parser.add_argument('--parser', choices=('raw', 'scapy'), default='raw',
+                        help='header parsing: rawparse with scapy fallback, or scapy for every packet')
+    parser.add_argument('--limit', type=int, help='stop after this many packets')
+    parser.add_argument('--db', help='write alerts to this SQLite file instead of idps.db')
+    parser.add_argument('--dry-run', action='store_true', help='count alerts without logging/blocking')
+    parser.add_argument('--verbose', action='store_true', help='print every alert')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    if not sniffer.load_detector():
+        print("No model loaded. Run 'python train_model.py' first.")
+        sys.exit(1)
+    if args.db:
+        database.DB_PATH = args.db
+        database.init_db()
+    sniffer.VERBOSE_ALERTS = args.verbose
+    sniffer.configure_verdict_cache(args.cache_size, args.src_bytes_bucket)
+
+    report = replay_pcap(args.pcap, realtime=args.realtime, speed=args.speed,
+                         batch_size=args.batch_size, batch_deadline_ms=args.deadline_ms,
+                         limit=args.limit, dry_run=args.dry_run, parser=args.parser)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
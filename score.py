@@ -0,0 +1,258 @@
+"""
+Bulk scoring of NSL-KDD-format connection records.
+
+Scores files of already-extracted records - a KDD test set, or flow
+exports from collectors written in the same 41-feature layout - with the
+trained model, without the per-row work of the live path:
+
+  - the CSV is cut into blocks of --chunk-rows lines and each block is
+    parsed with pandas (columns past the label are ignored),
+  - categorical columns are encoded with vectorized lookups
+    (CompiledEncoder.transform_frame); values not seen in training get a
+    reserved code per column instead of aliasing class 0,
+  - each block is scored in large batches, by --workers processes if
+    asked (output order is kept).
+
+The output CSV has one line per record: row, confidence, verdict and,
+when the input has a label column, the label. A summary (rows/s, verdict
+counts, confusion matrix when labels are present) is printed and can be
+written as JSON.
+
+    python score.py data/KDDTest+.txt -o verdicts.csv
+    python score.py flows.csv -o verdicts.csv --workers 4 --json summary.json
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+try:
+    from preprocessing import CAT_COLS, COL_NAMES, ENCODER_PATH, SCALER_PATH, CompiledEncoder
+    from numpy_model import NumpyCNN, NUMPY_MODEL_PATH, KERAS_MODEL_PATH
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from preprocessing import CAT_COLS, COL_NAMES, ENCODER_PATH, SCALER_PATH, CompiledEncoder
+    from numpy_model import NumpyCNN, NUMPY_MODEL_PATH, KERAS_MODEL_PATH
+
+CHUNK_ROWS = 100000
+SCORE_BATCH = 8192
+THRESHOLD = 0.5 # same cut-off as the live sniffer
+# The NumPy backend needs no TensorFlow and forks cleanly into worker processes
+BACKEND = os.environ.get('IDPS_SCORE_BACKEND', 'numpy')
+N_FEATURES = len(COL_NAMES) - 1
+LABEL = COL_NAMES[-1]
+
+_scorer = None # per-process BulkScorer (set by _init_worker)
+
+
+class BulkScorer:
+    """Model plus CompiledEncoder for scoring DataFrames of raw records."""
+
+    def __init__(self, model, encoder, batch_size=SCORE_BATCH):
+        self.model = model
+        self.encoder = encoder
+        self.batch_size = batch_size
+
+    @classmethod
+    def load(cls, backend=BACKEND, unseen_code=CompiledEncoder.UNSEEN_RESERVED, batch_size=SCORE_BATCH):
+        if backend == 'numpy':
+            model = NumpyCNN.load(NUMPY_MODEL_PATH)
+        elif backend == 'keras':
+            from tensorflow.keras.models import load_model
+            model = load_model(KERAS_MODEL_PATH)
+        else:
+            raise ValueError(f"Unknown backend: {backend}")
+        return cls(model, CompiledEncoder.load(ENCODER_PATH, SCALER_PATH, unseen_code), batch_size)
+
+    def confidences(self, X):
+        out = np.empty(len(X), dtype=np.float32)
+        for start in range(0, len(X), self.batch_size):
+            batch = X[start:start + self.batch_size]
+            out[start:start + len(batch)] = np.asarray(self.model.predict_on_batch(batch)).reshape(-1)
+        return out
+
+    def score_frame(self, df):
+        """(confidences, unseen counts per categorical column) for a DataFrame of raw features."""
+        X, unseen = self.encoder.transform_frame(df[COL_NAMES[:N_FEATURES]])
+        return self.confidences(X), unseen
+
+
+def inspect_csv(path):
+    """(has_header, number of columns used, has_label) from the first line of a CSV."""
+    with open(path, 'rb') as f:
+        first = f.readline().decode('utf-8', 'replace').strip()
+    fields = first.split(',')
+    if len(fields) < N_FEATURES:
+        raise ValueError(f"{path}: expected at least {N_FEATURES} columns, found {len(fields)}")
+    try:
+        float(fields[0])
+        has_header = False
+    except ValueError:
+        has_header = True # duration is numeric in every record
+    n_cols = min(len(fields), len(COL_NAMES))
+    return has_header, n_cols, n_cols == len(COL_NAMES)
+
+
+def read_blocks(path, chunk_rows=CHUNK_ROWS, skip_header=False):
+    """Raw byte blocks of `chunk_rows` lines; parsing is left to the (worker) process."""
+    with open(path, 'rb') as f:
+        if skip_header:
+            f.readline()
+        while True:
+            lines = list(islice(f, chunk_rows))
+            if not lines:
+                return
+            yield b''.join(lines)
+
+
+def parse_block(block, n_cols):
+    return pd.read_csv(io.BytesIO(block), header=None, names=COL_NAMES[:n_cols], usecols=range(n_cols),
+                       dtype={col: str for col in CAT_COLS + [LABEL]})
+
+
+def _init_worker(backend, unseen_code, batch_size):
+    global _scorer
+    _scorer = BulkScorer.load(backend, unseen_code, batch_size)
+
+
+def _score_block(args):
+    block, n_cols = args
+    df = parse_block(block, n_cols)
+    confidences, unseen = _scorer.score_frame(df)
+    labels = df[LABEL].to_numpy(dtype=object) if LABEL in df else None
+    return confidences, labels, unseen
+
+
+def _is_attack(labels):
+    # KDD'99 files end labels with a '.'
+    return (pd.Series(labels, dtype=str).str.rstrip('.') != 'normal').to_numpy()
+
+
+def score_file(path, output=None, workers=1, chunk_rows=CHUNK_ROWS, batch_size=SCORE_BATCH,
+               backend=BACKEND, threshold=THRESHOLD, unseen_code=CompiledEncoder.UNSEEN_RESERVED):
+    """Score every record of `path`, writing verdicts to `output` if given; returns the summary."""
+    has_header, n_cols, has_label = inspect_csv(path)
+    jobs = ((block, n_cols) for block in read_blocks(path, chunk_rows, skip_header=has_header))
+    init_args = (backend, unseen_code, batch_size)
+    t0 = time.perf_counter()
+    if workers > 1:
+        # TensorFlow does not survive fork(); start Keras workers fresh
+        ctx = multiprocessing.get_context('spawn' if backend == 'keras' else None)
+        pool = ctx.Pool(workers, initializer=_init_worker, initargs=init_args)
+        results = pool.imap(_score_block, jobs)
+    else:
+        pool = None
+        _init_worker(*init_args)
+        results = map(_score_block, jobs)
+
+    rows = attacks = 0
+    unseen_total = dict.fromkeys(CAT_COLS, 0)
+    confusion = {'tp': 0, 'fp': 0, 'tn': 0, 'fn': 0} if has_label else None
+    out = open(output, 'w', newline='') if output else None
+    try:
+        for confidences, labels, unseen in results:
+            predicted = confidences > threshold
+            if out is not None:
+                frame = pd.DataFrame({'row': np.arange(rows, rows + len(confidences)),
+                                      'confidence': confidences,
+                                      'verdict': np.where(predicted, 'attack', 'normal')})
+                if labels is not None:
+                    frame['label'] = labels
+                frame.to_csv(out, header=rows == 0, index=False, float_format='%.6f')
+            rows += len(confidences)
+            attacks += int(predicted.sum())
+            for col, n in unseen.items():
+                unseen_total[col] += n
+            if labels is not None:
+                actual = _is_attack(labels)
+                confusion['tp'] += int((predicted & actual).sum())
+                confusion['fp'] += int((predicted & ~actual).sum())
+                confusion['tn'] += int((~predicted & ~actual).sum())
+                confusion['fn'] += int((~predicted & actual).sum())
+    finally:
+        if out is not None:
+            out.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+    elapsed = time.perf_counter() - t0
+
+    summary = {
+        'file': path,
+        'output': output,
+        'backend': backend,
+        'workers': workers,
+        'rows': rows,
+        'elapsed_s': elapsed,
+        'rows_per_s': rows / elapsed if elapsed else 0.0,
+        'threshold': threshold,
+        'attacks': attacks,
+        'normal': rows - attacks,
+        'unseen_values': unseen_total,
+        'confusion': confusion,
+    }
+    if confusion:
+        tp, fp, tn, fn = confusion['tp'], confusion['fp'], confusion['tn'], confusion['fn']
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        summary.update({
+            'accuracy': (tp + tn) / rows if rows else 0.0,
+            'precision': precision,
+            'recall': recall,
+            'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        })
+    return summary
+
+
+def print_summary(summary):
+    print(f"\n=== Scored {summary['file']} ({summary['backend']} backend, {summary['workers']} worker(s)) ===")
+    print(f"Rows:    {summary['rows']} in {summary['elapsed_s']:.2f} s -> {summary['rows_per_s']:.0f} rows/s")
+    print(f"Verdict: {summary['attacks']} attack, {summary['normal']} normal (threshold {summary['threshold']})")
+    unseen = {col: n for col, n in summary['unseen_values'].items() if n}
+    if unseen:
+        print(f"Unseen:  {', '.join(f'{col}={n}' for col, n in unseen.items())} (categories not seen in training)")
+    c = summary['confusion']
+    if c:
+        print(f"\n{'':16}{'pred attack':>12}{'pred normal':>12}")
+        print(f"{'actual attack':16}{c['tp']:>12}{c['fn']:>12}")
+        print(f"{'actual normal':16}{c['fp']:>12}{c['tn']:>12}")
+        print(f"\nAccuracy {summary['accuracy']:.4f}  precision {summary['precision']:.4f}  "
+              f"recall {summary['recall']:.4f}  F1 {summary['f1']:.4f}")
+    if summary['output']:
+        print(f"Verdicts written to {summary['output']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV of NSL-KDD-format records with the IDPS model.")
+    parser.add_argument('csv')
+    parser.add_argument('-o', '--output', help='write row, confidence, verdict (and label) here')
+    parser.add_argument('--workers', type=int, default=1, help='scoring processes')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--batch-size', type=int, default=SCORE_BATCH)
+    parser.add_argument('--backend', choices=('numpy', 'keras'), default=BACKEND)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--unseen', choices=('reserved', 'zero'), default='reserved',
+                        help='code for categories not seen in training (zero: as preprocess_data)')
+    parser.add_argument('--json', help='also write the summary to this file')
+    args = parser.parse_args()
+
+    unseen_code = CompiledEncoder.UNSEEN_RESERVED if args.unseen == 'reserved' else 0
+    summary = score_file(args.csv, args.output, workers=args.workers, chunk_rows=args.chunk_rows,
+                         batch_size=args.batch_size, backend=args.backend, threshold=args.threshold,
+                         unseen_code=unseen_code)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
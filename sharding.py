@@ -0,0 +1,367 @@
+"""
+Multi-process capture sharding.
+
+One capture process (the sniffer thread started by app.py) dissects only
+enough of each packet to compute a symmetric 5-tuple hash, and forwards
+the raw IP bytes to one of N worker processes. Each worker has its own
+model instance and its own FlowTable, so a flow's state lives in exactly
+one place: both directions of a flow hash to the same worker.
+
+Workers send verdicts back over a shared result queue. The parent turns
+them into log_attack/block_ip calls, so alerts still go through the
+single database writer and the single blocklist. Each worker's periodic
+stats carry the changes to its stage metrics, which the parent merges
+into its own (metrics.merge), so /api/metrics covers the workers too.
+
+    python sharding.py --workers 4 --pcap capture.pcap   # offline, per-worker numbers
+"""
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+
+try:
+    import metrics
+    import sniffer
+    from flow_table import flow_hash
+    from rawparse import (PROTO_LABELS, LINKTYPE_ETHERNET, LINKTYPE_RAW, Unsupported, ip_offset,
+                          parse_ip, parse_frame)
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import metrics
+    import sniffer
+    from flow_table import flow_hash
+    from rawparse import (PROTO_LABELS, LINKTYPE_ETHERNET, LINKTYPE_RAW, Unsupported, ip_offset,
+                          parse_ip, parse_frame)
+
+from scapy.all import IP, TCP, UDP
+
+CHUNK_SIZE = 64           # packets per IPC message to a worker
+CHUNK_DEADLINE_MS = 5.0   # max time a partial chunk waits before it is sent
+WORKER_QUEUE_CHUNKS = 256 # bounded per-worker queue (chunks)
+STATS_INTERVAL = 1.0      # seconds between worker stats reports
+
+
+def _worker_main(index, in_q, out_q, batch_size, threads):
+    """Worker process: parse packets, extract features, score, report alerts."""
+    # One inference thread per worker; the parallelism comes from the processes
+    os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(threads))
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+    import sniffer as worker_sniffer
+    from scapy.all import IP as IPLayer
+    worker_sniffer.load_scapy()
+    worker_sniffer.load_detector()
+    out_q.put(('ready', index, None))
+    sent_metrics = metrics.snapshot()
+
+    packets = alerts = batches = 0
+    busy = 0.0
+    last_report = time.monotonic()
+    running = True
+    while running:
+        try:
+            chunks = [in_q.get(timeout=STATS_INTERVAL)]
+        except queue.Empty:
+            chunks = []
+        # Drain whatever else is waiting, up to one model batch
+        n = sum(len(c) for c in chunks if c is not None)
+        while n < batch_size:
+            try:
+                c = in_q.get_nowait()
+            except queue.Empty:
+                break
+            chunks.append(c)
+            if c is not None:
+                n += len(c)
+
+        if chunks:
+            t0 = time.perf_counter()
+            rows, metas = [], []
+            for chunk in chunks:
+                if chunk is None:
+                    running = False
+                    continue
+                for ts, raw in chunk:
+                    t1 = time.perf_counter()
+                    try:
+                        fields = parse_frame(raw, ts, LINKTYPE_RAW)
+                    except Unsupported:
+                        packet = IPLayer(raw)
+                        packet.time = ts
+                        fields = worker_sniffer.packet_fields(packet)
+                    metrics.stage_parse.observe(time.perf_counter() - t1)
+                    if fields is None:
+                        continue
+                    rows.append(worker_sniffer.fields_features(fields))
+                    metas.append((fields.src, fields.dst, PROTO_LABELS[fields.proto]))
+            if rows:
+                confidences = worker_sniffer.score_batch(rows)
+                batches += 1
+                verdicts = [(meta, float(c)) for meta, c in zip(metas, confidences) if c > 0.5]
+                if verdicts:
+                    out_q.put(('alerts', index, verdicts))
+                    alerts += len(verdicts)
+            packets += len(rows)
+            busy += time.perf_counter() - t0
+
+        now = time.monotonic()
+        if now - last_report >= STATS_INTERVAL or not running:
+            sent_metrics, changes = metrics.changes_since(sent_metrics)
+            out_q.put(('stats', index, {
+                'packets': packets, 'alerts': alerts, 'batches': batches,
+                'busy_s': busy, 'flows': worker_sniffer.flow_table.stats()['connections'],
+                'metrics': changes,
+            }))
+            last_report = now
+    out_q.put(('stopped', index, None))
+
+
+class ShardedSniffer:
+    """Parent side: dispatch packets to workers by flow hash and merge their verdicts."""
+
+    def __init__(self, workers=None, batch_size=sniffer.BATCH_SIZE, threads_per_worker=1,
+                 block=False):
+        self.n = workers or max(1, (os.cpu_count() or 2) - 1)
+        # Live capture drops chunks for a saturated worker; offline replay (block=True) waits
+        self.block = block
+        self.batch_size = batch_size
+        self.threads_per_worker = threads_per_worker
+        # spawn: TensorFlow and forked threads do not mix
+        self.ctx = mp.get_context('spawn')
+        self.in_queues = [self.ctx.Queue(WORKER_QUEUE_CHUNKS) for _ in range(self.n)]
+        self.out_queue = self.ctx.Queue()
+        self.procs = []
+        self._buffers = [[] for _ in range(self.n)]
+        self._buffer_started = [0.0] * self.n
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.dispatched = [0] * self.n
+        self.dropped = [0] * self.n
+        self.blocked = 0
+        self.worker_stats = [{} for _ in range(self.n)]
+        self._started_at = None
+        self._running = 0
+        self._ready = 0
+        self._all_ready = threading.Event()
+
+    def start(self, wait_ready=True, timeout=120):
+        """Launch the workers; by default wait until each has loaded its model."""
+        for i in range(self.n):
+            p = self.ctx.Process(target=_worker_main, name=f"idps-worker-{i}",
+                                 args=(i, self.in_queues[i], self.out_queue,
+                                       self.batch_size, self.threads_per_worker))
+            p.daemon = True
+            p.start()
+            self.procs.append(p)
+        self._running = self.n
+        for target in (self._collect_results, self._flush_loop):
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+        if wait_ready and not self._all_ready.wait(timeout):
+            print(f"[!] Only {self._ready}/{self.n} workers ready after {timeout} s")
+        self._started_at = time.monotonic()
+        print(f"[*] Sharded capture: {self.n} worker processes")
+        return self
+
+    # Capture side ------------------------------------------------------------
+
+    def dispatch(self, packet):
+        """sniff() callback: route the packet to its flow's worker."""
+        if IP not in packet:
+            return
+        metrics.packets.inc()
+        ip = packet[IP]
+        # Blocklist lives in this process; blocked sources never reach a worker
+        if ip.src in sniffer.BLOCKED_IPS:
+            self.blocked += 1
+            return
+        if TCP in packet:
+            l4 = packet[TCP]
+            key = (ip.src, ip.dst, l4.sport, l4.dport, 6)
+        elif UDP in packet:
+            l4 = packet[UDP]
+            key = (ip.src, ip.dst, l4.sport, l4.dport, 17)
+        else:
+            key = (ip.src, ip.dst, 0, 0, ip.proto)
+        self.dispatch_raw(flow_hash(*key) % self.n, float(packet.time), bytes(ip))
+
+    def dispatch_frame(self, frame, ts):
+        """sniffer.raw_sniff() callback: dispatch() for an undissected Ethernet frame."""
+        try:
+            offset = ip_offset(frame, LINKTYPE_ETHERNET)
+            if offset is None:
+                return
+            fields = parse_ip(frame, offset, ts)
+        except Unsupported:
+            packet = sniffer.Ether(bytes(frame))
+            packet.time = ts
+            config = sniffer.capture_config
+            if config is None or config.kernel_filter or config.accept(packet):
+                self.dispatch(packet)
+            return
+        config = sniffer.capture_config
+        if config is not None and not config.kernel_filter and not config.accept_fields(fields):
+            return
+        metrics.packets.inc()
+        if fields.src in sniffer.BLOCKED_IPS:
+            self.blocked += 1
+            return
+        if fields.proto == 'tcp' or fields.proto == 'udp':
+            key = (fields.src, fields.dst, fields.sport, fields.dport, fields.ip_proto)
+        else:
+            key = (fields.src, fields.dst, 0, 0, fields.ip_proto)
+        self.dispatch_raw(flow_hash(*key) % self.n, ts, bytes(frame[offset:]))
+
+    def dispatch_raw(self, shard, ts, raw_ip):
+        with self._lock:
+            buf = self._buffers[shard]
+            if not buf:
+                self._buffer_started[shard] = time.monotonic()
+            buf.append((ts, raw_ip))
+            if len(buf) >= CHUNK_SIZE:
+                self._send(shard)
+
+    def _send(self, shard):
+        # Caller holds self._lock
+        chunk = self._buffers[shard]
+        if not chunk:
+            return
+        self._buffers[shard] = []
+        try:
+            if self.block:
+                self.in_queues[shard].put(chunk)
+            else:
+                self.in_queues[shard].put_nowait(chunk)
+            self.dispatched[shard] += len(chunk)
+        except queue.Full:
+            # Worker is saturated; do not stall capture
+            self.dropped[shard] += len(chunk)
+
+    def flush(self):
+        with self._lock:
+            for shard in range(self.n):
+                self._send(shard)
+
+    def _flush_loop(self):
+        deadline = CHUNK_DEADLINE_MS / 1000.0
+        while not self._stopped.is_set():
+            time.sleep(deadline / 2)
+            now = time.monotonic()
+            with self._lock:
+                for shard in range(self.n):
+                    if self._buffers[shard] and now - self._buffer_started[shard] >= deadline:
+                        self._send(shard)
+
+    # Result side -------------------------------------------------------------
+
+    def _collect_results(self):
+        while self._running:
+            try:
+                kind, index, payload = self.out_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if kind == 'alerts':
+                for (src_ip, dst_ip, proto), confidence in payload:
+                    # Shared writer and blocklist live in this process
+                    sniffer.handle_verdict(src_ip, dst_ip, proto, confidence)
+            elif kind == 'stats':
+                # Stage timings and counts recorded in the worker since its last report
+                metrics.merge(payload.pop('metrics', {}))
+                self.worker_stats[index] = payload
+            elif kind == 'ready':
+                self._ready += 1
+                if self._ready == self.n:
+                    self._all_ready.set()
+            elif kind == 'stopped':
+                self._running -= 1
+
+    def stop(self, timeout=30):
+        """Flush partial chunks, let workers finish their queues, and wait for them."""
+        self.flush()
+        for q in self.in_queues:
+            q.put(None)
+        deadline = time.monotonic() + timeout
+        while self._running and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stopped.set()
+        for p in self.procs:
+            p.join(max(0.1, deadline - time.monotonic()))
+
+    def stats(self):
+        elapsed = max(1e-9, time.monotonic() - (self._started_at or time.monotonic()))
+        workers = []
+        for i in range(self.n):
+            ws = dict(self.worker_stats[i])
+            packets = ws.get('packets', 0)
+            busy = ws.get('busy_s', 0.0)
+            ws.update({
+                'worker': i,
+                'dispatched': self.dispatched[i],
+                'dropped': self.dropped[i],
+                'queue_depth': _qsize(self.in_queues[i]),
+                'packets_per_s': packets / elapsed,
+                'busy_packets_per_s': packets / busy if busy else 0.0,
+            })
+            workers.append(ws)
+        return {'workers': workers, 'elapsed_s': elapsed, 'blocked': self.blocked,
+                'packets': sum(w.get('packets', 0) for w in workers)}
+
+
+def _qsize(q):
+    try:
+        return q.qsize()
+    except NotImplementedError: # macOS
+        return None
+
+
+def print_stats(stats):
+    print(f"\n{'worker':>6}{'dispatched':>12}{'processed':>11}{'dropped':>9}{'alerts':>8}"
+          f"{'flows':>8}{'pkt/s':>10}{'busy pkt/s':>12}")
+    for w in stats['workers']:
+        print(f"{w['worker']:>6}{w['dispatched']:>12}{w.get('packets', 0):>11}{w['dropped']:>9}"
+              f"{w.get('alerts', 0):>8}{w.get('flows', 0):>8}{w['packets_per_s']:>10.0f}"
+              f"{w['busy_packets_per_s']:>12.0f}")
+    print(f"Total: {stats['packets']} packets in {stats['elapsed_s']:.2f} s "
+          f"({stats['packets'] / stats['elapsed_s']:.0f} packets/s), "
+          f"{stats['blocked']} dropped from blocked sources")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the detector sharded across worker processes.")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--pcap', help='replay this file instead of live capture')
+    parser.add_argument('--db', help='write alerts to this SQLite file instead of idps.db')
+    args = parser.parse_args()
+
+    if args.db:
+        # Before the first import of database, which creates and migrates DB_PATH
+        os.environ['IDPS_DB_PATH'] = args.db
+    import database
+    sniffer.VERBOSE_ALERTS = False
+    sharded = ShardedSniffer(workers=args.workers, block=bool(args.pcap)).start()
+    if args.pcap:
+        from scapy.utils import PcapReader
+        with PcapReader(args.pcap) as reader:
+            for packet in reader:
+                sharded.dispatch(packet)
+        sharded.stop()
+        database.flush_alerts()
+        print_stats(sharded.stats())
+    else:
+        try:
+            from scapy.all import sniff
+            sniff(prn=sharded.dispatch, filter="ip", store=0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sharded.stop()
+            database.flush_alerts()
+            print_stats(sharded.stats())
+
+
+if __name__ == '__main__':
+    main()
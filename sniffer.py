@@ -4,50 +4,204 @@ import os
 import random
 import numpy as np
 import threading
-from scapy.all import sniff, IP, TCP, UDP, ICMP, Ether
-from tensorflow.keras.models import load_model
 import pickle
+import socket
 import sys
 import subprocess
 
 # Local imports
 try:
-    from database import log_attack
-    from preprocessing import preprocess_data
+    import metrics
+    from inference import BatchInferenceWorker, BATCH_SIZE, BATCH_DEADLINE_MS
+    from flow_table import FlowTable, is_wrong_fragment
+    from numpy_model import NumpyCNN, NUMPY_MODEL_PATH
+    from verdict_cache import VerdictCache
+    from file_watcher import FileWatcher
+    from blocklist import Blocklist
+    from capture import CaptureConfig
+    from capture_queue import CaptureQueue, QUEUE_SIZE, DEFAULT_POLICY
+    from rawparse import (PacketFields, PROTO_LABELS, LINKTYPE_ETHERNET, Unsupported,
+                          parse_frame)
+    from traffic_gen import SIM_FEED, TrafficGenerator, parse_address
 except ImportError:
     # Fix for running as script
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-    from database import log_attack
-    from preprocessing import preprocess_data
+    import metrics
+    from inference import BatchInferenceWorker, BATCH_SIZE, BATCH_DEADLINE_MS
+    from flow_table import FlowTable, is_wrong_fragment
+    from numpy_model import NumpyCNN, NUMPY_MODEL_PATH
+    from verdict_cache import VerdictCache
+    from file_watcher import FileWatcher
+    from blocklist import Blocklist
+    from capture import CaptureConfig
+    from capture_queue import CaptureQueue, QUEUE_SIZE, DEFAULT_POLICY
+    from rawparse import (PacketFields, PROTO_LABELS, LINKTYPE_ETHERNET, Unsupported,
+                          parse_frame)
+    from traffic_gen import SIM_FEED, TrafficGenerator, parse_address
 
 # Configuration
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model', 'cnn_model.h5')
 ENCODER_PATH = os.path.join(os.path.dirname(__file__), 'model', 'encoders.pkl')
 SCALER_PATH = os.path.join(os.path.dirname(__file__), 'model', 'scaler.pkl')
+# 'keras' runs the saved .h5 through TensorFlow; 'numpy' runs the exported
+# .npz (see numpy_model.py) without importing TensorFlow at all.
+INFERENCE_BACKEND = os.environ.get('IDPS_INFERENCE_BACKEND', 'keras')
+# Confidences cached per distinct feature row (0 disables). Off by default:
+# the row carries the connection's window counts, so live traffic rarely
+# repeats one; it pays off on steady polling traffic (bench_verdict_cache.py).
+# SRC_BYTES_BUCKET groups src_bytes into buckets of that many bytes: more
+# hits, approximate verdicts.
+VERDICT_CACHE_SIZE = int(os.environ.get('IDPS_VERDICT_CACHE', 0))
+SRC_BYTES_BUCKET = None
 
-BLOCKED_IPS = set()
+# Blocked sources (addresses and CIDR prefixes); checked before any feature work
+BLOCKED_IPS = Blocklist()
+BLOCK_TTL = None # seconds an automatic block lasts (None: until reset)
+# Optional file of extra entries ("address-or-prefix [ttl]" per line), loaded when capture starts
+BLOCKLIST_FILE = os.environ.get('IDPS_BLOCKLIST')
+blocked_packets = 0 # packets dropped by the blocklist fast path
 running = True
+VERBOSE_ALERTS = True # Print every alert to the console
+CAPTURE_WORKERS = 1 # >1 shards analysis across processes (see sharding.py)
+# Read frames off the capture socket and parse headers with rawparse instead of
+# having scapy dissect every packet (scapy still handles what rawparse cannot)
+RAW_CAPTURE = os.environ.get('IDPS_RAW_CAPTURE', '1') == '1'
+RAW_BUFFER_SIZE = 1 << 18 # fits GRO/GSO-coalesced frames
+# Simulation mode: receive buffer for the traffic_gen feed (bursts queue here),
+# and how long the feed may stay quiet before a background packet is generated
+SIM_FEED_BUFFER = 8 << 20
+SIM_IDLE_INTERVAL = 0.5
+
+# What reaches Python at all: BPF filter, excluded subnets/ports and flow
+# sampling (see capture.py). Set by start_sniffer from IDPS_CAPTURE_* unless given.
+capture_config = None
+
+# Batched inference stage (started by start_sniffer). When it is not running,
+# packet_callback falls back to scoring each packet inline.
+inference_worker = None
+
+# Bounded queue between capture and analysis (started by start_sniffer), so a
+# stall in analysis sheds packets by policy instead of overflowing the kernel
+# buffer at random. Size 0 analyses packets inline in the capture loop.
+CAPTURE_QUEUE_SIZE = int(os.environ.get('IDPS_CAPTURE_QUEUE', QUEUE_SIZE))
+SHED_POLICY = os.environ.get('IDPS_SHED_POLICY', DEFAULT_POLICY)
+# Sources scoring above this are served first by the suspicious_first policy
+SUSPICIOUS_CONFIDENCE = 0.3
+# Longest the analysis thread waits for room in the inference queue; while it
+# waits, the capture queue fills and sheds by policy
+INFERENCE_SUBMIT_TIMEOUT = 1.0
+INFERENCE_QUEUE_BATCHES = 4 # inference queue length, in batches, when the capture queue is on
+capture_queue = None
+
+# Connection/host state behind the NSL-KDD window features
+flow_table = FlowTable()
+
+def _model_files():
+    model_file = NUMPY_MODEL_PATH if INFERENCE_BACKEND == 'numpy' else MODEL_PATH
+    return (model_file, ENCODER_PATH, SCALER_PATH)
+
+def configure_verdict_cache(size=VERDICT_CACHE_SIZE, src_bytes_bucket=SRC_BYTES_BUCKET):
+    """(Re)create the verdict cache; size 0 disables it."""
+    global verdict_cache
+    verdict_cache = VerdictCache(size, src_bytes_bucket) if size > 0 else None
+    return verdict_cache
+
+verdict_cache = None
+configure_verdict_cache()
+
+# Model files on disk; predict_rows reloads the detector when they change
+model_watcher = FileWatcher(_model_files())
 
 def reset_blocked_ips():
     global BLOCKED_IPS
     BLOCKED_IPS.clear()
     print("[*] Internal Blocked IPs list cleared.")
 
-# Load Model & Preprocessors
-print("Loading IDPS Model...")
-try:
-    model = load_model(MODEL_PATH)
-    with open(ENCODER_PATH, 'rb') as f:
-        encoders = pickle.load(f)
-    with open(SCALER_PATH, 'rb') as f:
-        scaler = pickle.load(f)
-    print("Model loaded successfully.")
-except Exception as e:
-    print(f"Error loading model: {e}. Ensure you have run 'python train_model.py' first.")
-    # Create valid dummy objects to prevent immediate crash if just exploring code
-    model = None
-    encoders = {}
-    scaler = None
+# Model, preprocessors and scapy are loaded on first use by load_detector()
+# (or ahead of time by warm_up()), so importing this module - and serving the
+# dashboard - does not pay the TensorFlow/scapy startup cost.
+# (CompiledEncoder, model), swapped as one so a batch is never encoded for
+# one model and scored by another during a reload
+detector = None
+encoders = {}
+scaler = None
+sniff = Ether = IP = TCP = UDP = ICMP = None
+
+_load_lock = threading.Lock()
+model_status = {'state': 'not_loaded', 'backend': INFERENCE_BACKEND,
+                'load_seconds': None, 'error': None}
+
+def load_scapy():
+    global sniff, Ether, IP, TCP, UDP, ICMP
+    if IP is None:
+        from scapy.all import sniff, Ether, IP, TCP, UDP, ICMP
+
+# database is imported on the first alert rather than with this module:
+# importing it creates and migrates the SQLite file, and sharded workers
+# (sharding.py) import sniffer but never write alerts.
+log_attack = None
+
+def load_database():
+    global log_attack
+    if log_attack is None:
+        from database import log_attack
+
+def load_detector():
+    """
+    Import scapy and load the model, encoders and scaler. Safe to call from
+    several threads; only the first call does the work (a failed load is
+    retried on the next call). Returns True when a model is ready.
+    """
+    global detector, encoders, scaler
+    with _load_lock:
+        if model_status['state'] == 'ready':
+            return True
+        model_status.update(state='loading', error=None)
+        t0 = time.perf_counter()
+        load_scapy()
+        print("Loading IDPS Model...")
+        try:
+            # pandas/sklearn come in with preprocessing (and the pickles); keep them off the import path
+            from preprocessing import CompiledEncoder
+            if INFERENCE_BACKEND == 'numpy':
+                loaded = NumpyCNN.load(NUMPY_MODEL_PATH)
+            else:
+                from tensorflow.keras.models import load_model
+                loaded = load_model(MODEL_PATH)
+            with open(ENCODER_PATH, 'rb') as f:
+                encoders = pickle.load(f)
+            with open(SCALER_PATH, 'rb') as f:
+                scaler = pickle.load(f)
+            # Lookup tables + scaler arrays, built once for the live path
+            detector = (CompiledEncoder(encoders, scaler), loaded)
+            model_status['state'] = 'ready'
+            # Only a successful load moves the snapshot, so a failed reload is retried at each check
+            model_watcher.snapshot(_model_files())
+            if verdict_cache is not None:
+                # Verdicts of a previous model (if any) are no longer valid
+                verdict_cache.invalidate()
+            print(f"Model loaded successfully ({INFERENCE_BACKEND} backend).")
+        except Exception as e:
+            print(f"Error loading model: {e}. Ensure you have run 'python train_model.py' first.")
+            model_status.update(state='error', error=str(e))
+        model_status['load_seconds'] = time.perf_counter() - t0
+        return detector is not None
+
+def warm_up():
+    """Load the detector in a background thread so the first capture starts without delay."""
+    t = threading.Thread(target=load_detector, name="model-warmup")
+    t.daemon = True
+    t.start()
+    return t
+
+def reload_detector():
+    """Reload the model files in the background; the current model keeps scoring meanwhile."""
+    with _load_lock:
+        model_status['state'] = 'stale'
+    return warm_up()
+
+def get_model_status():
+    return dict(model_status)
 
 def block_ip(ip_address):
     """
@@ -58,8 +212,10 @@ def block_ip(ip_address):
     if ip_address in BLOCKED_IPS:
         return
     
-    print(f"!!! BLOCKING MALICIOUS IP: {ip_address} !!!")
-    BLOCKED_IPS.add(ip_address)
+    if VERBOSE_ALERTS:
+        print(f"!!! BLOCKING MALICIOUS IP: {ip_address} !!!")
+    BLOCKED_IPS.add(ip_address, ttl=BLOCK_TTL)
+    metrics.blocks.inc()
     
     if os.name == 'nt': # Windows
         cmd = f'netsh advfirewall firewall add rule name="IDPS_Block_{ip_address}" dir=in action=block remoteip={ip_address}'
@@ -74,179 +230,333 @@ def block_ip(ip_address):
     except Exception as e:
         print(f"Failed to execute block command: {e}")
 
-def extract_features(packet):
-    """
-    Map a Scapy packet to the 41 NSL-KDD features.
-    Note: Many flow-based features (count, serror_rate, etc.) are impossible 
-    to calculate on a single packet basis without state. 
-    We fill them with zeros or heuristic values for this demonstration.
-    """
-    features = {}
-    
-    # 1. Basic Header Features
+def packet_fields(packet):
+    """Header fields of a dissected scapy packet (rawparse.parse_frame reads the same from raw bytes)."""
+    ip_proto = None
     if IP in packet:
-        features['src_bytes'] = len(packet[IP].payload)
-        features['dst_bytes'] = 0 # Can't know response size yet
+        ip = packet[IP]
+        src, dst, ip_proto = ip.src, ip.dst, ip.proto
+        wrong_frag = is_wrong_fragment(int(ip.flags) & 0x1, ip.frag, len(ip.payload))
     else:
-        features['src_bytes'] = 0
-        features['dst_bytes'] = 0
+        src = dst = None
+        wrong_frag = False
 
+    sport = dport = 0
+    tcp_flags = 0
+    icmp_type = None
     if TCP in packet:
-        features['protocol_type'] = 'tcp'
-        features['service'] = 'http' # Simplified: mapping ports is complex, default to common
-        if packet[TCP].dport == 80: features['service'] = 'http'
-        elif packet[TCP].dport == 21: features['service'] = 'ftp'
-        elif packet[TCP].dport == 25: features['service'] = 'smtp'
-        
-        # Flags mapping simplified
-        flags = packet[TCP].flags
-        if 'S' in flags: features['flag'] = 'S0'
-        elif 'F' in flags: features['flag'] = 'SF'
-        else: features['flag'] = 'SF'
-        
+        proto = 'tcp'
+        sport, dport = packet[TCP].sport, packet[TCP].dport
+        tcp_flags = int(packet[TCP].flags)
+        payload_len = len(packet[TCP].payload)
     elif UDP in packet:
-        features['protocol_type'] = 'udp'
-        features['service'] = 'private'
-        features['flag'] = 'SF'
+        proto = 'udp'
+        sport, dport = packet[UDP].sport, packet[UDP].dport
+        payload_len = len(packet[UDP].payload)
     elif ICMP in packet:
-        features['protocol_type'] = 'icmp'
-        features['service'] = 'ecr_i'
-        features['flag'] = 'SF'
+        proto = 'icmp'
+        icmp_type = packet[ICMP].type
+        payload_len = len(packet[ICMP].payload)
     else:
-        features['protocol_type'] = 'tcp'
-        features['service'] = 'private'
-        features['flag'] = 'SF'
-
-    # 2. Fill missing features with defaults (0) as per KDD schema
-    COL_NAMES = ["duration","protocol_type","service","flag","src_bytes",
-    "dst_bytes","land","wrong_fragment","urgent","hot","num_failed_logins",
-    "logged_in","num_compromised","root_shell","su_attempted","num_root",
-    "num_file_creations","num_shells","num_access_files","num_outbound_cmds",
-    "is_host_login","is_guest_login","count","srv_count","serror_rate",
-    "srv_serror_rate","rerror_rate","srv_rerror_rate","same_srv_rate",
-    "diff_srv_rate","srv_diff_host_rate","dst_host_count","dst_host_srv_count",
-    "dst_host_same_srv_rate","dst_host_diff_srv_rate","dst_host_same_src_port_rate",
-    "dst_host_srv_diff_host_rate","dst_host_serror_rate","dst_host_srv_serror_rate",
-    "dst_host_rerror_rate","dst_host_srv_rerror_rate"]
-
-    row = []
-    for col in COL_NAMES:
-        if col in features:
-            val = features[col]
-        else:
-            val = 0 # Default for flow features
-        row.append(val)
-    
-    return [row]
+        proto = 'other'
+        payload_len = len(packet[IP].payload) if IP in packet else 0
 
-def predict_packet(packet):
-    if not model:
+    return PacketFields(float(packet.time), src, dst, proto, sport, dport, tcp_flags,
+                        payload_len, wrong_frag, icmp_type, ip_proto)
+
+def fields_features(f):
+    """NSL-KDD feature row for one packet's PacketFields (updates the FlowTable)."""
+    t0 = time.perf_counter()
+    row = flow_table.update(f.time, f.src, f.dst, f.proto, f.sport, f.dport,
+                            f.tcp_flags, f.payload_len, f.wrong_frag, f.icmp_type)
+    metrics.stage_features.observe(time.perf_counter() - t0)
+    return row
+
+def extract_features(packet):
+    """
+    Map a Scapy packet to the 41 NSL-KDD features.
+    Connection and window features (duration, bytes, count, serror_rate,
+    dst_host_*, ...) come from the shared FlowTable, which keeps the
+    2-second and last-100-connection statistics incrementally.
+    """
+    return [fields_features(packet_fields(packet))]
+
+def _predict_uncached(rows):
+    encoder, model = detector
+    t0 = time.perf_counter()
+    X = encoder.transform_rows(rows)
+    t1 = time.perf_counter()
+    prediction = model.predict_on_batch(X)
+    metrics.stage_preprocess.observe(t1 - t0)
+    metrics.stage_inference.observe(time.perf_counter() - t1)
+    return np.asarray(prediction).reshape(-1)
+
+def predict_rows(rows):
+    """
+    Score a batch of raw feature rows (as produced by extract_features) with
+    one forward pass over the rows missing from the verdict cache (all of
+    them when it is off), first starting a reload if the model files changed.
+    Returns a 1-D array of attack confidences.
+    """
+    # Retried after a failed load too (e.g. a file caught half-written), until one succeeds
+    if model_status['state'] in ('ready', 'error') and model_watcher.changed():
+        print("[*] Model files changed on disk; reloading detector...")
+        reload_detector()
+    if verdict_cache is None:
+        return _predict_uncached(rows)
+    return np.asarray(verdict_cache.score(rows, _predict_uncached))
+
+def predict_fields(fields):
+    if detector is None:
         return 0
-        
+
     # Extract features
-    raw_row = extract_features(packet)
-    
-    # Needs to match dataframe columns structure for preprocessing
-    # We reconstruct a DataFrame to reuse preprocess_data logic
-    import pandas as pd
-    COL_NAMES = ["duration","protocol_type","service","flag","src_bytes",
-        "dst_bytes","land","wrong_fragment","urgent","hot","num_failed_logins",
-        "logged_in","num_compromised","root_shell","su_attempted","num_root",
-        "num_file_creations","num_shells","num_access_files","num_outbound_cmds",
-        "is_host_login","is_guest_login","count","srv_count","serror_rate",
-        "srv_serror_rate","rerror_rate","srv_rerror_rate","same_srv_rate",
-        "diff_srv_rate","srv_diff_host_rate","dst_host_count","dst_host_srv_count",
-        "dst_host_same_srv_rate","dst_host_diff_srv_rate","dst_host_same_src_port_rate",
-        "dst_host_srv_diff_host_rate","dst_host_serror_rate","dst_host_srv_serror_rate",
-        "dst_host_rerror_rate","dst_host_srv_rerror_rate"] # No label here
-        
-    # Add dummy label col for compatibility with preprocessing func if needed, 
-    # but preprocess_data expects 'label' to drop it.
-    df = pd.DataFrame(raw_row, columns=COL_NAMES)
-    df['label'] = 'normal' # Dummy
-    
-    # Preprocess
-    # Pass is_training=False to use loaded scalar/encoders
+    raw_row = [fields_features(fields)]
+
     try:
-        X, _ = preprocess_data(df, is_training=False)
-        prediction = model.predict(X, verbose=0)
-        return prediction[0][0]
+        return predict_rows(raw_row)[0]
     except Exception as e:
         print(f"Prediction error: {e}")
         return 0
 
-def packet_callback(packet):
-    if IP in packet:
-        src_ip = packet[IP].src
-        dst_ip = packet[IP].dst
-        if TCP in packet: proto = 'TCP'
-        elif UDP in packet: proto = 'UDP'
-        elif ICMP in packet: proto = 'ICMP'
-        else: proto = 'OTHER'
-
-        # Predict
-        confidence = predict_packet(packet)
-        
-        # Threshold for attack detection
-        if confidence > 0.5:
-            attack_type = "Malicious Traffic" # Multi-class would give specific name
-            action = "Blocked"
+def predict_packet(packet):
+    return predict_fields(packet_fields(packet))
+
+def score_batch(rows):
+    if detector is None:
+        return [0] * len(rows)
+    return predict_rows(rows)
+
+def handle_verdict(src_ip, dst_ip, proto, confidence):
+    if capture_queue is not None and confidence > SUSPICIOUS_CONFIDENCE:
+        capture_queue.mark_suspicious(src_ip)
+    # Threshold for attack detection
+    if confidence > 0.5:
+        attack_type = "Malicious Traffic" # Multi-class would give specific name
+        action = "Blocked"
+        metrics.alerts.inc()
+        if log_attack is None:
+            load_database()
+        # Repeats within the alert window only update the existing alert
+        if log_attack(src_ip, dst_ip, proto, attack_type, confidence, action) and VERBOSE_ALERTS:
             print(f"[ALERT] Attack detected from {src_ip} -> {dst_ip} ({confidence:.2f})")
-            log_attack(src_ip, dst_ip, proto, attack_type, confidence, action)
-            block_ip(src_ip)
-        else:
-            # print(f"Normal packet: {src_ip}")
-            pass
+        block_ip(src_ip)
+
+def _batch_verdict(meta, confidence):
+    src_ip, dst_ip, proto = meta
+    handle_verdict(src_ip, dst_ip, proto, confidence)
+
+def start_inference_worker(batch_size=BATCH_SIZE, batch_deadline_ms=BATCH_DEADLINE_MS, max_queue=None):
+    """Start (or restart with new settings) the micro-batching inference worker."""
+    global inference_worker
+    if inference_worker is not None:
+        inference_worker.stop()
+    inference_worker = BatchInferenceWorker(score_batch, _batch_verdict,
+                                            batch_size=batch_size,
+                                            deadline_ms=batch_deadline_ms,
+                                            max_queue=max_queue)
+    inference_worker.start()
+    return inference_worker
+
+def stop_inference_worker():
+    if inference_worker is not None:
+        inference_worker.stop()
+
+def start_capture_queue(size=None, policy=None):
+    """Start (or restart) the capture queue; size 0 leaves analysis inline."""
+    global capture_queue
+    stop_capture_queue()
+    size = CAPTURE_QUEUE_SIZE if size is None else size
+    if size <= 0:
+        capture_queue = None
+        return None
+    capture_queue = CaptureQueue(size, policy or SHED_POLICY, skip=BLOCKED_IPS.__contains__)
+    return capture_queue.start()
+
+def stop_capture_queue():
+    if capture_queue is not None:
+        capture_queue.stop()
+
+def get_capture_queue_stats():
+    if capture_queue is None:
+        return None
+    return capture_queue.stats()
+
+def get_cache_stats():
+    if verdict_cache is None:
+        return None
+    return verdict_cache.stats()
+
+def get_inference_stats():
+    if inference_worker is None:
+        return {'running': False}
+    return inference_worker.stats()
+
+def packet_meta(packet):
+    """(src_ip, dst_ip, proto) for an IP packet, or None for anything else."""
+    if IP not in packet:
+        return None
+    if TCP in packet: proto = 'TCP'
+    elif UDP in packet: proto = 'UDP'
+    elif ICMP in packet: proto = 'ICMP'
+    else: proto = 'OTHER'
+    return packet[IP].src, packet[IP].dst, proto
+
+def load_blocklist(path=BLOCKLIST_FILE):
+    if path and os.path.exists(path):
+        n = BLOCKED_IPS.load_file(path)
+        print(f"[*] Loaded {n} blocklist entries from {path}")
+
+def get_blocklist_stats():
+    return {**BLOCKED_IPS.stats(), 'dropped_packets': blocked_packets}
+
+def packet_callback(packet):
+    global blocked_packets
+    if IP not in packet:
+        return
+    metrics.packets.inc()
+    # Fast path: traffic from sources we already blocked is dropped unscored
+    src = packet[IP].src
+    if src in BLOCKED_IPS:
+        blocked_packets += 1
+        return
+    # Fields are read here, in the capture thread, as rawparse does for raw
+    # frames: the queue then holds small tuples instead of scapy packets,
+    # and the parse stage is recorded by one thread only
+    t0 = time.perf_counter()
+    fields = packet_fields(packet)
+    metrics.stage_parse.observe(time.perf_counter() - t0)
+    if capture_queue is not None and capture_queue.is_alive():
+        capture_queue.put(src, analyze_fields, fields)
+        return
+    analyze_fields(fields)
+
+def fields_callback(fields):
+    """packet_callback for a frame already parsed by rawparse."""
+    global blocked_packets
+    metrics.packets.inc()
+    if fields.src in BLOCKED_IPS:
+        blocked_packets += 1
+        return
+    if capture_queue is not None and capture_queue.is_alive():
+        capture_queue.put(fields.src, analyze_fields, fields)
+        return
+    analyze_fields(fields)
 
-def simulation_mode_sniffer():
+def analyze_fields(fields):
+    meta = (fields.src, fields.dst, PROTO_LABELS[fields.proto])
+
+    # Hand off to the batching worker; verdicts come back via handle_verdict
+    if inference_worker is not None and inference_worker.is_alive():
+        # Behind the capture queue, wait for room so overload is shed there, by policy
+        timeout = INFERENCE_SUBMIT_TIMEOUT if capture_queue is not None and capture_queue.is_alive() else None
+        inference_worker.submit(fields_features(fields), meta, timeout)
+        return
+
+    # Predict inline
+    confidence = predict_fields(fields)
+    handle_verdict(*meta, confidence)
+
+def raw_sniff(sock, handle_frame):
     """
-    Fallback mode for Windows systems without Npcap.
-    Monitors a signal file to detect when 'attack_simulation.py' is run,
-    and forwards that to the ML model.
+    Pass every frame on a capture socket to handle_frame(frame, ts) as a
+    memoryview of a reused buffer, with no scapy dissection.
     """
-    print("[*] Sniffer running in SIMULATION/COMPATIBILITY mode.")
-    print("[*] Waiting for traffic from attack_simulation.py...")
-    
-    SIGNAL_FILE = os.path.join(os.path.dirname(__file__), 'attack_signal.txt')
-    
+    buf = bytearray(RAW_BUFFER_SIZE)
+    view = memoryview(buf)
+    recv_into = sock.ins.recv_into
+    now = time.time
     while running:
-        # 1. Check for explicit attack signals from simulation script
-        if os.path.exists(SIGNAL_FILE):
+        n = recv_into(buf)
+        handle_frame(view[:n], now())
+
+def raw_capture_supported(sock):
+    """True if raw_sniff() can read `sock` (a Linux AF_PACKET socket on an Ethernet link)."""
+    ins = getattr(sock, 'ins', None)
+    return (RAW_CAPTURE and isinstance(ins, socket.socket)
+            and ins.family == getattr(socket, 'AF_PACKET', None) and getattr(sock, 'LL', None) is Ether)
+
+def frame_callback(frame, ts):
+    """raw_sniff() handler: rawparse for the common case, scapy for everything else."""
+    t0 = time.perf_counter()
+    try:
+        fields = parse_frame(frame, ts, LINKTYPE_ETHERNET)
+    except Unsupported:
+        packet = Ether(bytes(frame))
+        packet.time = ts
+        if capture_config is None or capture_config.kernel_filter or capture_config.accept(packet):
+            packet_callback(packet)
+        return
+    metrics.stage_parse.observe(time.perf_counter() - t0)
+    if fields is None:
+        return
+    if capture_config is None or capture_config.kernel_filter or capture_config.accept_fields(fields):
+        fields_callback(fields)
+
+def simulation_mode_sniffer(address=SIM_FEED):
+    """
+    Fallback when live capture is unavailable (e.g. Windows without Npcap).
+    Frames arrive on a local UDP socket, one per datagram, from
+    traffic_gen.py or attack_simulation.py, and go through frame_callback
+    like captured ones. While the feed is idle a little normal traffic is
+    generated here so the dashboard has something to show.
+    """
+    print("[*] Sniffer running in SIMULATION/COMPATIBILITY mode.")
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SIM_FEED_BUFFER)
+        sock.bind(parse_address(address))
+    except OSError as e:
+        print(f"[!] Cannot listen for simulated traffic on {address}: {e}")
+        sock.close()
+        return
+    sock.settimeout(SIM_IDLE_INTERVAL)
+    print(f"[*] Waiting for traffic from attack_simulation.py / traffic_gen.py on {address}...")
+
+    background = TrafficGenerator('normal=1', seed=int(time.time())).frames()
+    buf = bytearray(RAW_BUFFER_SIZE)
+    view = memoryview(buf)
+    recv_into = sock.recv_into
+    now = time.time
+    try:
+        while running:
             try:
-                with open(SIGNAL_FILE, 'r') as f:
-                    attack_type = f.read().strip()
-                
-                print(f"[!] Signal received: {attack_type}")
-                
-                # Create a mock packet based on the signal
-                if attack_type == 'DoS':
-                    # Simulated SYN Flood packet
-                    pkt = IP(src="192.168.1.100", dst="127.0.0.1")/TCP(dport=80, flags='S')
-                elif attack_type == 'PortScan':
-                    # Simulated Port Scan packet
-                    pkt = IP(src="192.168.1.101", dst="127.0.0.1")/TCP(dport=random.choice([21,22,80,443]), flags='S')
-                else:
-                    pkt = IP(src="192.168.1.200", dst="127.0.0.1")/TCP(dport=80, flags='PA')
-
-                # Process it through the ML pipeline
-                packet_callback(pkt)
-                
-                # Remove signal
-                os.remove(SIGNAL_FILE)
-            except Exception as e:
-                print(f"Error reading signal: {e}")
-        
-        # 2. Simulate random background 'Normal' traffic
-        else:
-            if random.random() < 0.2: # 20% chance every loop
-                # Normal HTTP traffic
-                pkt = IP(src=f"192.168.1.{random.randint(50,200)}", dst="127.0.0.1")/TCP(dport=80, flags='PA')
-                packet_callback(pkt)
+                n = recv_into(buf)
+            except socket.timeout:
+                if random.random() < 0.2:
+                    frame_callback(next(background)[2], now())
+                continue
+            frame_callback(view[:n], now())
+    finally:
+        sock.close()
 
-        time.sleep(0.5)
+def open_capture(interface=None, capture=None):
+    """Socket for sniff(opened_socket=...) plus its lfilter (None when the kernel filters)."""
+    global capture_config
+    load_scapy()
+    capture_config = capture or CaptureConfig()
+    sock = capture_config.open_socket(interface)
+    return sock, capture_config.lfilter()
 
-def start_sniffer(interface=None):
+def get_capture_stats():
+    if capture_config is None:
+        return None
+    return capture_config.stats()
+
+def start_sniffer(interface=None, batch_size=BATCH_SIZE, batch_deadline_ms=BATCH_DEADLINE_MS,
+                  workers=None, capture=None):
     print(f"[*] Starting Sniffer...")
+    workers = CAPTURE_WORKERS if workers is None else workers
+    load_blocklist()
+    if workers > 1:
+        start_sharded_sniffer(workers, batch_size, interface, capture)
+        return
+    # Blocks until the model is ready (returns at once if warm_up() already finished)
+    load_detector()
+    # Behind the capture queue a short inference queue is enough: the backlog waits there, shed by policy
+    start_inference_worker(batch_size, batch_deadline_ms,
+                           max_queue=batch_size * INFERENCE_QUEUE_BATCHES if CAPTURE_QUEUE_SIZE > 0 else None)
+    start_capture_queue()
     
     try:
         # Try real sniffing first
@@ -257,7 +567,12 @@ def start_sniffer(interface=None):
             # Windows compatibility check
             print("[*] Attempting to bind to Scapy interface...")
         
-        sniff(prn=packet_callback, filter="ip", store=0, count=0)
+        sock, lfilter = open_capture(interface, capture)
+        if raw_capture_supported(sock):
+            print("[*] Raw capture: parsing headers without scapy dissection")
+            raw_sniff(sock, frame_callback)
+        else:
+            sniff(opened_socket=sock, prn=packet_callback, lfilter=lfilter, store=0, count=0)
         
     except Exception as e:
         print(f"\n[!] SCAPY SNIFFER ERROR: {e}")
@@ -265,6 +580,57 @@ def start_sniffer(interface=None):
         print("[*] Switching to FAULT-TOLERANT SIMULATION MODE so you can still demo the project.")
         simulation_mode_sniffer()
 
+sharded_sniffer = None
+
+def start_sharded_sniffer(workers, batch_size=BATCH_SIZE, interface=None, capture=None):
+    """Capture in this thread; analysis runs in `workers` processes, sharded by flow."""
+    global sharded_sniffer
+    from sharding import ShardedSniffer
+    load_scapy() # The model itself is loaded by each worker process
+    sharded_sniffer = ShardedSniffer(workers=workers, batch_size=batch_size).start()
+    try:
+        sock, lfilter = open_capture(interface, capture)
+        if raw_capture_supported(sock):
+            raw_sniff(sock, sharded_sniffer.dispatch_frame)
+        else:
+            sniff(opened_socket=sock, prn=sharded_sniffer.dispatch, lfilter=lfilter, store=0, count=0)
+    finally:
+        sharded_sniffer.stop()
+
+def get_sharding_stats():
+    if sharded_sniffer is None:
+        return None
+    return sharded_sniffer.stats()
+
+@metrics.register_collector
+def _pipeline_metrics():
+    """Counters the pipeline components already keep, read at scrape time."""
+    yield 'model_ready', 'gauge', 'Whether the detector is loaded.', model_status['state'] == 'ready'
+    yield 'packets_blocked_total', 'counter', 'Packets from blocked sources dropped before analysis.', blocked_packets
+    blocklist = BLOCKED_IPS.stats()
+    yield 'blocklist_entries', 'gauge', 'Blocked hosts and prefixes.', blocklist['hosts'], {'kind': 'host'}
+    yield 'blocklist_entries', 'gauge', 'Blocked hosts and prefixes.', blocklist['prefixes'], {'kind': 'prefix'}
+    if inference_worker is not None:
+        s = inference_worker.stats()
+        yield 'inference_queue_depth', 'gauge', 'Feature rows waiting for the inference worker.', s['queue_depth']
+        yield 'inference_dropped_total', 'counter', 'Rows dropped because the inference queue was full.', s['dropped']
+        yield 'inference_batches_total', 'counter', 'Forward passes run by the inference worker.', s['batches']
+        yield 'inference_rows_total', 'counter', 'Rows scored by the inference worker.', s['rows']
+    if verdict_cache is not None:
+        s = verdict_cache.stats()
+        yield 'verdict_cache_hits_total', 'counter', 'Verdict cache hits.', s['hits']
+        yield 'verdict_cache_misses_total', 'counter', 'Verdict cache misses.', s['misses']
+        yield 'verdict_cache_entries', 'gauge', 'Verdicts held in the cache.', s['size']
+    if capture_queue is not None:
+        s = capture_queue.stats()
+        yield 'capture_queue_depth', 'gauge', 'Packets waiting between capture and analysis.', s['depth']
+        for reason, n in s['shed'].items():
+            yield 'capture_queue_shed_total', 'counter', 'Packets shed by the capture queue, by reason.', n, {'reason': reason}
+    if capture_config is not None:
+        s = capture_config.stats()
+        yield 'capture_received_total', 'counter', 'Packets received by the capture socket.', s.get('received')
+        yield 'capture_kernel_dropped_total', 'counter', 'Packets the kernel dropped before capture.', s.get('kernel_dropped')
+
 if __name__ == "__main__":
     # If run standalone
     start_sniffer()
@@ -1,10 +1,43 @@
 let chartInstance = null;
+let pollTimer = null;
 
 document.addEventListener('DOMContentLoaded', () => {
     initChart();
-    setInterval(fetchStats, 2000); // Poll every 2 seconds
+    connectLiveFeed();
 });
 
+// Server pushes a snapshot on connect and then on every change.
+// Polling every 2 seconds is only used while the stream is unavailable.
+function connectLiveFeed() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    const source = new EventSource('/api/stream');
+    source.onmessage = (event) => {
+        stopPolling();
+        renderStats(JSON.parse(event.data));
+    };
+    source.onerror = () => {
+        // EventSource reconnects on its own; poll in the meantime
+        startPolling();
+    };
+}
+
+function startPolling() {
+    if (pollTimer === null) {
+        fetchStats();
+        pollTimer = setInterval(fetchStats, 2000);
+    }
+}
+
+function stopPolling() {
+    if (pollTimer !== null) {
+        clearInterval(pollTimer);
+        pollTimer = null;
+    }
+}
+
 function initChart() {
     const ctx = document.getElementById('attackChart').getContext('2d');
     console.log('Initializing chart...', ctx);
@@ -86,37 +119,103 @@ function resetThreats() {
 function fetchStats() {
     fetch('/api/stats')
         .then(res => res.json())
-        .then(data => {
-            // Update Status
-            const indicator = document.getElementById('status-indicator');
-            if (data.status === 'Active') {
-                indicator.className = 'status online';
-                indicator.textContent = 'SYSTEM ACTIVE';
-            } else {
-                indicator.className = 'status offline';
-                indicator.textContent = 'SYSTEM OFFLINE';
-            }
+        .then(renderStats);
+}
 
-            // Update Counts
-            document.getElementById('total-attacks').textContent = data.total_attacks;
-
-            // Calculate unique blocked IPs from recent logs
-            const uniqueIPs = new Set();
-            if (data.recent_logs && data.recent_logs.length > 0) {
-                data.recent_logs.forEach(log => {
-                    if (log.action && log.action.toLowerCase().includes('block')) {
-                        uniqueIPs.add(log.src_ip);
-                    }
-                });
-            }
-            document.getElementById('blocked-ips').textContent = uniqueIPs.size;
+function renderStats(data) {
+    // Update Status
+    const indicator = document.getElementById('status-indicator');
+    const modelState = data.model ? data.model.state : 'ready';
+    if (data.status === 'Active' && modelState === 'loading') {
+        indicator.className = 'status offline';
+        indicator.textContent = 'LOADING MODEL...';
+    } else if (data.status === 'Active') {
+        indicator.className = 'status online';
+        indicator.textContent = 'SYSTEM ACTIVE';
+    } else {
+        indicator.className = 'status offline';
+        indicator.textContent = 'SYSTEM OFFLINE';
+    }
+
+    // Update Counts
+    document.getElementById('total-attacks').textContent = data.total_attacks;
 
-            // Update Chart
-            updateChart(data.attack_types);
+    if (data.blocklist) {
+        document.getElementById('blocked-ips').textContent =
+            data.blocklist.hosts + data.blocklist.prefixes;
+    } else {
+        updateBlockedFromLogs(data.recent_logs);
+    }
+
+    // Update Chart
+    updateChart(data.attack_types);
+
+    // Update Table
+    updateTable(data.recent_logs);
+
+    updateMetrics(data);
+}
 
-            // Update Table
-            updateTable(data.recent_logs);
+function formatMicros(value) {
+    return value === null || value === undefined ? '-' : value.toFixed(1);
+}
+
+function formatPercent(value) {
+    return value === null || value === undefined ? '-' : (value * 100).toFixed(1) + '%';
+}
+
+function formatConfidence(log) {
+    // Aggregated alerts show the mean and the peak confidence of their packets
+    if (log.packet_count > 1) {
+        return `${formatPercent(log.mean_confidence)}, max ${formatPercent(log.max_confidence)}`;
+    }
+    return formatPercent(log.confidence);
+}
+
+function updateMetrics(data) {
+    const m = data.metrics;
+    if (!m) return;
+
+    document.getElementById('m-packets-rate').textContent = m.packets_per_s;
+    document.getElementById('m-alerts-rate').textContent = m.alerts_per_s;
+    document.getElementById('m-blocks-rate').textContent = m.blocks_per_s;
+
+    const captureQueue = data.capture_queue || {};
+    const inference = data.inference || {};
+    const writer = data.alert_writer || {};
+    document.getElementById('m-queue').textContent =
+        (captureQueue.depth || 0) + ' / ' + (inference.queue_depth || 0) + ' / ' + (writer.pending || 0);
+    document.getElementById('m-drops').textContent =
+        (captureQueue.shed_total || 0) + (inference.dropped || 0) + (writer.dropped || 0);
+    document.getElementById('m-cache').textContent = data.verdict_cache
+        ? (data.verdict_cache.hit_rate * 100).toFixed(1) + '%'
+        : '-';
+
+    const tbody = document.getElementById('metrics-body');
+    tbody.innerHTML = '';
+    m.latency.forEach(h => {
+        const tr = document.createElement('tr');
+        tr.innerHTML = `
+            <td>${h.stage}</td>
+            <td>${h.count}</td>
+            <td>${formatMicros(h.p50_us)}</td>
+            <td>${formatMicros(h.p99_us)}</td>
+        `;
+        tbody.appendChild(tr);
+    });
+}
+
+function updateBlockedFromLogs(logs) {
+    // Calculate unique blocked IPs from recent logs
+    const uniqueIPs = new Set();
+    if (logs && logs.length > 0) {
+        logs.forEach(log => {
+            if (log.action && log.action.toLowerCase().includes('block')) {
+                uniqueIPs.add(log.src_ip);
+            }
         });
+    }
+    document.getElementById('blocked-ips').textContent = uniqueIPs.size;
 }
 
 
@@ -157,11 +256,11 @@ function updateTable(logs) {
         const tr = document.createElement('tr');
         tr.className = 'log-alert';
         tr.innerHTML = `
-            <td>${log.timestamp}</td>
+            <td>${log.packet_count > 1 ? `${log.timestamp} - ${log.last_seen.slice(11)}` : log.timestamp}</td>
             <td>${log.src_ip}</td>
             <td>${log.dst_ip}</td>
             <td>${log.protocol}</td>
-            <td>${log.type} (${(Math.random() * 20 + 80).toFixed(1)}%)</td>
+            <td>${log.type} (${formatConfidence(log)})${log.packet_count > 1 ? ` x${log.packet_count}` : ''}</td>
             <td style="color:red">[BLOCKED]</td>
         `;
         tbody.appendChild(tr);
@@ -0,0 +1,315 @@
+"""
+Hyperparameter sweep for train_model.build_cnn_model.
+
+Samples configurations (conv filter counts, dense sizes, batch size,
+learning rate; the current defaults are always trial 0) and trains them
+with successive halving: every trial gets a small epoch budget, then
+only the best 1/eta by validation accuracy - plus any trial on the
+accuracy/latency Pareto front of that rung, so small fast models are not
+cut for being a little less accurate early on - continue to the next,
+larger budget. A trial resumes from its saved model, it is not retrained.
+
+Trials run in parallel worker processes on the CPU. Each worker is
+pinned to its own cores (sched_setaffinity where available) and its
+TensorFlow/BLAS thread pools are sized to them, so trials do not compete
+for cores and latency measurements stay comparable. The training data is
+the feature cache entry of train_model.py (memory-mapped, shared by all
+workers).
+
+Every trial records its validation accuracy, parameter count and
+inference latency of the NumPy backend (us/row for a single row and for
+a batch of inference.BATCH_SIZE rows). The report lists the trials and
+marks the accuracy/latency Pareto front; --budget-us picks the most
+accurate model within a per-row latency budget.
+
+    python sweep.py --trials 27 --workers 4
+    python sweep.py --trials 12 --max-epochs 6 --max-rows 50000 --budget-us 40
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+try:
+    import preprocessing
+    from inference import BATCH_SIZE as INFERENCE_BATCH
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import preprocessing
+    from inference import BATCH_SIZE as INFERENCE_BATCH
+
+SWEEP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model', 'sweep')
+SEARCH_SPACE = {
+    'filters': [(16, 32), (32, 64), (64, 128), (32, 32), (16, 16)],
+    'dense_units': [(32, 16), (64, 32), (128, 64), (64,)],
+    'batch_size': [32, 64, 128, 256],
+    'learning_rate': [3e-4, 1e-3, 3e-3],
+}
+DEFAULT_CONFIG = {'filters': (64, 128), 'dense_units': (128, 64), 'batch_size': 32, 'learning_rate': 1e-3}
+ETA = 3
+MIN_EPOCHS = 1
+LATENCY_REPEAT = 200
+
+# Per-process state of a sweep worker (set by _init_worker)
+_worker = {}
+
+
+def sample_configs(n, seed=0):
+    """The default configuration plus n - 1 distinct random ones."""
+    rnd = random.Random(seed)
+    configs = [dict(DEFAULT_CONFIG)]
+    seen = {json.dumps(DEFAULT_CONFIG, sort_keys=True)}
+    space = math.prod(len(v) for v in SEARCH_SPACE.values())
+    while len(configs) < min(n, space):
+        config = {k: rnd.choice(v) for k, v in SEARCH_SPACE.items()}
+        key = json.dumps(config, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def rung_budgets(max_epochs, min_epochs=MIN_EPOCHS, eta=ETA):
+    """Cumulative epoch budgets of the rungs, e.g. [1, 3, 9, 10] for 10 epochs."""
+    budgets = []
+    b = min_epochs
+    while b < max_epochs:
+        budgets.append(b)
+        b *= eta
+    budgets.append(max_epochs)
+    return budgets
+
+
+def pareto_front(trials):
+    """Ids of trials no other trial beats on both accuracy (higher) and latency (lower)."""
+    front = []
+    for t in trials:
+        dominated = any(o['val_accuracy'] >= t['val_accuracy'] and o['latency_us'] <= t['latency_us']
+                        and (o['val_accuracy'] > t['val_accuracy'] or o['latency_us'] < t['latency_us'])
+                        for o in trials)
+        if not dominated:
+            front.append(t['id'])
+    return front
+
+
+def core_sets(workers, threads):
+    """CPU sets to pin each worker to (None where affinity is not supported)."""
+    if not hasattr(os, 'sched_getaffinity'):
+        return [None] * workers
+    cpus = sorted(os.sched_getaffinity(0))
+    sets = []
+    for w in range(workers):
+        chunk = [cpus[(w * threads + i) % len(cpus)] for i in range(threads)]
+        sets.append(sorted(set(chunk)))
+    return sets
+
+
+def _init_worker(cores_queue, threads, data_paths):
+    cores = cores_queue.get()
+    if cores is not None:
+        os.sched_setaffinity(0, cores)
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    _worker['data'] = {name: np.load(path, mmap_mode='r') for name, path in data_paths.items()}
+    _worker['cores'] = cores
+
+
+def measure_latency(model, X, path):
+    """NumPy-backend latency in us/row: one row per call, and INFERENCE_BATCH rows per call."""
+    from numpy_model import NumpyCNN, export_model
+    export_model(model, path)
+    engine = NumpyCNN.load(path)
+    one = np.ascontiguousarray(X[:1], dtype=np.float32)
+    batch = np.ascontiguousarray(X[:INFERENCE_BATCH], dtype=np.float32)
+    engine.predict(batch) # warm-up
+    t0 = time.perf_counter()
+    for _ in range(LATENCY_REPEAT):
+        engine.predict(one)
+    single = (time.perf_counter() - t0) / LATENCY_REPEAT * 1e6
+    t0 = time.perf_counter()
+    for _ in range(LATENCY_REPEAT // 10):
+        engine.predict(batch)
+    batched = (time.perf_counter() - t0) / (LATENCY_REPEAT // 10) / len(batch) * 1e6
+    return single, batched
+
+
+def run_rung(job):
+    """Train one trial from its saved state (if any) up to `epochs`; returns its updated record."""
+    trial, epochs, out_dir = job
+    import tensorflow as tf
+    from train_model import build_cnn_model
+    data = _worker['data']
+    config = trial['config']
+    model_path = os.path.join(out_dir, f"trial_{trial['id']:03d}.keras")
+    t0 = time.perf_counter()
+    if trial['epochs']:
+        model = tf.keras.models.load_model(model_path)
+    else:
+        model = build_cnn_model((data['X_train'].shape[1], 1), filters=tuple(config['filters']),
+                                dense_units=tuple(config['dense_units']),
+                                learning_rate=config['learning_rate'])
+    history = model.fit(data['X_train'], data['y_train'], batch_size=config['batch_size'],
+                        epochs=epochs, initial_epoch=trial['epochs'],
+                        validation_data=(data['X_val'], data['y_val']), verbose=0)
+    model.save(model_path)
+    trial = dict(trial)
+    trial['epochs'] = epochs
+    trial['val_accuracy'] = float(history.history['val_accuracy'][-1])
+    trial['val_loss'] = float(history.history['val_loss'][-1])
+    trial['train_seconds'] = trial.get('train_seconds', 0.0) + time.perf_counter() - t0
+    trial['model_path'] = model_path
+    trial['cores'] = _worker['cores']
+    if 'params' not in trial:
+        trial['params'] = int(model.count_params())
+        npz = os.path.join(out_dir, f"trial_{trial['id']:03d}.npz")
+        trial['latency_us'], trial['batch_latency_us'] = measure_latency(model, data['X_val'], npz)
+    return trial
+
+
+def prepare_data(data_file, out_dir, max_rows=None):
+    """Paths of the X/y train/val .npy files the workers map, via train_model's feature cache."""
+    # Encoders/scaler fitted here go to the sweep directory, not over the deployed model's
+    preprocessing.MODEL_PATH = out_dir
+    preprocessing.ENCODER_PATH = os.path.join(out_dir, 'encoders.pkl')
+    preprocessing.SCALER_PATH = os.path.join(out_dir, 'scaler.pkl')
+    from train_model import load_training_arrays
+    from feature_cache import ARRAYS
+    path = preprocessing.resolve_data_path(data_file)
+    X_train, X_val, y_train, y_val, state = load_training_arrays(path)
+    if state == 'miss':
+        X_train, X_val, y_train, y_val, state = load_training_arrays(path) # now memory-mapped
+    arrays = {'X_train': X_train, 'y_train': y_train, 'X_val': X_val, 'y_val': y_val}
+    if state == 'hit' and not max_rows:
+        return {name: arrays[name].filename for name in ARRAYS}
+    # A subset, or no cache entry (write failed): the workers map a copy in the sweep directory
+    paths = {}
+    for name in ARRAYS:
+        a = arrays[name]
+        if max_rows:
+            # Both splits are already shuffled; validation keeps the 80/20 proportion
+            a = a[:max_rows if name.endswith('train') else max(1, max_rows // 4)]
+        paths[name] = os.path.join(out_dir, name + '.npy')
+        np.save(paths[name], a)
+    return paths
+
+
+def run_sweep(data_file='KDDTrain+.txt', trials=27, workers=None, threads=1, max_epochs=None,
+              eta=ETA, max_rows=None, out_dir=SWEEP_DIR, seed=0):
+    """Run the sweep and return the report (also written to out_dir/sweep.json)."""
+    from train_model import EPOCHS
+    max_epochs = max_epochs or EPOCHS
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    os.makedirs(out_dir, exist_ok=True)
+    data_paths = prepare_data(data_file, out_dir, max_rows)
+
+    records = [{'id': i, 'config': c, 'epochs': 0} for i, c in enumerate(sample_configs(trials, seed))]
+    budgets = rung_budgets(max_epochs, eta=eta)
+    print(f"[*] {len(records)} trials, rungs at {budgets} epochs, {workers} worker(s) x {threads} thread(s)")
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    if workers * threads > cpus:
+        print(f"[!] {workers} x {threads} threads on {cpus} core(s): trials share cores, latencies will be inflated")
+
+    ctx = multiprocessing.get_context('spawn') # TensorFlow does not survive fork()
+    cores_queue = ctx.Queue()
+    for cores in core_sets(workers, threads):
+        cores_queue.put(cores)
+    t0 = time.perf_counter()
+    active = list(range(len(records)))
+    rungs = []
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(cores_queue, threads, data_paths)) as pool:
+        for r, budget in enumerate(budgets):
+            jobs = [(records[i], budget, out_dir) for i in active]
+            for trial in pool.imap_unordered(run_rung, jobs):
+                records[trial['id']] = trial
+                print(f"    rung {r} trial {trial['id']:3d}: {trial['epochs']} epochs, "
+                      f"val_accuracy {trial['val_accuracy']:.4f}, {trial['latency_us']:.1f} us/row")
+            rung = [records[i] for i in active]
+            rungs.append({'epochs': budget, 'trials': active})
+            if r == len(budgets) - 1:
+                break
+            keep = max(1, math.ceil(len(active) / eta))
+            best = sorted(rung, key=lambda t: -t['val_accuracy'])[:keep]
+            promoted = {t['id'] for t in best} | set(pareto_front(rung))
+            print(f"[*] Rung {r} ({budget} epochs): {len(promoted)} of {len(active)} trials continue")
+            active = sorted(promoted)
+
+    front = pareto_front(records)
+    report = {
+        'data': data_file,
+        'max_rows': max_rows,
+        'elapsed_s': time.perf_counter() - t0,
+        'workers': workers,
+        'threads_per_trial': threads,
+        'eta': eta,
+        'rungs': rungs,
+        'pareto_front': front,
+        'trials': records,
+    }
+    with open(os.path.join(out_dir, 'sweep.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def best_within(report, budget_us):
+    """Most accurate trial whose single-row latency fits the budget, or None."""
+    fits = [t for t in report['trials'] if t['latency_us'] <= budget_us]
+    return max(fits, key=lambda t: t['val_accuracy']) if fits else None
+
+
+def print_report(report, budget_us=None):
+    front = set(report['pareto_front'])
+    print(f"\n=== Sweep: {len(report['trials'])} trials in {report['elapsed_s']:.0f} s "
+          f"({report['workers']} worker(s) x {report['threads_per_trial']} thread(s)) ===")
+    print(f"{'id':>4}{'filters':>11}{'dense':>10}{'batch':>7}{'lr':>8}{'epochs':>8}{'val_acc':>9}"
+          f"{'params':>9}{'us/row':>8}{'us/row@' + str(INFERENCE_BATCH):>12}  pareto")
+    for t in sorted(report['trials'], key=lambda t: (-t['epochs'], -t['val_accuracy'])):
+        c = t['config']
+        print(f"{t['id']:>4}{'/'.join(map(str, c['filters'])):>11}{'/'.join(map(str, c['dense_units'])):>10}"
+              f"{c['batch_size']:>7}{c['learning_rate']:>8.0e}{t['epochs']:>8}{t['val_accuracy']:>9.4f}"
+              f"{t['params']:>9}{t['latency_us']:>8.1f}{t['batch_latency_us']:>12.2f}"
+              f"  {'*' if t['id'] in front else ''}")
+    print("\nPareto front (accuracy vs single-row latency), fastest first:")
+    for t in sorted((t for t in report['trials'] if t['id'] in front), key=lambda t: t['latency_us']):
+        print(f"  trial {t['id']:3d}: val_accuracy {t['val_accuracy']:.4f} after {t['epochs']} epochs, "
+              f"{t['latency_us']:.1f} us/row, {t['params']} params -> {t['model_path']}")
+    if budget_us is not None:
+        best = best_within(report, budget_us)
+        if best is None:
+            print(f"\n[!] No trial within {budget_us} us/row")
+        else:
+            print(f"\nBest within {budget_us} us/row: trial {best['id']} {best['config']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive-halving sweep over the CNN's hyperparameters.")
+    parser.add_argument('--data', default='KDDTrain+.txt', help='dataset file (in data/ or a path)')
+    parser.add_argument('--trials', type=int, default=27)
+    parser.add_argument('--workers', type=int, help='parallel trials (default: cores / threads)')
+    parser.add_argument('--threads', type=int, default=1, help='cores (and TF/BLAS threads) per trial')
+    parser.add_argument('--max-epochs', type=int, help='epoch budget of the last rung (default: EPOCHS)')
+    parser.add_argument('--eta', type=int, default=ETA, help='keep 1/eta of the trials at each rung')
+    parser.add_argument('--max-rows', type=int, help='train on at most this many rows (quick sweeps)')
+    parser.add_argument('--budget-us', type=float, help='per-row latency budget for the recommendation')
+    parser.add_argument('--out', default=SWEEP_DIR, help='trial models and sweep.json')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    report = run_sweep(args.data, args.trials, args.workers, args.threads, args.max_epochs,
+                       args.eta, args.max_rows, args.out, args.seed)
+    print_report(report, args.budget_us)
+    print(f"\nReport written to {os.path.join(args.out, 'sweep.json')}")
+
+
+if __name__ == '__main__':
+    main()
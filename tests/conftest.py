@@ -0,0 +1,13 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# database creates and opens IDPS_DB_PATH on import: keep it off the repo's idps.db
+_workdir = tempfile.mkdtemp(prefix='idps-tests-')
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ['IDPS_DB_PATH'] = os.path.join(_workdir, 'idps.db')
+os.environ.setdefault('IDPS_INFERENCE_BACKEND', 'numpy')
+os.environ.setdefault('IDPS_WARMUP', '0')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,142 @@
+"""
+Alert windows (AlertAggregator) and the alert writer, driven synchronously:
+the writer thread is not started and each test hands the queued items to
+AlertWriter._write itself, with an injected clock for the windows.
+"""
+import sqlite3
+
+import pytest
+
+import database
+
+KEY = ('10.66.0.1', '192.168.1.10', 'TCP', 'SYN Flood')
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def alerts(tmp_path, monkeypatch):
+    database.shutdown_writer()
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'alerts.db'))
+    monkeypatch.setattr(database, 'ALERT_WINDOW', 60.0)
+    clock = Clock()
+    aggregator = database.AlertAggregator(60.0, clock=clock)
+    writer = database.AlertWriter(retention_days=0)
+    monkeypatch.setattr(database, '_aggregator', aggregator)
+    monkeypatch.setattr(database, '_writer', writer)
+    monkeypatch.setattr(database, 'get_writer', lambda: writer)
+    database.init_db()
+    conn = sqlite3.connect(database.DB_PATH)
+    yield aggregator, writer, clock, conn
+    conn.close()
+
+
+def pending(writer):
+    items = []
+    while not writer.queue.empty():
+        items.append(writer.queue.get_nowait())
+    return items
+
+
+def write(writer, conn):
+    writer._write(conn, pending(writer))
+
+
+def add(aggregator, confidence=0.9, key=KEY):
+    return aggregator.add(*key, confidence, 'Blocked')
+
+
+def stored(conn):
+    return conn.execute('SELECT timestamp, last_seen, packet_count, max_confidence, mean_confidence '
+                        'FROM attacks ORDER BY id').fetchall()
+
+
+def test_window_opens_extends_and_expires(alerts):
+    aggregator, writer, clock, conn = alerts
+    start = clock.now
+    assert add(aggregator, 0.6)
+    clock.now += 10
+    assert not add(aggregator, 0.8)
+    clock.now += 49
+    assert not add(aggregator, 1.0)
+    write(writer, conn)
+    assert stored(conn) == [(database._format_time(start), database._format_time(start + 59), 3,
+                             1.0, pytest.approx(0.8))]
+
+    clock.now = start + 60 # the window is over: a new row
+    assert add(aggregator, 0.7)
+    write(writer, conn)
+    rows = stored(conn)
+    assert len(rows) == 2 and rows[1][2] == 1
+    total, types, recent, packets = database.get_live_snapshot(10)
+    assert (total, types, packets) == (2, {'SYN Flood': 2}, 4)
+    assert [r[9] for r in recent] == [1, 3]
+
+
+def test_one_pending_update_per_window(alerts):
+    aggregator, writer, clock, conn = alerts
+    add(aggregator)
+    assert writer.queue.qsize() == 1
+    write(writer, conn)
+
+    for _ in range(50):
+        clock.now += 0.1
+        add(aggregator)
+    add(aggregator, key=('10.66.0.2',) + KEY[1:])
+    # 50 alerts for the stored window are one queued update; the other key is one insert
+    assert writer.queue.qsize() == 2
+    write(writer, conn)
+    assert [r[2] for r in stored(conn)] == [51, 1]
+    assert (writer.written, writer.updated) == (2, 1)
+    assert database.get_live_snapshot(10)[3] == 52
+
+
+def test_failed_write_is_recovered_by_the_next_alert(alerts):
+    aggregator, writer, clock, conn = alerts
+    add(aggregator)
+    broken = sqlite3.connect(database.DB_PATH)
+    broken.close()
+    writer._write(broken, pending(writer)) # sqlite3.ProgrammingError, as a failed transaction would
+    assert writer.errors == 1 and writer.dropped == 1
+    assert stored(conn) == []
+
+    clock.now += 1
+    add(aggregator) # re-queued, still as an insert
+    assert writer.queue.qsize() == 1
+    write(writer, conn)
+    assert [r[2] for r in stored(conn)] == [2]
+    assert database.get_live_snapshot(10)[0] == 1
+
+
+def test_clear_all_logs_does_not_resurrect_alerts(alerts):
+    aggregator, writer, clock, conn = alerts
+    add(aggregator)
+    write(writer, conn)
+    window = next(iter(aggregator._windows.values()))
+
+    clock.now += 1
+    add(aggregator)
+    in_flight = pending(writer) # taken by the writer thread just before the reset
+    add(aggregator, key=('10.66.0.2',) + KEY[1:]) # still in the queue at the reset
+    database.clear_all_logs()
+    assert writer.queue.empty()
+    writer._write(conn, in_flight) # queued under the old epoch: not written
+
+    clock.now += 1
+    window.count += 1
+    writer.submit(window) # add() released its lock before the reset and submits after it
+    write(writer, conn)
+    assert stored(conn) == []
+    assert database.get_live_snapshot(10) == (0, {}, [], 0)
+
+    # The aggregator forgot its windows: the next alert opens a new row
+    assert add(aggregator)
+    write(writer, conn)
+    assert [r[2] for r in stored(conn)] == [1]
+    assert database.get_live_snapshot(10)[3] == 1
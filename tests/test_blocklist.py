@@ -0,0 +1,74 @@
+"""
+Blocklist matching against a brute-force reference under random adds,
+removals and TTL expiry, and trie cleanup once entries are gone.
+"""
+import ipaddress
+import random
+
+from blocklist import Blocklist
+
+BASES = (0x0A000000, 0x0A010000, 0xC0A80000)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def random_entry(rnd):
+    if rnd.random() < 0.3:
+        return str(ipaddress.IPv4Address(rnd.choice(BASES) | rnd.getrandbits(10)))
+    if rnd.random() < 0.1:
+        return str(ipaddress.ip_network(f"2001:db8::{rnd.getrandbits(16):x}/{rnd.randint(100, 128)}", strict=False))
+    plen = 0 if rnd.random() < 0.01 else rnd.randint(8, 32)
+    return str(ipaddress.ip_network((rnd.choice(BASES) | rnd.getrandbits(12), plen), strict=False))
+
+
+def test_matches_reference_and_prunes_the_trie():
+    rnd = random.Random(7)
+    clock = Clock()
+    blocklist = Blocklist(clock=clock)
+    reference = {} # network -> expiry
+    for _ in range(2000):
+        r = rnd.random()
+        entry = random_entry(rnd)
+        if r < 0.5:
+            # Re-adding an entry may shorten its TTL as well as extend it
+            ttl = None if rnd.random() < 0.4 else rnd.uniform(1, 50)
+            blocklist.add(entry, ttl)
+            reference[ipaddress.ip_network(entry)] = float('inf') if ttl is None else clock.now + ttl
+        elif r < 0.7:
+            blocklist.discard(entry)
+            reference.pop(ipaddress.ip_network(entry), None)
+        else:
+            clock.now += rnd.uniform(0, 3)
+        for _ in range(5):
+            ip = random_entry(rnd).split('/')[0]
+            addr = ipaddress.ip_address(ip)
+            expected = any(addr in net and exp > clock.now for net, exp in reference.items()
+                           if net.version == addr.version)
+            assert (ip in blocklist) == expected
+    assert len(blocklist) == sum(exp > clock.now for exp in reference.values())
+
+    for net in reference:
+        blocklist.discard(str(net))
+    assert len(blocklist) == 0
+    assert blocklist._roots == {4: [{}, None], 6: [{}, None]}
+    assert '10.0.0.1' not in blocklist
+
+
+def test_permanent_and_expiring_hosts():
+    clock = Clock()
+    blocklist = Blocklist(clock=clock)
+    blocklist.add('10.0.0.1')
+    blocklist.add('10.0.0.2', ttl=10)
+    blocklist.add('10.0.0.1', ttl=5) # a TTL replaces the permanent block
+    clock.now += 6
+    assert '10.0.0.1' not in blocklist and '10.0.0.2' in blocklist
+    blocklist.add('10.0.0.2') # and a permanent block replaces the TTL
+    clock.now += 60
+    assert '10.0.0.2' in blocklist
+    assert blocklist.export() == [('10.0.0.2', None)]
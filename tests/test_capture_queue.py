@@ -0,0 +1,106 @@
+"""
+CaptureQueue shedding and service order. Packets are put and taken
+directly (no analysis thread) except where the thread itself is tested.
+"""
+import pytest
+
+from capture_queue import CaptureQueue
+
+
+def handler(item):
+    pass
+
+
+def fill(q, packets):
+    """Put (src, item) pairs; returns how many were accepted."""
+    return sum(q.put(src, handler, item) for src, item in packets)
+
+
+def take_all(q):
+    with q._cond:
+        return [(src, item) for src, _, item in q._take(q.maxsize * 10)]
+
+
+def check_accounting(q, puts, taken):
+    # Every packet put is queued, taken or shed exactly once
+    stats = q.stats()
+    assert puts == stats['shed_total'] + stats['depth'] + taken
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        CaptureQueue(10, 'lifo')
+
+
+def test_drop_oldest_keeps_the_newest():
+    q = CaptureQueue(3, 'drop_oldest')
+    assert fill(q, [('a', i) for i in range(5)]) == 5
+    assert q.stats()['shed'] == {'oldest': 2}
+    assert take_all(q) == [('a', 2), ('a', 3), ('a', 4)]
+    check_accounting(q, 5, 3)
+
+
+def test_fair_share_sheds_the_flooder():
+    q = CaptureQueue(8, 'fair')
+    fill(q, [('flood', i) for i in range(8)])
+    # Each newcomer takes a slot from the longest queue (the flooder's oldest packet)
+    assert fill(q, [('b', 0), ('c', 0), ('b', 1)]) == 3
+    # Over its share (8 / 3 sources), the flooder's own arrivals are shed
+    assert not q.put('flood', handler, 8)
+    assert q.stats()['shed'] == {'over_share': 4}
+    assert q.stats()['sources_queued'] == 3
+    taken = take_all(q)
+    # Round-robin across sources, each source in arrival order
+    assert taken[:5] == [('flood', 3), ('b', 0), ('c', 0), ('flood', 4), ('b', 1)]
+    assert [i for s, i in taken if s == 'flood'] == [3, 4, 5, 6, 7]
+    check_accounting(q, 12, len(taken))
+
+
+def test_fair_ring_is_compacted_under_spoofed_sources():
+    q = CaptureQueue(4, 'fair')
+    # A spoofed-source flood: every packet is a new source, each evicting an older one
+    fill(q, [(f'10.0.{i // 256}.{i % 256}', i) for i in range(1000)])
+    assert len(q._ring) <= 4 * q.maxsize + 1
+    assert q.stats()['shed'] == {'over_share': 996}
+    assert [i for _, i in take_all(q)] == [996, 997, 998, 999]
+    assert not q._ring and not q._sources and not q._by_length
+    check_accounting(q, 1000, 4)
+
+
+def test_suspicious_first_serves_and_keeps_marked_sources():
+    q = CaptureQueue(4, 'suspicious_first')
+    q.mark_suspicious('bad')
+    fill(q, [('ok', i) for i in range(4)])
+    # A marked source's arrival displaces ordinary traffic
+    assert fill(q, [('bad', 0), ('bad', 1)]) == 2
+    assert q.stats()['shed'] == {'low_priority': 2}
+    fill(q, [('bad', 2), ('bad', 3)])
+    # Full of suspicious traffic: ordinary arrivals are shed, marked ones replace the oldest marked
+    assert not q.put('ok', handler, 9)
+    assert q.put('bad', handler, 4)
+    assert q.stats()['shed'] == {'low_priority': 5, 'oldest': 1}
+    assert take_all(q) == [('bad', 1), ('bad', 2), ('bad', 3), ('bad', 4)]
+    check_accounting(q, 10, 4)
+
+
+def test_suspicious_mark_expires():
+    now = [0.0]
+    q = CaptureQueue(4, 'suspicious_first', suspicious_ttl=10, clock=lambda: now[0])
+    q.mark_suspicious('bad')
+    assert q.is_suspicious('bad')
+    now[0] = 11
+    assert not q.is_suspicious('bad')
+
+
+def test_analysis_thread_skips_blocked_sources():
+    seen = []
+    q = CaptureQueue(100, 'fair', skip=lambda src: src == 'blocked')
+    for i in range(10):
+        q.put('blocked' if i % 2 else 'ok', seen.append, i)
+    q.start()
+    q.stop()
+    stats = q.stats()
+    assert sorted(seen) == [0, 2, 4, 6, 8]
+    assert (stats['processed'], stats['skipped_blocked'], stats['depth']) == (5, 5, 0)
+    assert not q.put('ok', seen.append, 10)
+    assert q.stats()['shed'] == {'stopping': 1}
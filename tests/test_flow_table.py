@@ -0,0 +1,82 @@
+"""
+FlowTable features on a short hand-built trace, checked against values
+worked out by hand from the NSL-KDD definitions.
+"""
+import pytest
+
+from flow_table import ACK, FEATURE_NAMES, RST, SYN, FlowTable
+
+A, B, V, W = '1.1.1.1', '2.2.2.2', '10.0.0.80', '10.0.0.81'
+
+
+def features(row, *names):
+    return {name: row[FEATURE_NAMES.index(name)] for name in names}
+
+
+def check(row, **expected):
+    got = features(row, *expected)
+    assert got == {k: pytest.approx(v) if isinstance(v, float) else v for k, v in expected.items()}
+
+
+def test_time_and_host_window_features():
+    t = FlowTable()
+    # c1: A -> V http, SYN only (S0: a SYN error)
+    row = t.update(0.0, A, V, 'tcp', 1000, 80, SYN)
+    check(row, service='http', flag='S0', count=1, srv_count=1, serror_rate=1.0, srv_serror_rate=1.0,
+          same_srv_rate=1.0, dst_host_count=1, dst_host_srv_count=1, dst_host_same_src_port_rate=1.0,
+          dst_host_serror_rate=1.0)
+
+    # SYN-ACK: c1 is established, its error is taken back out of every window
+    row = t.update(0.1, V, A, 'tcp', 80, 1000, SYN | ACK)
+    check(row, flag='SF', count=1, serror_rate=0.0, srv_serror_rate=0.0, dst_host_serror_rate=0.0)
+
+    # c2: A -> V ssh, answered with RST (REJ: a rejected connection)
+    row = t.update(0.5, A, V, 'tcp', 1001, 22, SYN)
+    check(row, service='ssh', flag='S0', count=2, srv_count=1, serror_rate=0.5, srv_serror_rate=1.0,
+          same_srv_rate=0.5, diff_srv_rate=0.5, srv_diff_host_rate=0.0,
+          dst_host_count=2, dst_host_srv_count=1, dst_host_same_srv_rate=0.5, dst_host_diff_srv_rate=0.5,
+          dst_host_same_src_port_rate=0.5, dst_host_serror_rate=0.5, dst_host_srv_serror_rate=1.0)
+    row = t.update(0.6, V, A, 'tcp', 22, 1001, RST | ACK)
+    check(row, flag='REJ', serror_rate=0.0, rerror_rate=0.5, srv_rerror_rate=1.0,
+          dst_host_rerror_rate=0.5, dst_host_srv_rerror_rate=1.0)
+
+    # c3: B -> V http, unanswered
+    row = t.update(1.0, B, V, 'tcp', 2000, 80, SYN)
+    check(row, count=3, srv_count=2, serror_rate=1 / 3, srv_serror_rate=0.5, rerror_rate=1 / 3,
+          srv_rerror_rate=0.0, same_srv_rate=2 / 3, diff_srv_rate=1 / 3, srv_diff_host_rate=0.0,
+          dst_host_count=3, dst_host_srv_count=2, dst_host_same_srv_rate=2 / 3,
+          dst_host_same_src_port_rate=1 / 3, dst_host_srv_diff_host_rate=0.0,
+          dst_host_serror_rate=1 / 3, dst_host_srv_serror_rate=0.5, dst_host_rerror_rate=1 / 3,
+          dst_host_srv_rerror_rate=0.0)
+
+    # c4: B -> W http, the same service on another host
+    row = t.update(1.2, B, W, 'tcp', 2001, 80, SYN)
+    check(row, count=1, srv_count=3, serror_rate=1.0, srv_serror_rate=2 / 3, same_srv_rate=1.0,
+          srv_diff_host_rate=2 / 3, dst_host_count=1, dst_host_srv_count=1,
+          dst_host_srv_diff_host_rate=2 / 3)
+
+    # c1 again at 2.6 s: c1 and c2 have left the 2-second window, c3 and c4 have not
+    row = t.update(2.6, A, V, 'tcp', 1000, 80, ACK, payload_len=100)
+    check(row, duration=2, flag='SF', src_bytes=100, count=1, srv_count=2, serror_rate=1.0,
+          rerror_rate=0.0, same_srv_rate=1.0, srv_diff_host_rate=0.5,
+          dst_host_count=3, dst_host_srv_count=2, dst_host_serror_rate=1 / 3, dst_host_rerror_rate=1 / 3)
+    assert t.stats()['time_window_connections'] == 2
+
+
+def test_host_window_keeps_the_last_connections():
+    t = FlowTable(host_window=2)
+    t.update(0.0, A, V, 'tcp', 1000, 80, SYN)
+    t.update(0.1, A, V, 'tcp', 1001, 22, SYN)
+    row = t.update(0.2, A, V, 'udp', 1002, 53)
+    # The first connection has left the last-2 window, but not the 2-second one
+    check(row, service='domain_u', count=3, serror_rate=2 / 3, dst_host_count=2, dst_host_srv_count=1,
+          dst_host_serror_rate=0.5, dst_host_same_src_port_rate=0.5)
+    assert t.stats()['host_window_connections'] == 2
+
+
+def test_syn_reusing_a_failed_connection_is_a_new_attempt():
+    t = FlowTable()
+    t.update(0.0, A, V, 'tcp', 1000, 80, SYN)
+    row = t.update(0.5, A, V, 'tcp', 1000, 80, SYN)
+    check(row, count=2, serror_rate=1.0, dst_host_count=2)
+    assert t.stats()['total_connections'] == 2
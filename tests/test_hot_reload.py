@@ -0,0 +1,99 @@
+"""
+Hot reload of the detector when its files change on disk: a reload that
+fails (a model file caught half-written) is retried once the file is
+complete, and the previous model keeps scoring in between. Reloads do
+not depend on the verdict cache being on.
+"""
+import os
+import shutil
+import time
+
+import pytest
+
+import sniffer
+import traffic_gen
+from rawparse import LINKTYPE_ETHERNET, parse_frame
+from file_watcher import FileWatcher
+from verdict_cache import VerdictCache
+
+
+def wait_for_load(timeout=30):
+    deadline = time.monotonic() + timeout
+    while sniffer.get_model_status()['state'] in ('stale', 'loading'):
+        assert time.monotonic() < deadline, "reload did not finish"
+        time.sleep(0.01)
+    return sniffer.get_model_status()['state']
+
+
+def rewrite(path, data):
+    """Write `data` to `path` with an mtime that differs from the previous one."""
+    mtime = os.stat(path).st_mtime_ns
+    with open(path, 'wb') as f:
+        f.write(data)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+@pytest.fixture(params=['cache', 'no_cache'])
+def numpy_detector(request, tmp_path, monkeypatch):
+    model_dir = os.path.join(os.path.dirname(sniffer.__file__), 'model')
+    paths = {}
+    for name in ('cnn_model.npz', 'encoders.pkl', 'scaler.pkl'):
+        src = os.path.join(model_dir, name)
+        if not os.path.exists(src):
+            pytest.skip(f"model/{name} not found; run 'python train_model.py' first")
+        paths[name] = str(tmp_path / name)
+        shutil.copyfile(src, paths[name])
+    monkeypatch.setattr(sniffer, 'INFERENCE_BACKEND', 'numpy')
+    monkeypatch.setattr(sniffer, 'NUMPY_MODEL_PATH', paths['cnn_model.npz'])
+    monkeypatch.setattr(sniffer, 'ENCODER_PATH', paths['encoders.pkl'])
+    monkeypatch.setattr(sniffer, 'SCALER_PATH', paths['scaler.pkl'])
+    monkeypatch.setattr(sniffer, 'detector', None)
+    monkeypatch.setattr(sniffer, 'model_status', dict(sniffer.model_status, state='not_loaded'))
+    monkeypatch.setattr(sniffer, 'verdict_cache', None)
+    monkeypatch.setattr(sniffer, 'model_watcher', FileWatcher(sniffer._model_files(), check_interval=0))
+    assert sniffer.load_detector()
+    if request.param == 'cache':
+        monkeypatch.setattr(sniffer, 'verdict_cache', VerdictCache())
+    return paths['cnn_model.npz']
+
+
+def feature_rows():
+    frames = traffic_gen.TrafficGenerator(seed=1).frames(32)
+    return [sniffer.fields_features(parse_frame(frame, 0.0, LINKTYPE_ETHERNET)) for _, _, frame in frames]
+
+
+def test_failed_reload_is_retried_when_the_file_is_fixed(numpy_detector, monkeypatch):
+    loads = []
+    load_detector = sniffer.load_detector
+
+    def counting_load():
+        loads.append(sniffer.get_model_status()['state'])
+        return load_detector()
+
+    monkeypatch.setattr(sniffer, 'load_detector', counting_load)
+    rows = feature_rows()
+    with open(numpy_detector, 'rb') as f:
+        good = f.read()
+    first = sniffer.detector
+    expected = sniffer.predict_rows(rows)
+
+    # Half-written model file: the reload fails, the old model keeps scoring
+    rewrite(numpy_detector, good[:len(good) // 2])
+    sniffer.predict_rows(rows)
+    assert wait_for_load() == 'error'
+    assert len(loads) == 1
+    assert sniffer.detector is first
+
+    # Still broken: the next batch is scored by the old model and retries the reload
+    assert list(sniffer.predict_rows(rows)) == pytest.approx(list(expected))
+    assert wait_for_load() == 'error'
+    assert len(loads) == 2
+
+    # Write finished: the next batch reloads it
+    rewrite(numpy_detector, good)
+    sniffer.predict_rows(rows)
+    assert wait_for_load() == 'ready'
+    assert len(loads) == 3
+    assert sniffer.detector is not first
+    assert list(sniffer.predict_rows(rows)) == pytest.approx(list(expected))
+    assert not sniffer.model_watcher.changed()
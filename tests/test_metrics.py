@@ -0,0 +1,40 @@
+"""
+Metric deltas as sharded workers send them: changes_since() in the worker,
+merge() in the parent.
+"""
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_worker_changes_merge_into_the_parent():
+    sent = metrics.snapshot()
+    metrics.packets.inc(3)
+    metrics.stage_parse.observe(2e-6)
+    metrics.stage_inference.observe(0.003)
+    sent, changes = metrics.changes_since(sent)
+    assert set(changes) == {metrics._key(m) for m in (metrics.packets, metrics.stage_parse, metrics.stage_inference)}
+
+    # A second report carries only what happened since the first
+    metrics.stage_inference.observe(0.2)
+    sent, later = metrics.changes_since(sent)
+    assert list(later) == [metrics._key(metrics.stage_inference)]
+    assert metrics.changes_since(sent)[1] == {}
+
+    # The parent starts from its own counts and adds both reports
+    metrics.reset()
+    metrics.packets.inc()
+    metrics.merge(changes)
+    metrics.merge(later)
+    assert metrics.packets.value == 4
+    assert metrics.stage_parse.count == 1
+    assert metrics.stage_inference.count == 2
+    assert metrics.stage_inference.sum == pytest.approx(0.203)
+    assert metrics.stage_inference.quantile(1.0) == 0.25
@@ -0,0 +1,448 @@
+"""
+Synthetic traffic generator for demos and load tests.
+
+Builds Ethernet/IPv4 frames with struct (no scapy) from a weighted mix of
+traffic kinds:
+
+    normal     HTTP sessions between client hosts and web servers
+               (handshake, GET, response, close)
+    syn_flood  SYNs to port 80 from a few hosts, random source ports
+    port_scan  SYNs from one host walking the target's ports
+    udp_flood  UDP datagrams to random ports from one host
+
+and delivers them at a target packet rate (0: as fast as possible) to:
+
+  - this process's detection pipeline, through sniffer.frame_callback (the
+    raw capture handler: rawparse, capture queue, inference worker,
+    alerts and blocking), reporting whether analysis kept up and how soon
+    each attacking host was flagged
+  - a detector in simulation mode, over a local UDP socket, one frame per
+    datagram (sniffer.simulation_mode_sniffer listens on SIM_FEED)
+  - a pcap file, for replay.py or any other tool
+
+Frames come from per-kind pools built once at start, so offering a frame
+costs far less than analysing it and the generator is not the bottleneck
+at 100k packets/s.
+
+    python traffic_gen.py --rate 20000 --seconds 10                  # load test in this process
+    python traffic_gen.py --rate 0 --seconds 10                      # saturation
+    python traffic_gen.py --send 127.0.0.1:9999 --mix syn_flood=1 --rate 5000 --seconds 5
+    python traffic_gen.py --pcap mix.pcap --packets 100000
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import struct
+import sys
+import time
+
+try:
+    from rawparse import TUNNEL_UDP_PORTS
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from rawparse import TUNNEL_UDP_PORTS
+
+# Where simulation mode listens for frames (host:port)
+SIM_FEED = os.environ.get('IDPS_SIM_FEED', '127.0.0.1:9999')
+KINDS = ('normal', 'syn_flood', 'port_scan', 'udp_flood')
+DEFAULT_MIX = 'normal=80,syn_flood=10,port_scan=5,udp_flood=5'
+POOL_SIZE = 8192 # distinct frames built per kind
+SCHEDULE_SIZE = 65536 # kind draws, cycled
+PACE_SLACK = 0.001 # seconds ahead of schedule before the sender sleeps
+PCAP_RATE = 10000 # packets/s for pcap timestamps when no rate is given
+
+# Addresses
+SERVERS = ('192.168.1.10', '192.168.1.11', '192.168.1.12')
+VICTIM = SERVERS[0]
+CLIENTS = 200
+FLOOD_SOURCES = ('10.66.0.1', '10.66.0.2', '10.66.0.3', '10.66.0.4')
+SCANNER = '10.77.0.1'
+UDP_FLOODER = '10.88.0.1'
+SRC_MAC = b'\x02\x00\x00\x00\x00\x01'
+DST_MAC = b'\x02\x00\x00\x00\x00\x02'
+
+FIN, SYN, RST, PSH, ACK = 0x01, 0x02, 0x04, 0x08, 0x10
+MIN_FRAME = 60 # Ethernet minimum without FCS
+
+_ETH = struct.Struct('!6s6sH')
+_IPV4 = struct.Struct('!BBHHHBBH4s4s')
+_TCP = struct.Struct('!HHIIBBHHH')
+_UDP = struct.Struct('!HHHH')
+_PSEUDO = struct.Struct('!4s4sBBH')
+_CHECKSUM = struct.Struct('!H')
+_PCAP_HEADER = struct.Struct('<IHHiIII')
+_PCAP_RECORD = struct.Struct('<IIII')
+
+
+# Frames ----------------------------------------------------------------------
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def _ip_frame(src, dst, proto, segment, ident):
+    header = _IPV4.pack(0x45, 0, 20 + len(segment), ident & 0xFFFF, 0x4000, 64, proto, 0, src, dst)
+    header = header[:10] + _CHECKSUM.pack(_checksum(header)) + header[12:]
+    frame = _ETH.pack(DST_MAC, SRC_MAC, 0x0800) + header + segment
+    if len(frame) < MIN_FRAME:
+        frame += b'\x00' * (MIN_FRAME - len(frame))
+    return frame
+
+
+def tcp_frame(src, dst, sport, dport, flags, seq=0, ack=0, payload=b'', ident=0):
+    """Ethernet/IPv4/TCP frame with valid checksums."""
+    s, d = socket.inet_aton(src), socket.inet_aton(dst)
+    header = _TCP.pack(sport, dport, seq & 0xFFFFFFFF, ack & 0xFFFFFFFF, 5 << 4, flags, 65535, 0, 0)
+    csum = _checksum(_PSEUDO.pack(s, d, 0, 6, len(header) + len(payload)) + header + payload)
+    return _ip_frame(s, d, 6, header[:16] + _CHECKSUM.pack(csum) + header[18:] + payload, ident)
+
+
+def udp_frame(src, dst, sport, dport, payload=b'', ident=0):
+    """Ethernet/IPv4/UDP frame with valid checksums."""
+    s, d = socket.inet_aton(src), socket.inet_aton(dst)
+    length = 8 + len(payload)
+    csum = _checksum(_PSEUDO.pack(s, d, 0, 17, length) + _UDP.pack(sport, dport, length, 0) + payload) or 0xFFFF
+    return _ip_frame(s, d, 17, _UDP.pack(sport, dport, length, csum) + payload, ident)
+
+
+# Traffic kinds: each builds a pool of (src, frame) in sending order -----------
+
+def _normal(rnd, n):
+    clients = [f'10.1.{i // 250}.{i % 250 + 1}' for i in range(CLIENTS)]
+    pool = []
+    while len(pool) < n:
+        client, server = rnd.choice(clients), rnd.choice(SERVERS)
+        cport, c, s = rnd.randrange(32768, 61000), rnd.getrandbits(32), rnd.getrandbits(32)
+        request = (f'GET /{rnd.choice(("", "index.html", "api/items", "static/app.js"))} HTTP/1.1\r\n'
+                   f'Host: {server}\r\nUser-Agent: Mozilla/5.0\r\nAccept: */*\r\n\r\n').encode()
+        body = b'x' * rnd.randrange(200, 1300)
+        response = b'HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: %d\r\n\r\n' % len(body) + body
+        q, r = len(request), len(response)
+        # (sent by the client?, flags, client sequence offset, server sequence offset, payload);
+        # each side's seq is its own offset and its ack the other side's
+        for upstream, flags, co, so, payload in (
+                (True, SYN, 0, -s, b''), # ack 0
+                (False, SYN | ACK, 1, 0, b''),
+                (True, ACK, 1, 1, b''),
+                (True, PSH | ACK, 1, 1, request),
+                (False, PSH | ACK, 1 + q, 1, response),
+                (True, ACK, 1 + q, 1 + r, b''),
+                (True, FIN | ACK, 1 + q, 1 + r, b''),
+                (False, FIN | ACK, 2 + q, 1 + r, b''),
+                (True, ACK, 2 + q, 2 + r, b'')):
+            if upstream:
+                pool.append((client, tcp_frame(client, server, cport, 80, flags, c + co, s + so, payload)))
+            else:
+                pool.append((server, tcp_frame(server, client, 80, cport, flags, s + so, c + co, payload)))
+    return pool
+
+
+def _syn_flood(rnd, n):
+    return [(src, tcp_frame(src, VICTIM, rnd.randrange(1024, 65536), 80, SYN, rnd.getrandbits(32),
+                            ident=rnd.getrandbits(16)))
+            for src in (rnd.choice(FLOOD_SOURCES) for _ in range(n))]
+
+
+def _port_scan(rnd, n):
+    return [(SCANNER, tcp_frame(SCANNER, VICTIM, 40000 + i % 16, i % 1024 + 1, SYN, rnd.getrandbits(32), ident=i))
+            for i in range(n)]
+
+
+def _udp_flood(rnd, n):
+    payload = bytes(rnd.getrandbits(8) for _ in range(512))
+    # Not to tunnel ports: those datagrams would be decoded as encapsulated traffic
+    ports = [p for p in range(1, 65536) if p not in TUNNEL_UDP_PORTS]
+    high = [p for p in ports if p >= 1024]
+    return [(UDP_FLOODER, udp_frame(UDP_FLOODER, VICTIM, rnd.choice(high), rnd.choice(ports),
+                                    payload, ident=i))
+            for i in range(n)]
+
+
+BUILDERS = {'normal': _normal, 'syn_flood': _syn_flood, 'port_scan': _port_scan, 'udp_flood': _udp_flood}
+ATTACK_SOURCES = {**{src: 'syn_flood' for src in FLOOD_SOURCES}, SCANNER: 'port_scan', UDP_FLOODER: 'udp_flood'}
+
+
+def parse_mix(spec):
+    """'normal=80,syn_flood=20' -> {'normal': 80.0, 'syn_flood': 20.0}"""
+    mix = {}
+    for part in spec.split(','):
+        kind, _, weight = part.strip().partition('=')
+        if kind not in BUILDERS:
+            raise ValueError(f"Unknown traffic kind {kind!r}; expected one of {', '.join(KINDS)}")
+        mix[kind] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError(f"Empty traffic mix {spec!r}")
+    return mix
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class TrafficGenerator:
+    """Cycles through per-kind frame pools in a fixed, weighted random order of kinds."""
+
+    def __init__(self, mix=DEFAULT_MIX, seed=7, pool_size=POOL_SIZE):
+        self.mix = parse_mix(mix) if isinstance(mix, str) else dict(mix)
+        rnd = random.Random(seed)
+        self.kinds = [k for k, w in self.mix.items() if w > 0]
+        self.pools = [BUILDERS[k](rnd, pool_size) for k in self.kinds]
+        self._schedule = rnd.choices(range(len(self.kinds)), [self.mix[k] for k in self.kinds], k=SCHEDULE_SIZE)
+
+    def frames(self, count=None):
+        """Yield (kind, src, frame bytes), forever or `count` times."""
+        kinds, pools, schedule = self.kinds, self.pools, self._schedule
+        positions = [0] * len(pools)
+        i = 0
+        while count is None or i < count:
+            k = schedule[i % SCHEDULE_SIZE]
+            pool = pools[k]
+            src, frame = pool[positions[k] % len(pool)]
+            positions[k] += 1
+            i += 1
+            yield kinds[k], src, frame
+
+    def attack_sources(self):
+        """{src: kind} of the attacking hosts in this mix."""
+        return {src: kind for src, kind in ATTACK_SOURCES.items() if kind in self.kinds}
+
+
+def paced(frames, rate, clock=time.perf_counter):
+    """Yield from `frames` at `rate` per second (0: as fast as possible)."""
+    if rate <= 0:
+        yield from frames
+        return
+    interval = 1.0 / rate
+    start = clock()
+    for i, item in enumerate(frames):
+        ahead = start + i * interval - clock()
+        if ahead > PACE_SLACK:
+            time.sleep(ahead)
+        yield item
+
+
+# Delivery --------------------------------------------------------------------
+
+def write_pcap(path, frames, rate=PCAP_RATE, start=None):
+    """Write frames to a pcap file (Ethernet), timestamped `rate` per second. Returns the count."""
+    rate = rate if rate > 0 else PCAP_RATE
+    start = time.time() if start is None else start
+    n = 0
+    with open(path, 'wb') as f:
+        f.write(_PCAP_HEADER.pack(0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for n, (_, _, frame) in enumerate(frames, 1):
+            ts = start + (n - 1) / rate
+            sec = int(ts)
+            f.write(_PCAP_RECORD.pack(sec, int((ts - sec) * 1e6), len(frame), len(frame)))
+            f.write(frame)
+    return n
+
+
+def send_frames(frames, address=SIM_FEED, rate=0, seconds=None):
+    """Send each frame as one UDP datagram to `address` (host:port). Returns (sent, elapsed seconds)."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sendto, target = sock.sendto, parse_address(address)
+    sent = 0
+    start = time.perf_counter()
+    try:
+        for _, _, frame in paced(frames, rate):
+            try:
+                sendto(frame, target)
+            except (BlockingIOError, ConnectionRefusedError):
+                continue # socket buffer full / nobody listening yet
+            sent += 1
+            if seconds is not None and not sent % 1024 and time.perf_counter() - start >= seconds:
+                break
+    finally:
+        sock.close()
+    return sent, time.perf_counter() - start
+
+
+def load_test(generator, rate, seconds=None, packets=None, queue_size=None, policy=None, block=True):
+    """
+    Offer generated frames to this process's pipeline at `rate` packets/s
+    (0: as fast as the capture loop takes them) for `seconds` or `packets`,
+    as raw_sniff would, then drain it. Returns a report dict.
+
+    With block=False flagged hosts are recorded but not blocked, so their
+    packets keep going through analysis instead of the blocklist fast path.
+    """
+    try:
+        import database
+        import sniffer
+    except ImportError:
+        sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+        import database
+        import sniffer
+    if not sniffer.load_detector():
+        raise RuntimeError("No model loaded. Run 'python train_model.py' first.")
+    sniffer.flow_table.clear()
+    sniffer.BLOCKED_IPS.clear()
+    if sniffer.verdict_cache is not None:
+        sniffer.verdict_cache.invalidate()
+    queue_size = sniffer.CAPTURE_QUEUE_SIZE if queue_size is None else queue_size
+    # As start_sniffer sets them up
+    sniffer.start_inference_worker(max_queue=sniffer.BATCH_SIZE * sniffer.INFERENCE_QUEUE_BATCHES
+                                   if queue_size > 0 else None)
+    sniffer.start_capture_queue(queue_size, policy)
+    blocked_before = sniffer.blocked_packets
+
+    attackers = generator.attack_sources()
+    callback = sniffer.frame_callback
+    first_sent, flagged = {}, {}
+    offered = dict.fromkeys(generator.kinds, 0)
+    clock, now = time.perf_counter, time.time
+    block_ip = sniffer.block_ip
+
+    def record_block(ip):
+        if ip not in flagged:
+            flagged[ip] = clock()
+        if block:
+            block_ip(ip)
+
+    sniffer.block_ip = record_block
+    capture_time = 0.0
+    count = packets if packets is not None else (int(rate * seconds) if rate > 0 and seconds else None)
+    start = clock()
+    try:
+        for n, (kind, src, frame) in enumerate(paced(generator.frames(count), rate), 1):
+            offered[kind] += 1
+            t0 = clock()
+            if src not in first_sent and src in attackers:
+                first_sent[src] = t0
+            callback(frame, now())
+            capture_time += clock() - t0
+            if count is None and not n % 1024 and clock() - start >= seconds:
+                break
+        offer_seconds = clock() - start
+        sniffer.stop_capture_queue()
+        sniffer.stop_inference_worker()
+        drain_seconds = clock() - start - offer_seconds
+    finally:
+        sniffer.block_ip = block_ip
+    database.flush_alerts()
+    total = sum(offered.values())
+    detected = {src: flagged[src] - t for src, t in first_sent.items() if src in flagged}
+
+    queue_stats = sniffer.get_capture_queue_stats() or {}
+    inference = sniffer.get_inference_stats()
+    attacks = {}
+    for kind in set(attackers.values()):
+        sources = [s for s, k in attackers.items() if k == kind and s in first_sent]
+        delays = [detected[s] * 1e3 for s in sources if s in detected]
+        attacks[kind] = {
+            'sources': len(sources),
+            'detected': len(delays),
+            'detect_ms_median': statistics.median(delays) if delays else None,
+            'detect_ms_max': max(delays) if delays else None,
+        }
+    # Every packet offered ends up in exactly one of: blocked at capture, skipped in the
+    # capture queue (its source was blocked while it waited), shed, or analysed
+    blocked_fast_path = sniffer.blocked_packets - blocked_before
+    skipped_blocked = queue_stats.get('skipped_blocked', 0)
+    inference_dropped = inference.get('dropped', 0)
+    shed = queue_stats.get('shed_total', 0) + inference_dropped
+    if queue_stats:
+        analysed = queue_stats['processed'] - inference_dropped
+    else:
+        analysed = total - blocked_fast_path - inference_dropped
+    offered_pps = total / offer_seconds if offer_seconds else 0.0
+    return {
+        'mix': generator.mix,
+        'target_pps': rate,
+        'packets': total,
+        'offered': offered,
+        'offered_pps': offered_pps,
+        'capture_us': capture_time / total * 1e6 if total else 0.0,
+        'drain_s': drain_seconds,
+        'analysed': analysed,
+        'blocked_fast_path': blocked_fast_path,
+        'skipped_blocked': skipped_blocked,
+        'shed': shed,
+        'shed_by_reason': {**queue_stats.get('shed', {}), 'inference_queue_full': inference_dropped},
+        'attacks': attacks,
+        'blocking': block,
+        'false_blocks': sum(1 for ip in flagged if ip not in attackers),
+        'kept_up': (rate <= 0 or offered_pps >= 0.95 * rate) and shed == 0,
+        'alert_writer': database.get_writer_stats(),
+    }
+
+
+def print_load_report(r):
+    target = f"{r['target_pps']:.0f} pkt/s" if r['target_pps'] > 0 else 'as fast as possible'
+    print(f"\n=== Load test: {r['packets']} packets, target {target} ===")
+    print(f"Offered:  {r['offered_pps']:.0f} pkt/s ({', '.join(f'{k} {v}' for k, v in r['offered'].items())})")
+    print(f"Capture:  {r['capture_us']:.1f} us/packet in the capture loop; drained in {r['drain_s']:.2f} s")
+    print(f"Analysed: {r['analysed']}; {r['blocked_fast_path'] + r['skipped_blocked']} from blocked hosts "
+          f"({r['blocked_fast_path']} dropped at capture, {r['skipped_blocked']} skipped in the queue); {r['shed']} shed"
+          + (f" ({', '.join(f'{k}={v}' for k, v in r['shed_by_reason'].items() if v)})" if r['shed'] else ''))
+    for kind, a in sorted(r['attacks'].items()):
+        when = (f", flagged after {a['detect_ms_median']:.1f} ms median / {a['detect_ms_max']:.1f} ms max"
+                if a['detected'] else '')
+        print(f"{kind:10}{a['detected']}/{a['sources']} sources detected{when}")
+    print(f"Normal hosts flagged: {r['false_blocks']}" + ('' if r['blocking'] else ' (blocking off)'))
+    result = 'kept up' if r['kept_up'] else 'saturated (fell behind the target rate or shed packets)'
+    if r['analysed'] < r['packets']:
+        result += (f"; {r['analysed'] / r['packets']:.0%} of the packets were analysed"
+                   + ('' if r['shed'] else ', the rest came from blocked hosts'))
+    print(f"Result:   {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic traffic for the IDPS.")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"kind=weight,... of {', '.join(KINDS)}")
+    parser.add_argument('--rate', type=float, default=10000, help='packets per second (0: as fast as possible)')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--packets', type=int, help='stop after this many packets instead')
+    parser.add_argument('--seed', type=int, default=7)
+    out = parser.add_mutually_exclusive_group()
+    out.add_argument('--send', metavar='HOST:PORT', nargs='?', const=SIM_FEED,
+                     help=f'send to a detector in simulation mode (default {SIM_FEED})')
+    out.add_argument('--pcap', metavar='FILE', help='write a pcap file')
+    parser.add_argument('--queue-size', type=int, help='capture queue size for the in-process load test')
+    parser.add_argument('--policy', help='capture queue shed policy for the in-process load test')
+    parser.add_argument('--no-block', action='store_true',
+                        help='flag hosts without blocking them, so all their traffic is analysed')
+    parser.add_argument('--db', help='write alerts to this SQLite file instead of idps.db')
+    parser.add_argument('--verbose', action='store_true', help='print every alert')
+    parser.add_argument('--json', help='also write the load test report to this file')
+    args = parser.parse_args()
+
+    gen = TrafficGenerator(args.mix, args.seed)
+    count = args.packets
+    if args.pcap:
+        if count is None:
+            count = int((args.rate if args.rate > 0 else PCAP_RATE) * args.seconds)
+        n = write_pcap(args.pcap, gen.frames(count), args.rate)
+        print(f"[*] Wrote {n} packets to {args.pcap}")
+        return
+    if args.send:
+        print(f"[*] Sending to {args.send} ...")
+        sent, elapsed = send_frames(gen.frames(count), args.send, args.rate,
+                                    None if count is not None else args.seconds)
+        print(f"[*] Sent {sent} packets in {elapsed:.2f} s ({sent / elapsed:.0f} pkt/s)")
+        return
+
+    if args.db:
+        os.environ['IDPS_DB_PATH'] = args.db
+    import sniffer
+    sniffer.VERBOSE_ALERTS = args.verbose
+    report = load_test(gen, args.rate, args.seconds, count, args.queue_size, args.policy, not args.no_block)
+    print_load_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
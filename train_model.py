@@ -4,62 +4,119 @@ from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Conv1D, MaxPooling1D, Flatten, Dropout, BatchNormalization
 from tensorflow.keras.optimizers import Adam
 import matplotlib.pyplot as plt
+import argparse
+import math
 import os
+import time
 
-from preprocessing import load_data, preprocess_data
+from preprocessing import (load_data, preprocess_data, resolve_data_path, fit_streaming,
+                           stream_chunks, encoded_chunks, COL_NAMES, CHUNK_ROWS,
+                           VALIDATION_SPLIT, SPLIT_SEED)
+from feature_cache import FeatureCache, preprocessing_params
+from numpy_model import export_model, NUMPY_MODEL_PATH
 
 # Configuration
 EPOCHS = 10
 BATCH_SIZE = 32
 MODEL_SAVE_PATH = os.path.join(os.path.dirname(__file__), 'model', 'cnn_model.h5')
+# Files larger than this are trained on with the streaming (chunked) pipeline
+STREAM_THRESHOLD_BYTES = 512 * 1024 * 1024
 
-def build_cnn_model(input_shape):
+def build_cnn_model(input_shape, filters=(64, 128), dense_units=(128, 64), learning_rate=0.001):
     """
     Builds a 1D CNN model suitable for tabular network data.
+    One Conv1D/BatchNorm/MaxPool/Dropout block per entry of `filters`,
+    then Dense layers of `dense_units`; the defaults are the original
+    architecture.
     """
     model = Sequential()
     
-    # First Convolutional Layer
-    model.add(Conv1D(filters=64, kernel_size=3, activation='relu', input_shape=input_shape))
-    model.add(BatchNormalization())
-    model.add(MaxPooling1D(pool_size=2))
-    model.add(Dropout(0.2))
-    
-    # Second Convolutional Layer
-    model.add(Conv1D(filters=128, kernel_size=3, activation='relu'))
-    model.add(BatchNormalization())
-    model.add(MaxPooling1D(pool_size=2))
-    model.add(Dropout(0.3))
+    # Convolutional blocks (dropout 0.2 after the first, 0.3 after the others)
+    for i, n_filters in enumerate(filters):
+        if i == 0:
+            model.add(Conv1D(filters=n_filters, kernel_size=3, activation='relu', input_shape=input_shape))
+        else:
+            model.add(Conv1D(filters=n_filters, kernel_size=3, activation='relu'))
+        model.add(BatchNormalization())
+        model.add(MaxPooling1D(pool_size=2))
+        model.add(Dropout(0.2 if i == 0 else 0.3))
     
     # Flattening
     model.add(Flatten())
     
-    # Fully Connected Layers
-    model.add(Dense(128, activation='relu'))
-    model.add(Dropout(0.4))
-    
-    model.add(Dense(64, activation='relu'))
+    # Fully Connected Layers (dropout after the first)
+    for i, units in enumerate(dense_units):
+        model.add(Dense(units, activation='relu'))
+        if i == 0:
+            model.add(Dropout(0.4))
     
     # Output Layer (Binary Classification: Normal(0) vs Attack(1))
     model.add(Dense(1, activation='sigmoid'))
     
     # Compile
-    optimizer = Adam(learning_rate=0.001)
+    optimizer = Adam(learning_rate=learning_rate)
     model.compile(optimizer=optimizer, loss='binary_crossentropy', metrics=['accuracy'])
     
     return model
 
-def train():
+class FirstEpochTimer(tf.keras.callbacks.Callback):
+    """Prints the time from the start of train() to the start of the first epoch."""
+
+    def __init__(self, started, cache_state):
+        super().__init__()
+        self.started = started
+        self.cache_state = cache_state
+        self.seconds = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        if epoch == 0:
+            self.seconds = time.perf_counter() - self.started
+            print(f"[*] Startup to first epoch: {self.seconds:.2f}s (feature cache: {self.cache_state})")
+
+def load_training_arrays(file_path, use_cache=True):
+    """
+    (X_train, X_val, y_train, y_val, cache state) for train(). On a feature
+    cache hit the arrays are read-only memmaps and the cached encoders and
+    scaler are put back in model/; otherwise the CSV is loaded and
+    preprocessed as before and the result is cached for the next run.
+    """
+    params = preprocessing_params(pipeline='memory', test_size=0.2, random_state=42, dtype='float32')
+    cache = FeatureCache(file_path, params) if use_cache else None
+    if cache is not None and cache.lookup():
+        print(f"Step 1-2: Loading preprocessed features from cache {cache.path}...")
+        a = cache.load()
+        return a['X_train'], a['X_val'], a['y_train'], a['y_val'], 'hit'
+
     print("Step 1: Loading Data...")
-    # By default, tries to load KDDTrain+.txt, falls back to dummy
-    df = load_data() 
+    df = load_data(file_path)
     
     print("Step 2: Preprocessing Data...")
     X, y = preprocess_data(df, is_training=True)
+    # The model computes in float32 anyway; this halves the cached size
+    X = X.astype(np.float32)
     
     # Split training and validation
     from sklearn.model_selection import train_test_split
     X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+    if cache is None:
+        return X_train, X_val, y_train, y_val, 'off'
+    writer = cache.writer()
+    try:
+        for name, array in (('X_train', X_train), ('y_train', y_train), ('X_val', X_val), ('y_val', y_val)):
+            writer.save(name, array)
+        writer.commit(rows=len(y))
+    except OSError as e:
+        writer.abort()
+        print(f"[!] Could not write the feature cache: {e}")
+        return X_train, X_val, y_train, y_val, 'miss'
+    print(f"Preprocessed features cached in {cache.path}")
+    return X_train, X_val, y_train, y_val, 'miss'
+
+def train(file_name='KDDTrain+.txt', use_cache=True):
+    started = time.perf_counter()
+    # By default, tries to load KDDTrain+.txt, falls back to dummy
+    file_path = resolve_data_path(file_name)
+    X_train, X_val, y_train, y_val, cache_state = load_training_arrays(file_path, use_cache)
     
     print(f"Training data shape: {X_train.shape}")
     print(f"Validation data shape: {X_val.shape}")
@@ -75,14 +132,137 @@ def train():
         epochs=EPOCHS,
         batch_size=BATCH_SIZE,
         validation_data=(X_val, y_val),
+        callbacks=[FirstEpochTimer(started, cache_state)],
         verbose=1
     )
     
+    save_outputs(model, history)
+
+def make_dataset(file_path, encoders, scaler, subset, rows, batch_size=BATCH_SIZE,
+                 chunksize=CHUNK_ROWS):
+    """
+    tf.data pipeline over one split of a CSV: chunks are read, encoded and
+    scaled by a generator, re-cut into `batch_size` batches and prefetched
+    while the model trains, so at most a few chunks are in memory.
+    """
+    return _chunk_dataset(
+        lambda: stream_chunks(file_path, encoders, scaler, subset, chunksize, shuffle=subset == 'train'),
+        rows, batch_size)
+
+def array_dataset(X, y, batch_size=BATCH_SIZE, chunksize=CHUNK_ROWS, shuffle=True):
+    """
+    make_dataset() over (memory-mapped) arrays: contiguous chunks are read
+    in random order and shuffled within, so only the chunks in flight are
+    paged in.
+    """
+    def chunks():
+        rng = np.random.default_rng()
+        starts = np.arange(0, len(y), chunksize)
+        if shuffle:
+            rng.shuffle(starts)
+        for start in starts:
+            X_chunk = np.asarray(X[start:start + chunksize], dtype=np.float32)
+            y_chunk = np.asarray(y[start:start + chunksize], dtype=np.float32)
+            if shuffle:
+                order = rng.permutation(len(y_chunk))
+                X_chunk, y_chunk = X_chunk[order], y_chunk[order]
+            yield X_chunk, y_chunk
+    return _chunk_dataset(chunks, len(y), batch_size)
+
+def _chunk_dataset(generator, rows, batch_size):
+    n_features = len(COL_NAMES) - 1
+    signature = (tf.TensorSpec(shape=(None, n_features, 1), dtype=tf.float32),
+                 tf.TensorSpec(shape=(None,), dtype=tf.float32))
+    ds = tf.data.Dataset.from_generator(generator, output_signature=signature)
+    ds = ds.rebatch(batch_size)
+    # Known length: progress bars and epoch boundaries work as with arrays
+    ds = ds.apply(tf.data.experimental.assert_cardinality(math.ceil(rows / batch_size)))
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+def cache_streaming(cache, file_path, encoders, scaler, stats, chunksize=CHUNK_ROWS):
+    """Fill a feature cache entry from the CSV in one more chunked pass; returns its arrays."""
+    n_features = len(COL_NAMES) - 1
+    writer = cache.writer()
+    try:
+        out = {}
+        for subset in ('train', 'val'):
+            rows = stats[f'{subset}_rows']
+            out[subset] = (writer.allocate(f'X_{subset}', (rows, n_features, 1), np.float32),
+                           writer.allocate(f'y_{subset}', (rows,), np.float32))
+        filled = {'train': 0, 'val': 0}
+        for X, y, mask in encoded_chunks(file_path, encoders, scaler, chunksize):
+            for subset, rows in (('train', ~mask), ('val', mask)):
+                X_out, y_out = out[subset]
+                start, n = filled[subset], int(rows.sum())
+                X_out[start:start + n] = X[rows]
+                y_out[start:start + n] = y[rows]
+                filled[subset] += n
+        for X_out, y_out in out.values():
+            X_out.flush()
+            y_out.flush()
+        del out
+        writer.commit(rows=stats['rows'], stats=stats)
+    except BaseException:
+        writer.abort()
+        raise
+    print(f"Preprocessed features cached in {cache.path}")
+    return cache.load(restore_preprocessors=False)
+
+def train_streaming(file_path, chunksize=CHUNK_ROWS, use_cache=True):
+    """
+    train() for datasets too large to load: two passes over the CSV, bounded
+    memory. With the feature cache the second pass writes memory-mapped
+    arrays once and every epoch (and later runs) read those instead.
+    """
+    started = time.perf_counter()
+    params = preprocessing_params(pipeline='stream', validation_split=VALIDATION_SPLIT,
+                                  seed=SPLIT_SEED, dtype='float32')
+    cache = FeatureCache(file_path, params) if use_cache else None
+    meta = cache.lookup() if cache is not None else None
+    if meta:
+        print(f"Step 1: Loading preprocessed features from cache {cache.path}...")
+        arrays, cache_state = cache.load(), 'hit'
+        print(f"{meta['rows']} rows: {len(arrays['y_train'])} training, {len(arrays['y_val'])} validation")
+    else:
+        print(f"Step 1: Fitting encoders and scaler on {file_path} ({chunksize} rows per chunk)...")
+        encoders, scaler, stats = fit_streaming(file_path, chunksize)
+        print(f"{stats['rows']} rows ({stats['attacks']} attacks): "
+              f"{stats['train_rows']} training, {stats['val_rows']} validation")
+        arrays = None
+        cache_state = 'off'
+        if cache is not None:
+            cache_state = 'miss'
+            try:
+                arrays = cache_streaming(cache, file_path, encoders, scaler, stats, chunksize)
+            except OSError as e:
+                print(f"[!] Could not write the feature cache: {e}")
+
+    print("Step 2: Building streaming datasets...")
+    if arrays is not None:
+        train_ds = array_dataset(arrays['X_train'], arrays['y_train'], chunksize=chunksize)
+        val_ds = array_dataset(arrays['X_val'], arrays['y_val'], chunksize=chunksize, shuffle=False)
+    else:
+        train_ds = make_dataset(file_path, encoders, scaler, 'train', stats['train_rows'], chunksize=chunksize)
+        val_ds = make_dataset(file_path, encoders, scaler, 'val', stats['val_rows'], chunksize=chunksize)
+
+    print("Step 3: Building Model...")
+    model = build_cnn_model((len(COL_NAMES) - 1, 1))
+    model.summary()
+
+    print("Step 4: Training Model...")
+    history = model.fit(train_ds, epochs=EPOCHS, validation_data=val_ds,
+                        callbacks=[FirstEpochTimer(started, cache_state)], verbose=1)
+    save_outputs(model, history)
+
+def save_outputs(model, history):
     print("Step 5: Saving Model...")
     if not os.path.exists(os.path.dirname(MODEL_SAVE_PATH)):
         os.makedirs(os.path.dirname(MODEL_SAVE_PATH))
     model.save(MODEL_SAVE_PATH)
     print(f"Model saved to {MODEL_SAVE_PATH}")
+    # Folded weights for the TensorFlow-free inference backend
+    export_model(model, NUMPY_MODEL_PATH)
+    print(f"NumPy weights exported to {NUMPY_MODEL_PATH}")
     
     # Step 6: Generate Accuracy Graph
     print("Step 6: Saving Accuracy Graph...")
@@ -97,4 +277,17 @@ def train():
     print("Accuracy graph saved to static/accuracy_graph.png")
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the IDPS CNN.")
+    parser.add_argument('--data', default='KDDTrain+.txt', help='dataset file (in data/ or a path)')
+    parser.add_argument('--stream', action='store_true',
+                        help='chunked two-pass training (automatic for files over 512 MB)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always re-read and re-preprocess the data (no model/cache)')
+    args = parser.parse_args()
+
+    path = resolve_data_path(args.data)
+    if args.stream or os.path.getsize(path) > STREAM_THRESHOLD_BYTES:
+        train_streaming(path, args.chunk_rows, use_cache=not args.no_cache)
+    else:
+        train(args.data, use_cache=not args.no_cache)
@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+
+# Entries kept (LRU) when the cache is enabled; sniffer leaves it off by default
+CACHE_SIZE = 65536
+
+SRC_BYTES_INDEX = 4 # position of src_bytes in an extract_features row
+
+
+class VerdictCache:
+    """
+    Bounded LRU of model confidences, keyed on the raw feature row.
+
+    The encoder is a pure function of the row, so the raw row identifies the
+    encoded vector; keying on it lets a hit skip preprocessing as well as the
+    forward pass. src_bytes can optionally be quantized into buckets of
+    `src_bytes_bucket` bytes, trading exactness for hit rate.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, src_bytes_bucket=None):
+        self.maxsize = max(1, int(maxsize))
+        self.src_bytes_bucket = src_bytes_bucket
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by invalidate(); scores computed under an older generation are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, row):
+        if self.src_bytes_bucket:
+            row = list(row)
+            row[SRC_BYTES_INDEX] = int(row[SRC_BYTES_INDEX]) // self.src_bytes_bucket
+        return tuple(row)
+
+    def score(self, rows, score_fn):
+        """
+        Confidences for `rows`, calling score_fn(rows) -> sequence only for
+        the distinct rows that are not cached. Returns a list.
+        """
+        keys = [self.key(r) for r in rows]
+        out = [None] * len(rows)
+        missing = {} # key -> indices of rows waiting for it
+        with self._lock:
+            generation = self._generation
+            entries = self._entries
+            for i, k in enumerate(keys):
+                v = entries.get(k)
+                if v is None:
+                    missing.setdefault(k, []).append(i)
+                else:
+                    entries.move_to_end(k)
+                    out[i] = v
+            self.hits += len(rows) - sum(len(ix) for ix in missing.values())
+            self.misses += sum(len(ix) for ix in missing.values())
+        if not missing:
+            return out
+
+        scores = score_fn([rows[ix[0]] for ix in missing.values()])
+        with self._lock:
+            store = generation == self._generation
+            for (k, ix), v in zip(missing.items(), scores):
+                v = float(v)
+                for i in ix:
+                    out[i] = v
+                if store:
+                    entries[k] = v
+            if store:
+                while len(entries) > self.maxsize:
+                    entries.popitem(last=False)
+                    self.evictions += 1
+        return out
+
+    def invalidate(self):
+        """Drop every entry (new model loaded)."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'src_bytes_bucket': self.src_bytes_bucket,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }